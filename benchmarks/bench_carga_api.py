@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la API web: clientes simulados concurrentes pidiendo los
+listados paginados y las métricas. Muestra cómo escala el throughput con la
+concurrencia: con consultas bloqueantes en el event loop queda plano (las
+peticiones se atienden de a una); con el pool asíncrono crece hasta saturar
+las conexiones o la base.
+
+Requiere un PostgreSQL local con datos (por ejemplo los de mockdata.py):
+    docker run -e POSTGRES_PASSWORD=postgres -p 5432:5432 postgres:16
+
+y la API apuntando a esa base, o --servidor para que el script la levante:
+    DB_HOST=localhost DB_NAME=postgres DB_USER=postgres DB_PASSWORD=postgres DB_SSLMODE=disable \\
+        PORT=8000 python -m web.app
+
+Uso:
+    python benchmarks/bench_carga_api.py [--url http://127.0.0.1:8000] [--clientes 1 2 4 8 16 32] [--duracion 10]
+    python benchmarks/bench_carga_api.py --servidor [--db-host localhost] [--db-password postgres]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+RAIZ = os.path.join(os.path.dirname(__file__), '..')
+
+# Mezcla de un tablero: listados (primera página) y métricas del mes, con la
+# clave que debe traer cada respuesta válida
+RUTAS = [
+    ("/api/asistencias?limite=200", 'datos'),
+    ("/api/denegaciones?limite=200", 'datos'),
+    ("/api/produccion?limite=200", 'datos'),
+    ("/api/metricas?periodo=ultimos_30_dias", 'asistencia'),
+]
+
+
+def validar(status, cuerpo, clave):
+    """Motivo por el que la respuesta no cuenta como exitosa, o None"""
+    if status != 200:
+        return status
+    try:
+        datos = json.loads(cuerpo)
+    except ValueError:
+        return 'json inválido'
+    if not isinstance(datos, dict) or clave not in datos:
+        return f"sin '{clave}'"
+    return None
+
+
+def cliente(host, puerto, hasta, latencias, errores, inicio_ruta):
+    """Un cliente simulado: pide las rutas en ronda por una conexión keep-alive hasta el final"""
+    conexion = http.client.HTTPConnection(host, puerto, timeout=30)
+    i = inicio_ruta
+    while time.perf_counter() < hasta:
+        ruta, clave = RUTAS[i % len(RUTAS)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            conexion.request("GET", ruta)
+            respuesta = conexion.getresponse()
+            error = validar(respuesta.status, respuesta.read(), clave)
+            if error is not None:
+                errores.append(error)
+                continue
+        except Exception as e:
+            errores.append(type(e).__name__)
+            conexion.close()
+            conexion = http.client.HTTPConnection(host, puerto, timeout=30)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+    conexion.close()
+
+
+def medir(host, puerto, clientes, duracion):
+    latencias, errores = [], []
+    hasta = time.perf_counter() + duracion
+    hilos = [threading.Thread(target=cliente, args=(host, puerto, hasta, latencias, errores, i))
+             for i in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return latencias, errores, time.perf_counter() - inicio
+
+
+def percentil(valores, p):
+    if not valores:
+        return float('nan')
+    return statistics.quantiles(valores, n=100)[p - 1] if len(valores) > 1 else valores[0]
+
+
+def levantar_servidor(args):
+    """Levanta uvicorn con la API apuntando a la base local y espera a que responda"""
+    entorno = dict(os.environ, DB_HOST=args.db_host, DB_PORT=str(args.db_port), DB_NAME=args.db_name,
+                   DB_USER=args.db_user, DB_PASSWORD=args.db_password, DB_SSLMODE=args.sslmode)
+    url = urlparse(args.url)
+    # python -m web.app fija el SelectorEventLoop en Windows antes de crear el loop
+    entorno['PORT'] = str(url.port or 80)
+    proceso = subprocess.Popen([sys.executable, '-m', 'web.app'], cwd=RAIZ, env=entorno)
+    limite = time.time() + 60
+    while time.time() < limite:
+        try:
+            conexion = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=2)
+            conexion.request("GET", RUTAS[0][0])
+            conexion.getresponse().read()
+            return proceso
+        except OSError:
+            if proceso.poll() is not None:
+                raise RuntimeError("uvicorn terminó al iniciar")
+            time.sleep(0.5)
+    proceso.terminate()
+    raise RuntimeError("La API no respondió en 60 s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado de la API web con clientes concurrentes")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--clientes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--duracion', type=float, default=10, help='Segundos por nivel de concurrencia')
+    parser.add_argument('--servidor', action='store_true', help='Levantar la API contra la base local')
+    parser.add_argument('--db-host', default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    parser.add_argument('--db-name', default='postgres')
+    parser.add_argument('--db-user', default='postgres')
+    parser.add_argument('--db-password', default='postgres')
+    parser.add_argument('--sslmode', default='disable')
+    args = parser.parse_args()
+
+    proceso = levantar_servidor(args) if args.servidor else None
+    url = urlparse(args.url)
+    try:
+        # Calentamiento: abre las conexiones del pool y carga los planes
+        medir(url.hostname, url.port or 80, 1, 1)
+
+        print("=" * 72)
+        print(f"API: {args.url} | {args.duracion:.0f} s por nivel | rutas: {len(RUTAS)}")
+        print("=" * 72)
+        print(f"{'Clientes':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'Errores':>10}{'Escalado':>11}")
+        base = None
+        for clientes in args.clientes:
+            latencias, errores, transcurrido = medir(url.hostname, url.port or 80, clientes, args.duracion)
+            por_segundo = len(latencias) / transcurrido
+            base = base or por_segundo or 1
+            print(f"{clientes:>9}{por_segundo:>10.1f}{percentil(latencias, 50) * 1000:>10.1f}"
+                  f"{percentil(latencias, 95) * 1000:>10.1f}{len(errores):>10}{por_segundo / base:>10.2f}x")
+            if errores:
+                print(f"          errores: {sorted(set(map(str, errores)))}")
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark de galerías cuantizadas (float16 / int8) contra float32
+Compara recall@1 (contra la identidad real y contra la búsqueda exacta),
+latencia por consulta y memoria en RAM de cada índice, con distintos
+tamaños de re-ranking exacto. Usa los mismos embeddings sintéticos que
+bench_indice_embeddings.py.
+
+La memoria es la que el índice mantiene en RAM (memoria_bytes()): con
+re-ranking los float32 cuentan salvo que estén mapeados de un archivo. Con
+--snapshot la galería se lee de un .npy mapeado, como en un tótem cuyo
+directorio está respaldado por el snapshot; sin él la galería está en RAM y
+el re-ranking no ahorra memoria frente a flat.
+
+Uso:
+    python benchmarks/bench_cuantizacion.py [--empleados 200000] [--consultas 500] [--snapshot]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logica.indice_embeddings import IndicePlano, IndiceFloat16, IndiceInt8
+from bench_indice_embeddings import generar_galeria, generar_consultas, medir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión, latencia y memoria de galerías cuantizadas")
+    parser.add_argument('--empleados', type=int, default=200000)
+    parser.add_argument('--consultas', type=int, default=500)
+    parser.add_argument('--por-frame', type=int, default=1, help='Caras consultadas juntas por frame')
+    parser.add_argument('--ruido', type=float, default=0.03, help='Ruido de las capturas respecto de la galería')
+    parser.add_argument('--reranking', type=int, nargs='+', default=[0, 8, 32, 128])
+    parser.add_argument('--snapshot', action='store_true', help='Leer los float32 desde un .npy mapeado')
+    args = parser.parse_args()
+
+    galeria = generar_galeria(args.empleados)
+    ids = np.arange(args.empleados)
+    consultas, objetivos = generar_consultas(galeria, args.consultas, ruido=args.ruido)
+
+    if args.snapshot:
+        ruta = os.path.join(tempfile.mkdtemp(), 'galeria.npy')
+        np.save(ruta, galeria)
+        galeria = np.asarray(np.load(ruta, mmap_mode='r'))
+
+    plano = IndicePlano()
+    plano.construir(galeria, ids)
+    exactos, ms_plano = medir(plano, consultas, args.por_frame)
+
+    print("=" * 78)
+    print(f"Galería: {args.empleados} embeddings | Consultas: {args.consultas} | ruido: {args.ruido}"
+          + (" | float32 mapeado" if args.snapshot else ""))
+    print("=" * 78)
+    print(f"{'Índice':<24}{'Recall@1':>10}{'vs exacto':>11}{'ms/consulta':>13}{'MB':>10}{'Memoria':>10}")
+    mb_plano = plano.memoria_bytes() / 2 ** 20
+    print(f"{'flat (float32)':<24}{np.mean(exactos == objetivos):>10.3f}{1.0:>11.3f}"
+          f"{ms_plano:>13.3f}{mb_plano:>10.1f}{1.0:>10.2f}")
+
+    for clase in (IndiceFloat16, IndiceInt8):
+        for reranking in args.reranking:
+            indice = clase(reranking=reranking)
+            inicio = time.perf_counter()
+            indice.construir(galeria, ids)
+            construccion = time.perf_counter() - inicio
+
+            encontrados, ms = medir(indice, consultas, args.por_frame)
+            mb = indice.memoria_bytes() / 2 ** 20
+            nombre = f"{clase.tipo} rerank={reranking}"
+            print(f"{nombre:<24}{np.mean(encontrados == objetivos):>10.3f}{np.mean(encontrados == exactos):>11.3f}"
+                  f"{ms:>13.3f}{mb:>10.1f}{mb / mb_plano:>10.2f}  (construcción {construccion:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark de detectores de caras (hog, haar, dnn) sobre las fotos de imagenes_empleados/
+Cada foto de empleado contiene exactamente una cara, así que el recall es la
+fracción de fotos en las que el detector encontró al menos una.
+
+Para el detector 'dnn' se necesitan los archivos configurados en DETECTOR_DNN_MODELO
+y DETECTOR_DNN_CONFIG (por ejemplo, res10_300x300_ssd_iter_140000.caffemodel y
+deploy.prototxt en modelos/).
+
+Uso:
+    python benchmarks/bench_detectores.py [--escalas 0.25 0.5 1.0] [--repeticiones 3]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logica.detectores_caras import TIPOS_DETECTOR
+
+
+def cargar_imagenes(carpeta):
+    """Lee las fotos como BGR (igual que los frames de la cámara)"""
+    imagenes = []
+    for ruta in sorted(glob.glob(os.path.join(carpeta, '*'))):
+        imagen = cv2.imread(ruta)
+        if imagen is not None:
+            imagenes.append((os.path.basename(ruta), imagen))
+    return imagenes
+
+
+def medir(detector, imagenes, escala, repeticiones):
+    """Devuelve (imágenes/s, caras/s, recall, fotos sin cara)"""
+    reducidas = [(nombre, cv2.resize(imagen, (0, 0), fx=escala, fy=escala)) for nombre, imagen in imagenes]
+    detector.detectar(reducidas[0][1])  # Calentamiento (carga de modelos, caches)
+
+    caras = 0
+    sin_cara = []
+    inicio = time.perf_counter()
+    for repeticion in range(repeticiones):
+        for nombre, imagen in reducidas:
+            encontradas = len(detector.detectar(imagen))
+            if repeticion == 0:
+                caras += encontradas
+                if not encontradas:
+                    sin_cara.append(nombre)
+    duracion = time.perf_counter() - inicio
+
+    procesadas = len(reducidas) * repeticiones
+    return (procesadas / duracion, caras * repeticiones / duracion,
+            1 - len(sin_cara) / len(reducidas), sin_cara)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Velocidad y recall de los detectores de caras")
+    parser.add_argument('--imagenes', default=os.path.join(os.path.dirname(__file__), '..', 'imagenes_empleados'))
+    parser.add_argument('--detectores', nargs='+', default=list(TIPOS_DETECTOR), choices=list(TIPOS_DETECTOR))
+    parser.add_argument('--escalas', nargs='+', type=float, default=[0.25, 0.5, 1.0])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    imagenes = cargar_imagenes(args.imagenes)
+    if not imagenes:
+        print(f"No se encontraron imágenes en {args.imagenes}")
+        return 1
+
+    print("=" * 72)
+    print(f"Imágenes: {len(imagenes)} | repeticiones: {args.repeticiones}")
+    print("=" * 72)
+    print(f"{'Detector':<10}{'Escala':>8}{'img/s':>10}{'caras/s':>10}{'Recall':>9}  Sin cara")
+
+    for tipo in args.detectores:
+        try:
+            detector = TIPOS_DETECTOR[tipo]()
+        except Exception as e:
+            print(f"{tipo:<10}  no disponible: {e}")
+            continue
+
+        for escala in args.escalas:
+            imagenes_s, caras_s, recall, sin_cara = medir(detector, imagenes, escala, args.repeticiones)
+            faltantes = ', '.join(sin_cara[:3]) + (' ...' if len(sin_cara) > 3 else '')
+            print(f"{tipo:<10}{escala:>8.2f}{imagenes_s:>10.1f}{caras_s:>10.1f}{recall:>9.2f}  {faltantes}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
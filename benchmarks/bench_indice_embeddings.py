@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark de recall vs latencia de los índices de embeddings
+Usa embeddings sintéticos de 128 dimensiones (una identidad por empleado y
+consultas con ruido, similar a capturas en vivo de la misma persona).
+
+Uso:
+    python benchmarks/bench_indice_embeddings.py [--empleados 50000] [--consultas 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logica.indice_embeddings import IndicePlano, IndiceIVF
+
+
+def generar_galeria(cantidad, semilla=0):
+    """Genera identidades aleatorias con norma similar a los embeddings de dlib"""
+    rng = np.random.default_rng(semilla)
+    galeria = rng.normal(size=(cantidad, 128)).astype(np.float32)
+    galeria /= np.linalg.norm(galeria, axis=1, keepdims=True)
+    return galeria
+
+
+def generar_consultas(galeria, cantidad, ruido=0.03, semilla=1):
+    """Toma identidades al azar y les suma ruido gaussiano"""
+    rng = np.random.default_rng(semilla)
+    objetivos = rng.choice(len(galeria), size=cantidad, replace=False)
+    consultas = galeria[objetivos] + rng.normal(scale=ruido, size=(cantidad, 128)).astype(np.float32)
+    return consultas.astype(np.float32), objetivos
+
+
+def medir(indice, consultas, por_frame):
+    """Devuelve (ids encontrados, ms promedio por consulta)"""
+    ids = []
+    inicio = time.perf_counter()
+    for i in range(0, len(consultas), por_frame):
+        encontrados, _ = indice.buscar(consultas[i:i + por_frame], k=1)
+        ids.append(encontrados[:, 0])
+    duracion = time.perf_counter() - inicio
+    return np.concatenate(ids), duracion * 1000 / len(consultas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latencia de índices de embeddings")
+    parser.add_argument('--empleados', type=int, default=50000)
+    parser.add_argument('--consultas', type=int, default=500)
+    parser.add_argument('--por-frame', type=int, default=1, help='Caras consultadas juntas por frame')
+    parser.add_argument('--nlist', type=int, default=256)
+    args = parser.parse_args()
+
+    galeria = generar_galeria(args.empleados)
+    ids = np.arange(args.empleados)
+    consultas, objetivos = generar_consultas(galeria, args.consultas)
+
+    plano = IndicePlano()
+    plano.construir(galeria, ids)
+    exactos, ms_plano = medir(plano, consultas, args.por_frame)
+
+    print("=" * 60)
+    print(f"Galería: {args.empleados} embeddings | Consultas: {args.consultas}")
+    print("=" * 60)
+    print(f"{'Índice':<22}{'Recall@1':>10}{'ms/consulta':>14}{'Aceleración':>14}")
+    print(f"{'flat':<22}{np.mean(exactos == objetivos):>10.3f}{ms_plano:>14.3f}{1.0:>14.1f}")
+
+    inicio = time.perf_counter()
+    ivf = IndiceIVF(nlist=args.nlist, min_vectores=0)
+    ivf.construir(galeria, ids)
+    print(f"(entrenamiento IVF: {time.perf_counter() - inicio:.2f} s)")
+
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        if nprobe > args.nlist:
+            break
+        ivf.nprobe = nprobe
+        aproximados, ms_ivf = medir(ivf, consultas, args.por_frame)
+        # Recall respecto de la búsqueda exacta
+        recall = np.mean(aproximados == exactos)
+        print(f"{f'ivf nprobe={nprobe}':<22}{recall:>10.3f}{ms_ivf:>14.3f}{ms_plano / ms_ivf:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
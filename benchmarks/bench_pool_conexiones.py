@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia por evento de asistencia: conexión nueva por consulta vs pool
+Simula las cuatro idas a la base de un rostro reconocido en process_entry
+(obtener_empleado, verificar_asistencia_hoy, registrar_ingreso, registrar_denegacion).
+
+Requiere un PostgreSQL local, por ejemplo:
+    docker run -e POSTGRES_PASSWORD=postgres -p 5432:5432 postgres:16
+
+Uso:
+    python benchmarks/bench_pool_conexiones.py [--eventos 200] [--sslmode prefer]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logica.pool_conexiones import PoolConexiones
+
+CONSULTAS_EVENTO = [
+    "SELECT id, nombre FROM bench_empleados WHERE id = %s",
+    "SELECT id FROM bench_asistencias WHERE id_empleado = %s AND fecha = CURRENT_DATE",
+    "INSERT INTO bench_asistencias (id_empleado, fecha) VALUES (%s, CURRENT_DATE)",
+    "INSERT INTO bench_denegaciones (id_empleado, fecha) VALUES (%s, CURRENT_DATE)",
+]
+
+
+def preparar_tablas(db_config):
+    conn = psycopg2.connect(**db_config)
+    cur = conn.cursor()
+    cur.execute("DROP TABLE IF EXISTS bench_empleados, bench_asistencias, bench_denegaciones")
+    cur.execute("CREATE TABLE bench_empleados (id SERIAL PRIMARY KEY, nombre TEXT)")
+    cur.execute("CREATE TABLE bench_asistencias (id SERIAL PRIMARY KEY, id_empleado INT, fecha DATE)")
+    cur.execute("CREATE TABLE bench_denegaciones (id SERIAL PRIMARY KEY, id_empleado INT, fecha DATE)")
+    cur.execute("INSERT INTO bench_empleados (nombre) SELECT 'Empleado ' || g FROM generate_series(1, 100) g")
+    conn.commit()
+    conn.close()
+
+
+def limpiar_tablas(db_config):
+    conn = psycopg2.connect(**db_config)
+    conn.cursor().execute("DROP TABLE IF EXISTS bench_empleados, bench_asistencias, bench_denegaciones")
+    conn.commit()
+    conn.close()
+
+
+def ejecutar(conn, consulta, empleado_id):
+    cur = conn.cursor()
+    cur.execute(consulta, (empleado_id,))
+    if cur.description:
+        cur.fetchall()
+    conn.commit()
+    cur.close()
+
+
+def evento_sin_pool(db_config, empleado_id):
+    for consulta in CONSULTAS_EVENTO:
+        conn = psycopg2.connect(**db_config)
+        try:
+            ejecutar(conn, consulta, empleado_id)
+        finally:
+            conn.close()
+
+
+def evento_con_pool(pool_db, empleado_id):
+    for consulta in CONSULTAS_EVENTO:
+        with pool_db.conexion() as conn:
+            ejecutar(conn, consulta, empleado_id)
+
+
+def medir(funcion, eventos):
+    tiempos = []
+    for i in range(eventos):
+        inicio = time.perf_counter()
+        funcion(i % 100 + 1)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return statistics.mean(tiempos), tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia por evento con y sin pool de conexiones")
+    parser.add_argument('--host', default=os.environ.get('DB_HOST', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('DB_PORT', 5432)))
+    parser.add_argument('--dbname', default=os.environ.get('DB_NAME', 'postgres'))
+    parser.add_argument('--user', default=os.environ.get('DB_USER', 'postgres'))
+    parser.add_argument('--password', default=os.environ.get('DB_PASSWORD', 'postgres'))
+    parser.add_argument('--sslmode', default=os.environ.get('DB_SSLMODE', 'prefer'))
+    parser.add_argument('--eventos', type=int, default=200)
+    args = parser.parse_args()
+
+    db_config = {
+        'host': args.host, 'port': args.port, 'dbname': args.dbname,
+        'user': args.user, 'password': args.password, 'sslmode': args.sslmode
+    }
+
+    preparar_tablas(db_config)
+    pool_db = PoolConexiones(db_config, minimo=1, maximo=4)
+    try:
+        sin_pool = medir(lambda emp: evento_sin_pool(db_config, emp), args.eventos)
+        con_pool = medir(lambda emp: evento_con_pool(pool_db, emp), args.eventos)
+    finally:
+        pool_db.cerrar()
+        limpiar_tablas(db_config)
+
+    print("=" * 60)
+    print(f"Eventos: {args.eventos} | {len(CONSULTAS_EVENTO)} consultas por evento | sslmode={args.sslmode}")
+    print("=" * 60)
+    print(f"{'Modo':<12}{'media ms':>12}{'p50 ms':>12}{'p95 ms':>12}")
+    print(f"{'sin pool':<12}{sin_pool[0]:>12.2f}{sin_pool[1]:>12.2f}{sin_pool[2]:>12.2f}")
+    print(f"{'con pool':<12}{con_pool[0]:>12.2f}{con_pool[1]:>12.2f}{con_pool[2]:>12.2f}")
+    print(f"\nLatencia ahorrada por evento: {sin_pool[0] - con_pool[0]:.2f} ms "
+          f"({sin_pool[0] / con_pool[0]:.1f}x más rápido)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,14 @@ Sistema de Control de Asistencia con Reconocimiento Facial
 Punto de entrada principal
 
 Uso:
-    python main.py [--mode entry|exit] [--config config.json]
+    python main.py [--mode entry|exit] [--offline] [--workers N] [--source [nombre=]entry|exit:origen ...]
     
 Comandos:
     --mode entry    : Modo ingreso (por defecto)
     --mode exit     : Modo egreso  
+    --offline       : Decide con el almacén local (SQLite) y sincroniza con PostgreSQL
+    --workers N     : Reconocimiento en N procesos (modo throughput, 0 = hilo único)
+    --source FUENTE : Modo multi-cámara; repetible (índice, archivo o URL RTSP por fuente)
     --config FILE   : Archivo de configuración personalizado
     
 Controles durante ejecución:
@@ -26,11 +29,17 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 from src.logica.face_recognition_engine import FaceRecognitionEngine
 from src.logica.asistencia_logica import AttendanceManager
 from src.logica.administrador_database import DatabaseManager
+from src.logica.directorio_empleados import DirectorioEmpleados
+from src.logica.escritor_eventos import EscritorEventos
+from src.logica.estado_asistencia import EstadoAsistenciaDiaria
+from src.logica.almacen_local import AlmacenLocal
 from src.interfaz.pantalla_camara import CameraDisplay
 from src.interfaz.manejador_mensajes import MessageHandler
+from src.interfaz.servidor_camaras import ServidorCamaras, parsear_fuente
+from src.logica.config import RECONOCIMIENTO_PROCESOS
 
-def setup_system():
-    """Inicializa y configura el sistema"""
+def setup_system(offline=False, workers=0):
+    """Inicializa y configura el sistema (offline: decisiones contra el almacén local)"""
     print("=" * 60)
     print("SISTEMA DE CONTROL DE ASISTENCIA")
     print("=" * 60)
@@ -40,20 +49,39 @@ def setup_system():
     
     try:
         db_manager = DatabaseManager()
-        face_engine = FaceRecognitionEngine()
-        attendance_manager = AttendanceManager()
-        camera_display = CameraDisplay()
+        if offline:
+            # Réplica local + diario de eventos; PostgreSQL solo se usa para sincronizar
+            almacen = AlmacenLocal(db_remoto=db_manager)
+            directorio = DirectorioEmpleados(almacen)
+            escritor = almacen
+            estado = EstadoAsistenciaDiaria(almacen)
+        else:
+            directorio = DirectorioEmpleados(db_manager)  # Compartido por reconocimiento y asistencia
+            escritor = EscritorEventos(db_manager)        # Escrituras fuera del hilo de reconocimiento
+            estado = None
+        face_engine = FaceRecognitionEngine(directorio)
+        attendance_manager = AttendanceManager(directorio, estado_asistencia=estado, escritor=escritor)
+        camera_display = CameraDisplay(procesos=workers)
         message_handler = MessageHandler()
         
         print("B Componentes inicializados correctamente")
         
         # Verificar y crear base de datos si es necesario
         print("Verificando base de datos...")
-        db_manager.verificar_tablas()
-        print("B Base de datos verificada")
+        try:
+            db_manager.verificar_tablas()
+            print("B Base de datos verificada")
+        except Exception:
+            if not offline:
+                raise
+            print("⚠ Base central no disponible, se continúa con el almacén local")
+        escritor.iniciar()  # En modo offline también realiza la primera sincronización
         
-        # Cargar caras conocidas
+        # Cargar directorio y caras conocidas
         print("Cargando empleados registrados...")
+        directorio.cargar()
+        directorio.iniciar_actualizacion()
+        attendance_manager.estado_asistencia.calentar()
         if not face_engine.load_known_faces():
             message_handler.add_message("Advertencia: No se encontraron empleados registrados", 'warning')
             print("⚠ No se encontraron empleados registrados")
@@ -66,13 +94,13 @@ def setup_system():
         print(f"X Error durante la inicialización: {e}")
         return None
 
-def run_entry_mode():
+def run_entry_mode(offline=False, workers=0):
     """Ejecuta el sistema en modo INGRESO"""
     print("\n" + "=" * 30)
     print("MODO: CONTROL DE INGRESOS")
     print("=" * 30)
     
-    components = setup_system()
+    components = setup_system(offline, workers)
     if not components:
         return False
     
@@ -95,14 +123,16 @@ def run_entry_mode():
     except Exception as e:
         print(f"\nError durante la ejecución: {e}")
         return False
+    finally:
+        attendance_manager.cerrar()
 
-def run_exit_mode():
+def run_exit_mode(offline=False, workers=0):
     """Ejecuta el sistema en modo EGRESO"""
     print("\n" + "=" * 30)
     print("MODO: CONTROL DE EGRESOS")
     print("=" * 30)
     
-    components = setup_system()
+    components = setup_system(offline, workers)
     if not components:
         return False
     
@@ -125,6 +155,32 @@ def run_exit_mode():
     except Exception as e:
         print(f"\nError durante la ejecución: {e}")
         return False
+    finally:
+        attendance_manager.cerrar()
+
+def run_multi_stream(fuentes, offline=False, workers=0):
+    """Ejecuta un único proceso que atiende varias cámaras de ingreso y egreso"""
+    print("\n" + "=" * 30)
+    print(f"MODO: MULTI-CÁMARA ({len(fuentes)} fuentes)")
+    print("=" * 30)
+    
+    components = setup_system(offline, workers)
+    if not components:
+        return False
+    
+    face_engine, attendance_manager, _camera_display, _message_handler = components
+    servidor = ServidorCamaras(fuentes, face_engine, attendance_manager, procesos=workers)
+    
+    print("\nIniciando servidor de cámaras (Ctrl+C para salir)...")
+    print("-" * 50)
+    
+    try:
+        return servidor.run()
+    except Exception as e:
+        print(f"\nError durante la ejecución: {e}")
+        return False
+    finally:
+        attendance_manager.cerrar()
 
 def show_system_info():
     """Muestra información del sistema"""
@@ -156,6 +212,9 @@ Ejemplos de uso:
   python main.py                    # Modo ingreso (por defecto)
   python main.py --mode entry       # Modo ingreso explícito
   python main.py --mode exit        # Modo egreso
+  python main.py --offline          # Modo ingreso con almacén local sincronizado
+  python main.py --workers 4        # Modo ingreso usando 4 procesos de reconocimiento
+  python main.py --source puerta1=entry:0 --source puerta2=exit:rtsp://camara2/stream
   python main.py --info             # Mostrar información del sistema
         """
     )
@@ -165,6 +224,20 @@ Ejemplos de uso:
                        default='entry',
                        help='Modo de operación: entry (ingreso) o exit (egreso)')
     
+    parser.add_argument('--offline',
+                       action='store_true',
+                       help='Usar el almacén local (SQLite) y sincronizar con PostgreSQL en segundo plano')
+    
+    parser.add_argument('--workers',
+                       type=int,
+                       default=RECONOCIMIENTO_PROCESOS,
+                       help='Procesos de reconocimiento en paralelo (0 = hilo único)')
+    
+    parser.add_argument('--source',
+                       action='append',
+                       metavar='[NOMBRE=]MODO:ORIGEN',
+                       help='Fuente de video para el modo multi-cámara (repetible)')
+    
     parser.add_argument('--info',
                        action='store_true',
                        help='Mostrar información del sistema y salir')
@@ -178,10 +251,17 @@ Ejemplos de uso:
     
     # Ejecutar según el modo seleccionado
     try:
-        if args.mode == 'entry':
-            success = run_entry_mode()
+        if args.source:
+            try:
+                fuentes = [parsear_fuente(texto, i + 1) for i, texto in enumerate(args.source)]
+            except ValueError as e:
+                print(f"Error: {e}")
+                return 1
+            success = run_multi_stream(fuentes, args.offline, args.workers)
+        elif args.mode == 'entry':
+            success = run_entry_mode(args.offline, args.workers)
         elif args.mode == 'exit':
-            success = run_exit_mode()
+            success = run_exit_mode(args.offline, args.workers)
         else:
             print(f"Error: Modo '{args.mode}' no reconocido")
             return 1
@@ -0,0 +1,79 @@
+import threading
+import time
+import numpy as np
+
+
+class BufferFrames:
+    """
+    Buffer circular de frames preasignado para pasar frames entre captura,
+    reconocimiento y visualización sin copiarlos ni alocar por frame.
+
+    La captura escribe directamente en un slot libre (reservar/publicar) y los
+    lectores toman el último frame publicado (tomar_ultimo/liberar). Un slot
+    tomado por algún lector no se reutiliza hasta que todos lo liberen.
+    """
+
+    def __init__(self, forma, slots=4, aviso=None):
+        self.frames = np.empty((slots,) + tuple(forma), dtype=np.uint8)
+        self._seq = [0] * slots       # seq del frame que contiene cada slot
+        self._publicado_en = [0.0] * slots  # Momento de captura de cada slot (para medir latencia)
+        self._lectores = [0] * slots  # Lectores que tienen tomado cada slot
+        self._ultimo = None           # Slot del último frame publicado
+        self._seq_actual = 0
+        self._condicion = threading.Condition()
+        self._aviso = aviso  # threading.Event opcional compartido entre varios buffers
+
+    @property
+    def forma(self):
+        return self.frames.shape[1:]
+
+    @property
+    def ultimo_seq(self):
+        """seq del último frame publicado (0 si todavía no hay ninguno)"""
+        return self._seq_actual
+
+    def reservar(self):
+        """Devuelve (indice, vista) de un slot donde escribir el próximo frame"""
+        with self._condicion:
+            while True:
+                for indice in range(len(self.frames)):
+                    if indice != self._ultimo and self._lectores[indice] == 0:
+                        return indice, self.frames[indice]
+                # Todos los slots en uso: esperar a que algún lector libere
+                self._condicion.wait(0.1)
+
+    def publicar(self, indice):
+        """Marca el slot como el último frame disponible"""
+        with self._condicion:
+            self._seq_actual += 1
+            self._seq[indice] = self._seq_actual
+            self._publicado_en[indice] = time.time()
+            self._ultimo = indice
+            self._condicion.notify_all()
+            if self._aviso:
+                self._aviso.set()
+            return self._seq_actual
+
+    def tomar_ultimo(self, posterior_a=0, timeout=None):
+        """
+        Toma el último frame publicado con seq mayor a posterior_a.
+
+        Returns:
+            tuple | None: (seq, indice, vista) o None si no llegó ninguno en timeout.
+                          La vista es válida hasta llamar a liberar(indice).
+        """
+        with self._condicion:
+            if not self._condicion.wait_for(lambda: self._seq_actual > posterior_a, timeout):
+                return None
+            indice = self._ultimo
+            self._lectores[indice] += 1
+            return self._seq[indice], indice, self.frames[indice]
+
+    def publicado_en(self, indice):
+        """Momento en que se publicó el frame del slot (válido mientras esté tomado)"""
+        return self._publicado_en[indice]
+
+    def liberar(self, indice):
+        with self._condicion:
+            self._lectores[indice] -= 1
+            self._condicion.notify_all()
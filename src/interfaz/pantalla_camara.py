@@ -1,45 +1,72 @@
 import cv2
+import numpy as np
+import os
 import threading
 import time
 from datetime import datetime
 from ..logica.config import (
     CAMERA_WIDTH, CAMERA_HEIGHT, GROSOR_MARCO_CARA, 
-    GROSOR_FUENTE_MARCO, RECOGNITION_SLEEP
+    GROSOR_FUENTE_MARCO, RECOGNITION_SLEEP, RECONOCIMIENTO_PROCESOS
 )
+from ..logica.pipeline_reconocimiento import PipelineReconocimiento
 from ..utils.time_utils import determinar_turno_actual
 from .manejador_mensajes import MessageHandler
+from .buffer_frames import BufferFrames
+from .planificador_frames import PlanificadorFrames
 
 
 class CameraDisplay:
-    def __init__(self):
+    def __init__(self, procesos=RECONOCIMIENTO_PROCESOS, aviso_frames=None):
+        self.procesos = procesos  # > 0: reconocimiento en un pool de procesos (modo throughput)
+        self.aviso_frames = aviso_frames  # Event a señalar con cada frame (servidor multi-cámara)
         self.frame_lock = threading.Lock()
-        self.current_frame = None
+        self.buffer = None          # Buffer circular de frames compartido por los hilos
+        self.intervalo_lectura = 0  # Segundos entre lecturas (solo para archivos de video)
+        self.display_frame = None   # Frame propio de la visualización (se dibuja encima)
+        self.planificador = PlanificadorFrames()  # Cuándo reconocer y estadísticas de FPS/latencia
+        self.compuerta = None       # DetectorMovimiento del motor (para mostrar sus contadores)
         self.current_results = []
         self.running = False
         self.video = None
         self.last_access_status = {}  # Diccionario para guardar el último estado de acceso por empleado
         
-    def setup_camera(self):
-        """Configura e inicializa la cámara"""
-        self.video = cv2.VideoCapture(0)
+    def setup_camera(self, origen=0):
+        """Configura e inicializa la cámara (índice de dispositivo, archivo o URL RTSP)"""
+        self.video = cv2.VideoCapture(origen)
         if not self.video.isOpened():
             return False
             
         self.video.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
         self.video.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+        
+        # El primer frame define el tamaño real entregado por la cámara
+        ret, frame = self.video.read()
+        if not ret:
+            return False
+        self.buffer = BufferFrames(frame.shape, aviso=self.aviso_frames)
+        self.display_frame = frame.copy()  # Se muestra mientras no llegue otro
+        
+        # Un archivo se lee a su FPS nominal (una cámara ya entrega a su ritmo)
+        fps = self.video.get(cv2.CAP_PROP_FPS)
+        self.intervalo_lectura = 1.0 / fps if isinstance(origen, str) and os.path.isfile(origen) and fps > 0 else 0
         return True
     
     def capture_thread(self, message_handler):
         """Hilo para capturar frames de la cámara"""
         try:
             while self.running:
-                ret, frame = self.video.read()
+                # Leer directamente sobre un slot libre del buffer (sin alocar ni copiar)
+                indice, slot = self.buffer.reservar()
+                ret, frame = self.video.read(slot)
                 if not ret:
                     message_handler.add_message("Error: No se pudo leer el frame de la cámara", 'error')
                     break
+                if frame is not slot:
+                    np.copyto(slot, frame)
                 
-                with self.frame_lock:
-                    self.current_frame = frame.copy()
+                self.buffer.publicar(indice)
+                if self.intervalo_lectura:
+                    time.sleep(self.intervalo_lectura)
                     
         except Exception as e:
             message_handler.add_message(f"Error en hilo de captura: {e}", 'error')
@@ -48,75 +75,115 @@ class CameraDisplay:
         """Hilo para reconocimiento facial y procesamiento de asistencia"""
         try:
             while self.running:
-                time.sleep(RECOGNITION_SLEEP)
+                # Despierta con cada frame nuevo y toma el más reciente (o espera en reposo)
+                tomado = self.planificador.siguiente(self.buffer)
+                if tomado is None:
+                    continue
+                _seq, indice, frame, capturado_en = tomado
                 
-                with self.frame_lock:
-                    if self.current_frame is None:
-                        continue
-                    frame = self.current_frame.copy()
+                # Reconocer caras (solo lectura del slot; se libera al terminar)
+                try:
+                    matches = face_engine.recognize_faces(frame)
+                finally:
+                    self.buffer.liberar(indice)
+                self.procesar_coincidencias(matches, attendance_manager, message_handler, mode)
+                self.planificador.registrar(capturado_en, len(matches))
+                    
+        except Exception as e:
+            message_handler.add_message(f"Error en hilo de reconocimiento: {e}", 'error')
+    
+    def procesar_coincidencias(self, matches, attendance_manager, message_handler, mode='entry'):
+        """Procesa la asistencia de las caras de un frame y actualiza los resultados a mostrar"""
+        # Procesar asistencia para cada cara reconocida
+        for empleado_id, nombre, face_location in matches:
+            if empleado_id:  # Solo si se reconoció al empleado
+                # Actualizar que la persona fue vista
+                message_handler.update_person_seen(empleado_id)
                 
-                # Reconocer caras
-                matches = face_engine.recognize_faces(frame)
+                # Procesar según el modo
+                if mode == 'entry':
+                    result = attendance_manager.process_entry(empleado_id, nombre)
+                else:  # mode == 'exit'
+                    result = attendance_manager.process_exit(empleado_id, nombre)
                 
-                # Procesar asistencia para cada cara reconocida
-                for empleado_id, nombre, face_location in matches:
-                    if empleado_id:  # Solo si se reconoció al empleado
-                        # Actualizar que la persona fue vista
-                        message_handler.update_person_seen(empleado_id)
-                        
-                        # Procesar según el modo
-                        if mode == 'entry':
-                            result = attendance_manager.process_entry(empleado_id, nombre)
-                        else:  # mode == 'exit'
-                            result = attendance_manager.process_exit(empleado_id, nombre)
-                        
-                        # Guardar el estado de acceso para usar en draw_face_rectangles
-                        if result and 'type' in result:
-                            self.last_access_status[empleado_id] = result['type']
-                        
-                        # Mostrar mensaje si hay resultado
-                        if result and 'message' in result:
-                            result_empleado_id = result.get('empleado_id')
-                            if result_empleado_id is not None:
-                                # Mensaje persistente (ligado al empleado específico)
-                                message_handler.add_persistent_message(
-                                    result_empleado_id, result['message'], result.get('type', 'info')
-                                )
-                            else:
-                                # Mensaje temporal
-                                message_handler.add_temporary_message(
-                                    result['message'], result.get('type', 'info')
-                                )
-                    else:  # 👈 Caso NO reconocido
-                                # Solo procesar desconocidos si no se procesó recientemente
-                        #if "desconocido" not in self.last_access_status:
-                            result = attendance_manager.process_entry(None, nombre or "Desconocido")
-                        #else:
-                        #    result = None
-    
-                    # Guardar el estado de acceso para usar en draw_face_rectangles
-                    if result and 'type' in result:
-                            key = empleado_id if empleado_id else "desconocido"
-                            self.last_access_status[key] = result['type']
-
-                    # Mostrar mensaje si hay resultado
-                    if result and 'message' in result:
-                        result_empleado_id = result.get('empleado_id')
-                        if result_empleado_id is not None:
-                            message_handler.add_persistent_message(
+                # Guardar el estado de acceso para usar en draw_face_rectangles
+                if result and 'type' in result:
+                    self.last_access_status[empleado_id] = result['type']
+                
+                # Mostrar mensaje si hay resultado
+                if result and 'message' in result:
+                    result_empleado_id = result.get('empleado_id')
+                    if result_empleado_id is not None:
+                        # Mensaje persistente (ligado al empleado específico)
+                        message_handler.add_persistent_message(
                             result_empleado_id, result['message'], result.get('type', 'info')
                         )
-                        else:
-                            message_handler.add_temporary_message(
+                    else:
+                        # Mensaje temporal
+                        message_handler.add_temporary_message(
                             result['message'], result.get('type', 'info')
                         )
+            else:  # 👈 Caso NO reconocido
+                        # Solo procesar desconocidos si no se procesó recientemente
+                #if "desconocido" not in self.last_access_status:
+                    result = attendance_manager.process_entry(None, nombre or "Desconocido")
+                #else:
+                #    result = None
+    
+            # Guardar el estado de acceso para usar en draw_face_rectangles
+            if result and 'type' in result:
+                    key = empleado_id if empleado_id else "desconocido"
+                    self.last_access_status[key] = result['type']
+
+            # Mostrar mensaje si hay resultado
+            if result and 'message' in result:
+                result_empleado_id = result.get('empleado_id')
+                if result_empleado_id is not None:
+                    message_handler.add_persistent_message(
+                    result_empleado_id, result['message'], result.get('type', 'info')
+                )
+                else:
+                    message_handler.add_temporary_message(
+                    result['message'], result.get('type', 'info')
+                )
+        
+        # Actualizar resultados para display
+        with self.frame_lock:
+            self.current_results = matches
+    
+    def recognition_pipeline_thread(self, face_engine, attendance_manager, message_handler, mode='entry'):
+        """Hilo de reconocimiento con detección y encoding repartidos en el pool de procesos"""
+        pipeline = PipelineReconocimiento(self.procesos, self.buffer.forma)
+        pipeline.iniciar()
+        capturas = {}  # seq del pipeline -> momento de captura del frame
+        try:
+            while self.running:
+                # Sin frames en vuelo, esperar un frame nuevo; si no, solo mirar si hay uno
+                tomado = self.planificador.siguiente(self.buffer, timeout=0 if pipeline.en_vuelo() else 0.5)
+                if tomado is not None:
+                    _seq, indice, frame, capturado_en = tomado
+                    try:
+                        # Escena quieta: no ocupar un proceso; si no, enviar si hay slot libre
+                        seq = pipeline.enviar(frame) if face_engine.debe_detectar(frame) else False
+                    finally:
+                        self.buffer.liberar(indice)
+                    if seq is False:
+                        continue
+                    if seq is None:
+                        self.planificador.estadisticas.descartados += 1
+                    else:
+                        capturas[seq] = capturado_en
                 
-                # Actualizar resultados para display
-                with self.frame_lock:
-                    self.current_results = matches
+                # Resultados en orden de frame; el seguimiento y la asistencia quedan en este hilo
+                for seq, face_locations, face_encodings in pipeline.resultados(timeout=RECOGNITION_SLEEP):
+                    matches = face_engine.identificar_caras(face_locations, face_encodings)
+                    self.procesar_coincidencias(matches, attendance_manager, message_handler, mode)
+                    self.planificador.registrar(capturas.pop(seq), len(matches))
                     
         except Exception as e:
             message_handler.add_message(f"Error en hilo de reconocimiento: {e}", 'error')
+        finally:
+            pipeline.detener()
     
     def draw_face_rectangles(self, frame, results):
         """Dibuja rectángulos alrededor de las caras detectadas"""
@@ -219,6 +286,14 @@ class CameraDisplay:
         modo_texto = "INGRESO" if mode == 'entry' else "EGRESO"
         info_text = f"{hora_actual} - Turno: {turno_actual} - {modo_texto}"
         
+        # Rendimiento del reconocimiento (FPS alcanzado y latencia captura -> resultado)
+        resumen = self.planificador.estadisticas.resumen()
+        if resumen['latencia_p50_ms'] is not None:
+            estado = " (reposo)" if self.planificador.en_reposo else ""
+            info_text += f" - Rec: {resumen['fps_procesado']:.1f} fps, {resumen['latencia_p50_ms']:.0f} ms{estado}"
+        if self.compuerta is not None:
+            info_text += f" - Sin mov.: {self.compuerta.saltados}"
+        
         # Calcular posición
         font_scale = 0.5
         thickness = 1
@@ -243,6 +318,7 @@ class CameraDisplay:
             return False
         
         self.running = True
+        self.compuerta = face_engine.compuerta
         
         # Iniciar hilos
         capture_thread = threading.Thread(
@@ -252,7 +328,7 @@ class CameraDisplay:
         )
         
         recognition_thread = threading.Thread(
-            target=self.recognition_thread,
+            target=self.recognition_pipeline_thread if self.procesos > 0 else self.recognition_thread,
             args=(face_engine, attendance_manager, message_handler, mode),
             daemon=True
         )
@@ -261,20 +337,30 @@ class CameraDisplay:
         recognition_thread.start()
         
         # Bucle principal de visualización
+        ultimo_seq = 0
         try:
             while self.running:
-                with self.frame_lock:
-                    if self.current_frame is None:
-                        time.sleep(0.1)
-                        continue
-                    frame = self.current_frame.copy()
-                    results = self.current_results.copy()
-                
-                # Dibujar elementos en el frame
-                self.draw_face_rectangles(frame, results)
-                self.draw_center_message(frame, message_handler)
-                self.draw_temporary_messages(frame, message_handler)
-                self.draw_info_panel(frame, mode)
+                tomado = self.buffer.tomar_ultimo(ultimo_seq, timeout=0.1)
+                frame = self.display_frame
+                if tomado is not None:
+                    ultimo_seq, indice, slot = tomado
+                    
+                    # Copiar al buffer propio de la visualización y devolver el slot de inmediato
+                    np.copyto(frame, slot)
+                    self.buffer.liberar(indice)
+                    with self.frame_lock:
+                        results = self.current_results.copy()
+                    
+                    # Dibujar elementos en el frame
+                    self.draw_face_rectangles(frame, results)
+                    self.draw_center_message(frame, message_handler)
+                    self.draw_temporary_messages(frame, message_handler)
+                    self.draw_info_panel(frame, mode)
+                elif not capture_thread.is_alive():
+                    # La cámara falló o se desconectó: no van a llegar más frames
+                    break
+                # Sin frame nuevo se vuelve a mostrar el último, pero la ventana
+                # sigue atendiendo eventos ('q', cierre)
                 
                 # Mostrar frame
                 cv2.imshow("Sistema de Control de Asistencia", frame)
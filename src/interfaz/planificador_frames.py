@@ -0,0 +1,89 @@
+import time
+from collections import deque
+from ..logica.config import RECONOCIMIENTO_FPS_REPOSO, RECONOCIMIENTO_INACTIVO_TRAS
+
+
+class EstadisticasReconocimiento:
+    """FPS de reconocimiento alcanzado y latencia captura->resultado sobre una ventana reciente"""
+
+    def __init__(self, ventana=200):
+        self.procesados = 0
+        self.descartados = 0                     # Frames que llegaron y nunca se procesaron
+        self.latencias = deque(maxlen=ventana)   # Segundos desde la captura hasta el resultado
+        self.finalizados = deque(maxlen=ventana)
+
+    def registrar(self, capturado_en):
+        ahora = time.time()
+        self.procesados += 1
+        self.latencias.append(ahora - capturado_en)
+        self.finalizados.append(ahora)
+
+    def fps(self, intervalo=5.0):
+        ahora = time.time()
+        return sum(1 for t in self.finalizados if ahora - t <= intervalo) / intervalo
+
+    def resumen(self, intervalo=5.0):
+        latencias = sorted(self.latencias)
+        return {
+            'fps_procesado': self.fps(intervalo),
+            'latencia_p50_ms': latencias[len(latencias) // 2] * 1000 if latencias else None,
+            'latencia_p95_ms': latencias[int(len(latencias) * 0.95) - 1] * 1000 if latencias else None,
+            'procesados': self.procesados,
+            'descartados': self.descartados
+        }
+
+
+class PlanificadorFrames:
+    """
+    Decide cuándo reconocer: despierta con cada frame nuevo del buffer y toma
+    siempre el más reciente (los intermedios se descartan). Si no se vio ninguna
+    cara durante un tiempo, limita el reconocimiento a un ritmo de reposo.
+    """
+
+    def __init__(self, fps_reposo=RECONOCIMIENTO_FPS_REPOSO, inactivo_tras=RECONOCIMIENTO_INACTIVO_TRAS):
+        self.intervalo_reposo = 1.0 / fps_reposo if fps_reposo > 0 else 0
+        self.inactivo_tras = inactivo_tras
+        self.ultimo_seq = 0
+        self.ultima_cara_en = time.time()
+        self.procesado_en = 0.0
+        self.estadisticas = EstadisticasReconocimiento()
+
+    @property
+    def en_reposo(self):
+        return time.time() - self.ultima_cara_en > self.inactivo_tras
+
+    def espera_restante(self):
+        """Segundos que faltan para poder procesar otro frame (0 si ya se puede)"""
+        if not self.en_reposo:
+            return 0.0
+        return max(0.0, self.procesado_en + self.intervalo_reposo - time.time())
+
+    def siguiente(self, buffer, timeout=0.5):
+        """
+        Espera un frame posterior al último procesado y toma el más reciente.
+
+        Returns:
+            tuple | None: (seq, indice, frame, capturado_en) o None si no hubo
+                          frame nuevo en timeout (el llamador debe liberar indice)
+        """
+        espera = self.espera_restante()
+        if espera:
+            time.sleep(min(espera, timeout))
+            if self.espera_restante():
+                return None
+
+        tomado = buffer.tomar_ultimo(self.ultimo_seq, timeout=timeout)
+        if tomado is None:
+            return None
+        seq, indice, frame = tomado
+        if self.ultimo_seq:
+            self.estadisticas.descartados += seq - self.ultimo_seq - 1
+        self.ultimo_seq = seq
+        return seq, indice, frame, buffer.publicado_en(indice)
+
+    def registrar(self, capturado_en, cantidad_caras):
+        """Registra un frame procesado; ver caras saca al planificador del reposo"""
+        self.procesado_en = time.time()
+        if cantidad_caras:
+            self.ultima_cara_en = self.procesado_en
+        self.estadisticas.registrar(capturado_en)
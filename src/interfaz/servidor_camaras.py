@@ -0,0 +1,251 @@
+import threading
+import time
+import numpy as np
+from ..logica.config import RECOGNITION_SLEEP, SERVIDOR_ESTADISTICAS_CADA
+from ..logica.pipeline_reconocimiento import PipelineReconocimiento
+from ..logica.seguimiento_caras import SeguidorCaras
+from ..logica.detector_movimiento import DetectorMovimiento
+from ..logica.config import MOVIMIENTO_HABILITADO
+from .pantalla_camara import CameraDisplay
+from .manejador_mensajes import MessageHandler
+from .planificador_frames import PlanificadorFrames
+
+
+def parsear_fuente(texto, numero):
+    """
+    Convierte '[nombre=]modo:origen' en (nombre, origen, modo).
+    origen puede ser un índice de dispositivo, un archivo o una URL RTSP.
+    """
+    cabecera, _, origen = texto.partition(':')
+    nombre, _, modo = cabecera.rpartition('=')
+    if modo not in ('entry', 'exit') or not origen:
+        raise ValueError(f"Fuente inválida '{texto}' (formato: [nombre=]entry|exit:origen)")
+
+    origen = int(origen) if origen.isdigit() else origen
+    return nombre or f"{modo}-{numero}", origen, modo
+
+
+class FlujoCamara:
+    """Estado de una fuente de video servida: captura, seguimiento propio y estadísticas"""
+
+    def __init__(self, nombre, origen, modo, aviso_frames=None):
+        self.nombre = nombre
+        self.origen = origen
+        self.modo = modo
+        # Captura al buffer y procesamiento de coincidencias
+        self.display = CameraDisplay(procesos=0, aviso_frames=aviso_frames)
+        self.message_handler = MessageHandler()
+        self.seguidor = SeguidorCaras()
+        self.compuerta = DetectorMovimiento() if MOVIMIENTO_HABILITADO else None  # Fondo propio de la cámara
+        self.planificador = PlanificadorFrames()  # Último frame, reposo y estadísticas del flujo
+        self.atendido_en = 0.0     # Última vez que se le asignó un frame (para el reparto justo)
+        self.en_proceso = False    # Un solo frame en vuelo por flujo (el seguidor requiere orden)
+        self.hilo_captura = None
+
+    @property
+    def activo(self):
+        return self.hilo_captura is not None and self.hilo_captura.is_alive()
+
+    def tiene_frame_nuevo(self):
+        """Hay un frame sin procesar y el flujo no está esperando su ritmo de reposo"""
+        return (not self.en_proceso and self.display.buffer.ultimo_seq > self.planificador.ultimo_seq
+                and not self.planificador.espera_restante())
+
+    def estadisticas(self, capturados_antes, intervalo):
+        """FPS de captura y de reconocimiento y latencia captura->resultado"""
+        return {
+            'nombre': self.nombre,
+            'modo': self.modo,
+            'activo': self.activo,
+            'reposo': self.planificador.en_reposo,
+            'fps_captura': (self.display.buffer.ultimo_seq - capturados_antes) / intervalo,
+            'sin_movimiento': self.compuerta.saltados if self.compuerta else 0,
+            **self.planificador.estadisticas.resumen(intervalo)
+        }
+
+
+class ServidorCamaras:
+    """
+    Un proceso que atiende varias fuentes de video (entrada o salida) compartiendo
+    un único motor de reconocimiento, galería de embeddings, lógica de asistencia
+    y pool de conexiones. El reconocimiento se reparte entre las fuentes con frames
+    nuevos atendiendo primero a la que hace más tiempo no recibe turno.
+    """
+
+    def __init__(self, fuentes, face_engine, attendance_manager, procesos=0):
+        self._nuevo_frame = threading.Event()  # Lo señala cualquier cámara al publicar un frame
+        self.flujos = [FlujoCamara(nombre, origen, modo, self._nuevo_frame) for nombre, origen, modo in fuentes]
+        self.face_engine = face_engine
+        self.attendance_manager = attendance_manager
+        self.procesos = procesos
+        self.running = False
+        self._lock = threading.Lock()
+
+    def _siguiente_flujo(self):
+        """Flujo con frame nuevo que hace más tiempo no es atendido (None si no hay)"""
+        with self._lock:
+            candidatos = [flujo for flujo in self.flujos if flujo.activo and flujo.tiene_frame_nuevo()]
+            if not candidatos:
+                return None
+            flujo = min(candidatos, key=lambda f: f.atendido_en)
+            flujo.atendido_en = time.time()
+            flujo.en_proceso = True
+            return flujo
+
+    def _tomar_frame(self, flujo):
+        tomado = flujo.planificador.siguiente(flujo.display.buffer, timeout=0)
+        if tomado is None:
+            flujo.en_proceso = False
+            return None
+        _seq, indice, frame, capturado_en = tomado
+        return indice, frame, capturado_en
+
+    def _esperar_frame(self):
+        """Bloquea hasta que alguna cámara publique un frame (o timeout)"""
+        self._nuevo_frame.wait(0.5)
+
+    def _procesar(self, flujo, matches, capturado_en):
+        flujo.display.procesar_coincidencias(matches, self.attendance_manager, flujo.message_handler, flujo.modo)
+        flujo.planificador.registrar(capturado_en, len(matches))
+        flujo.en_proceso = False
+
+    def recognition_thread(self):
+        """Reconocimiento en este proceso, un frame por vez repartido entre las fuentes"""
+        while self.running:
+            self._nuevo_frame.clear()
+            flujo = self._siguiente_flujo()
+            if flujo is None:
+                self._esperar_frame()
+                continue
+
+            tomado = self._tomar_frame(flujo)
+            if tomado is None:
+                continue
+            indice, frame, capturado_en = tomado
+            try:
+                matches = self.face_engine.recognize_faces(frame, seguidor=flujo.seguidor, compuerta=flujo.compuerta)
+            except Exception as e:
+                flujo.message_handler.add_message(f"Error reconociendo en {flujo.nombre}: {e}", 'error')
+                matches = []
+            finally:
+                flujo.display.buffer.liberar(indice)
+            self._procesar(flujo, matches, capturado_en)
+
+    def recognition_pipeline_thread(self):
+        """Reconocimiento en el pool de procesos; los resultados vuelven al flujo de origen"""
+        forma_maxima = max((flujo.display.buffer.forma for flujo in self.flujos if flujo.display.buffer),
+                           key=lambda forma: int(np.prod(forma)))
+        pipeline = PipelineReconocimiento(self.procesos, forma_maxima)
+        pipeline.iniciar()
+        en_vuelo = {}  # seq del pipeline -> (flujo, momento de captura)
+        try:
+            while self.running:
+                # Llenar los slots libres con frames de las fuentes, por turno
+                self._nuevo_frame.clear()
+                while True:
+                    flujo = self._siguiente_flujo()
+                    if flujo is None:
+                        break
+                    tomado = self._tomar_frame(flujo)
+                    if tomado is None:
+                        continue
+                    indice, frame, capturado_en = tomado
+                    try:
+                        if not self.face_engine.debe_detectar(frame, flujo.seguidor, flujo.compuerta):
+                            seq = False
+                        else:
+                            seq = pipeline.enviar(frame)
+                    except Exception as e:
+                        flujo.message_handler.add_message(f"Error enviando frame de {flujo.nombre}: {e}", 'error')
+                        seq = False
+                    finally:
+                        flujo.display.buffer.liberar(indice)
+                    if seq is False:
+                        flujo.en_proceso = False  # Escena quieta: no ocupa un proceso
+                        continue
+                    if seq is None:
+                        flujo.en_proceso = False  # Pool lleno: el frame se descarta
+                        flujo.planificador.estadisticas.descartados += 1
+                        break
+                    en_vuelo[seq] = (flujo, capturado_en)
+
+                if not en_vuelo:
+                    self._esperar_frame()
+                    continue
+
+                for seq, face_locations, face_encodings in pipeline.resultados(timeout=RECOGNITION_SLEEP):
+                    flujo, capturado_en = en_vuelo.pop(seq)
+                    try:
+                        matches = self.face_engine.identificar_caras(
+                            face_locations, face_encodings, seguidor=flujo.seguidor
+                        )
+                        self._procesar(flujo, matches, capturado_en)
+                    except Exception as e:
+                        # Un resultado fallido no detiene el reconocimiento de las demás cámaras
+                        flujo.message_handler.add_message(f"Error reconociendo en {flujo.nombre}: {e}", 'error')
+                        flujo.en_proceso = False
+        except Exception as e:
+            print(f"X Error en el pipeline de reconocimiento: {e}")
+        finally:
+            pipeline.detener()
+
+    def estadisticas(self, capturados_antes=None, intervalo=SERVIDOR_ESTADISTICAS_CADA):
+        capturados_antes = capturados_antes or {}
+        return [flujo.estadisticas(capturados_antes.get(flujo.nombre, 0), intervalo)
+                for flujo in self.flujos if flujo.display.buffer]
+
+    def _imprimir_estadisticas(self, estadisticas):
+        print("-" * 96)
+        print(f"{'Fuente':<16}{'Modo':<7}{'Estado':<9}{'FPS cap':>9}{'FPS rec':>9}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'Total':>8}{'Desc.':>8}{'Sin mov.':>10}")
+        for e in estadisticas:
+            p50 = f"{e['latencia_p50_ms']:.0f}" if e['latencia_p50_ms'] is not None else '-'
+            p95 = f"{e['latencia_p95_ms']:.0f}" if e['latencia_p95_ms'] is not None else '-'
+            estado = ('reposo' if e['reposo'] else 'activa') if e['activo'] else 'cerrada'
+            print(f"{e['nombre']:<16}{e['modo']:<7}{estado:<9}"
+                  f"{e['fps_captura']:>9.1f}{e['fps_procesado']:>9.1f}{p50:>10}{p95:>10}"
+                  f"{e['procesados']:>8}{e['descartados']:>8}{e['sin_movimiento']:>10}")
+
+    def run(self):
+        """Abre las fuentes, atiende el reconocimiento y muestra estadísticas periódicas"""
+        for flujo in self.flujos:
+            if not flujo.display.setup_camera(flujo.origen):
+                print(f"X No se pudo abrir la fuente {flujo.nombre} ({flujo.origen})")
+                continue
+            flujo.display.running = True
+            flujo.hilo_captura = threading.Thread(
+                target=flujo.display.capture_thread, args=(flujo.message_handler,), daemon=True
+            )
+            flujo.hilo_captura.start()
+            print(f"B Fuente {flujo.nombre} ({flujo.modo}) abierta: {flujo.origen}")
+
+        if not any(flujo.activo for flujo in self.flujos):
+            print("X Ninguna fuente de video disponible")
+            return False
+
+        self.running = True
+        reconocimiento = threading.Thread(
+            target=self.recognition_pipeline_thread if self.procesos > 0 else self.recognition_thread,
+            daemon=True
+        )
+        reconocimiento.start()
+
+        try:
+            while any(flujo.activo for flujo in self.flujos):
+                capturados = {flujo.nombre: flujo.display.buffer.ultimo_seq
+                              for flujo in self.flujos if flujo.display.buffer}
+                time.sleep(SERVIDOR_ESTADISTICAS_CADA)
+                self._imprimir_estadisticas(self.estadisticas(capturados))
+        except KeyboardInterrupt:
+            print("\nServidor interrumpido por el usuario")
+        finally:
+            self.stop()
+            reconocimiento.join(timeout=5.0)
+        return True
+
+    def stop(self):
+        self.running = False
+        for flujo in self.flujos:
+            flujo.display.running = False
+            if flujo.display.video:
+                flujo.display.video.release()
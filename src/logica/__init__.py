@@ -6,12 +6,14 @@ Módulo de lógica de negocio - Sistema de Control de Asistencia y Producción
 from .administrador_database import DatabaseManager
 from .face_recognition_engine import FaceRecognitionEngine
 from .asistencia_logica import AttendanceManager
+from .directorio_empleados import DirectorioEmpleados
 from . import config
 
 __all__ = [
     'DatabaseManager',
     'FaceRecognitionEngine', 
     'AttendanceManager',
+    'DirectorioEmpleados',
     'ProductionManager',
     'config'
 ]
\ No newline at end of file
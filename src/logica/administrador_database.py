@@ -1,24 +1,45 @@
 import psycopg2
+from psycopg2.extras import execute_values
 import face_recognition
 import numpy as np
 import os
 from datetime import datetime, date, timedelta
-from .config import DB_CONFIG
+from .config import (
+    DB_CONFIG, MUESTRAS_MAX_POR_EMPLEADO, DIRECTORIO_CANAL, TRAMOS_TARDANZA,
+    METRICAS_VENTANA_OEE
+)
+from .pool_conexiones import obtener_pool, PARAMETROS_KEEPALIVE
+import select
+from .indice_embeddings import agregar_a_indice_persistido
+from .rollups import migrar_rollups, refrescar_rollups, trigger_existe
 import io
 
+def _redondear(valor, decimales=2):
+    """Decimal/float de un agregado a float redondeado (0 si el agregado es NULL)"""
+    return round(float(valor), decimales) if valor is not None else 0
+
+
+def _porcentaje(parte, total):
+    return round(parte * 100 / total, 2) if total else 0
+
+
 class DatabaseManager:
-    def __init__(self):
-        self.db_config = DB_CONFIG
+    def __init__(self, db_config=None):
+        self.db_config = db_config or DB_CONFIG
+        self.pool = obtener_pool(self.db_config)  # Compartido por todo el proceso
     
     def _get_connection(self):
-        """Establece conexión con PostgreSQL"""
+        """Obtiene una conexión PostgreSQL del pool compartido"""
         try:
-            conn = psycopg2.connect(**self.db_config)
-            return conn
+            return self.pool.obtener()
         except Exception as e:
             print(f"Error conectando a PostgreSQL: {e}")
             raise
     
+    def _release_connection(self, conexion):
+        """Devuelve la conexión al pool en lugar de cerrarla"""
+        self.pool.liberar(conexion)
+    
     def verificar_tablas(self):
         """Verifica y crea las tablas si no existen"""
         conexion = self._get_connection()
@@ -39,13 +60,209 @@ class DatabaseManager:
                 self._crear_database()
             else:
                 print("Las tablas ya existen.")
+            
+            self._migrar_empleados()
+            self._migrar_muestras()
+            self._migrar_indices_consultas()
+            self._migrar_rollups()
                 
         except Exception as e:
             print(f"Error verificando tablas: {e}")
             conexion.rollback()
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
+    
+    def _migrar_empleados(self):
+        """Agrega la marca de actualización de empleados usada para invalidar cachés"""
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            cursor.execute('''
+            ALTER TABLE empleados
+            ADD COLUMN IF NOT EXISTS Actualizado_En TIMESTAMPTZ NOT NULL DEFAULT now()
+            ''')
+            
+            # Mantener Actualizado_En al día ante cualquier UPDATE
+            cursor.execute('''
+            CREATE OR REPLACE FUNCTION marcar_empleado_actualizado() RETURNS trigger AS $$
+            BEGIN
+                NEW.Actualizado_En := now();
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+            ''')
+            # Solo si falta: recrearlo bloquea empleados en cada arranque de cada tótem
+            if not trigger_existe(cursor, 'trg_empleados_actualizado', 'empleados'):
+                cursor.execute('''
+                CREATE TRIGGER trg_empleados_actualizado
+                BEFORE UPDATE ON empleados
+                FOR EACH ROW EXECUTE FUNCTION marcar_empleado_actualizado()
+                ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_empleados_actualizado ON empleados(Actualizado_En)')
+            
+            # Avisar a los tótems (LISTEN) de cada alta, modificación o baja
+            cursor.execute(f'''
+            CREATE OR REPLACE FUNCTION notificar_cambio_empleado() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM pg_notify('{DIRECTORIO_CANAL}', OLD.ID_Empleado::text);
+                ELSE
+                    PERFORM pg_notify('{DIRECTORIO_CANAL}', NEW.ID_Empleado::text);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            ''')
+            if not trigger_existe(cursor, 'trg_empleados_notificar', 'empleados'):
+                cursor.execute('''
+                CREATE TRIGGER trg_empleados_notificar
+                AFTER INSERT OR UPDATE OR DELETE ON empleados
+                FOR EACH ROW EXECUTE FUNCTION notificar_cambio_empleado()
+                ''')
+            
+            conexion.commit()
+            
+        except Exception as e:
+            print(f"Error migrando tabla empleados: {e}")
+            conexion.rollback()
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def _migrar_muestras(self):
+        """
+        Crea la tabla de muestras adicionales de embeddings (varias por empleado).
+        Agregar o quitar una muestra marca al empleado como actualizado, así los
+        directorios y réplicas locales la detectan con la misma firma de versión.
+        """
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings_empleados (
+                ID_Muestra SERIAL PRIMARY KEY,
+                ID_Empleado INTEGER NOT NULL REFERENCES empleados(ID_Empleado) ON DELETE CASCADE,
+                Embedding BYTEA NOT NULL,
+                Origen VARCHAR(20) NOT NULL DEFAULT 'enrolamiento' CHECK (Origen IN ('enrolamiento', 'auto')),
+                Foto_Path TEXT,
+                Creado_En TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_empleado ON embeddings_empleados(ID_Empleado, ID_Muestra)')
+            
+            cursor.execute('''
+            CREATE OR REPLACE FUNCTION marcar_empleado_por_muestra() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    UPDATE empleados SET Actualizado_En = now() WHERE ID_Empleado = OLD.ID_Empleado;
+                ELSE
+                    UPDATE empleados SET Actualizado_En = now() WHERE ID_Empleado = NEW.ID_Empleado;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            ''')
+            if not trigger_existe(cursor, 'trg_embeddings_empleados', 'embeddings_empleados'):
+                cursor.execute('''
+                CREATE TRIGGER trg_embeddings_empleados
+                AFTER INSERT OR DELETE ON embeddings_empleados
+                FOR EACH ROW EXECUTE FUNCTION marcar_empleado_por_muestra()
+                ''')
+            
+            conexion.commit()
+            
+        except Exception as e:
+            print(f"Error migrando tabla embeddings_empleados: {e}")
+            conexion.rollback()
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def _migrar_indices_consultas(self):
+        """
+        Índices compuestos para las consultas paginadas de la API: cada filtro
+        (empleado, turno, motivo, producto) seguido de (fecha, id), que es el orden
+        de la paginación por clave, así una página se lee sin ordenar ni saltear
+        filas. Las tablas que todavía no existen se omiten.
+        """
+        indices = {
+            'asistencias': [
+                ('idx_asistencias_fecha_id', 'Fecha DESC, ID_Asistencia DESC'),
+                ('idx_asistencias_empleado_fecha', 'ID_Empleado, Fecha DESC, ID_Asistencia DESC'),
+                ('idx_asistencias_turno_fecha', 'Turno, Fecha DESC, ID_Asistencia DESC'),
+            ],
+            'denegaciones': [
+                ('idx_denegaciones_fecha_id', 'fecha DESC, id_denegacion DESC'),
+                ('idx_denegaciones_empleado_fecha', 'id_empleado, fecha DESC, id_denegacion DESC'),
+                ('idx_denegaciones_motivo_fecha', 'motivo, fecha DESC, id_denegacion DESC'),
+            ],
+            'produccion': [
+                ('idx_produccion_fecha_id', 'fecha DESC, id_produccion DESC'),
+                ('idx_produccion_turno_fecha', 'turno, fecha DESC, id_produccion DESC'),
+                ('idx_produccion_producto_fecha', 'producto, fecha DESC, id_produccion DESC'),
+            ],
+        }
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            for tabla, definiciones in indices.items():
+                cursor.execute("SELECT to_regclass(%s)", (tabla,))
+                if cursor.fetchone()[0] is None:
+                    continue
+                for nombre, columnas in definiciones:
+                    cursor.execute(f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla}({columnas})')
+            
+            conexion.commit()
+            
+        except Exception as e:
+            print(f"Error creando índices de consultas: {e}")
+            conexion.rollback()
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def _migrar_rollups(self):
+        """Crea los resúmenes diarios y sus triggers (ver rollups.py)"""
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            migrar_rollups(cursor)
+            conexion.commit()
+            
+        except Exception as e:
+            print(f"Error migrando rollups: {e}")
+            conexion.rollback()
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def refrescar_rollups(self, fecha_desde=None, fecha_hasta=None):
+        """
+        Recalcula los resúmenes diarios del rango desde las tablas crudas.
+        
+        Returns:
+            dict | None: {tabla_rollup: filas escritas}, None si falla
+        """
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            escritas = refrescar_rollups(cursor, fecha_desde, fecha_hasta)
+            conexion.commit()
+            return escritas
+            
+        except Exception as e:
+            print(f"Error refrescando rollups: {e}")
+            conexion.rollback()
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
     
     def _crear_database(self):
         """Crea la base de datos con las tablas necesarias"""
@@ -94,7 +311,7 @@ class DatabaseManager:
             conexion.rollback()
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
     
     def cargar_embeddings(self):
         """Carga todos los embeddings de empleados desde la base de datos"""
@@ -125,7 +342,199 @@ class DatabaseManager:
             return [], [], []
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
+    
+    def cargar_empleados(self, desde=None):
+        """
+        Carga los empleados (datos y embedding) en una sola consulta.
+        Si se indica desde, solo los modificados después de esa marca de Actualizado_En.
+        """
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            query = '''
+            SELECT ID_Empleado, Nombre, Apellido, Departamento, Turno, Foto_Path, Embedding, Actualizado_En
+            FROM empleados
+            '''
+            params = []
+            if desde is not None:
+                query += " WHERE Actualizado_En > %s"
+                params.append(desde)
+            cursor.execute(query, params)
+            
+            empleados = []
+            for fila in cursor.fetchall():
+                empleados.append({
+                    'id': fila[0],
+                    'nombre': fila[1],
+                    'apellido': fila[2],
+                    'nombre_completo': f"{fila[1]} {fila[2]}",
+                    'departamento': fila[3],
+                    'turno': fila[4],
+                    'foto_path': fila[5],
+                    'embedding': np.frombuffer(fila[6], dtype=np.float32),
+                    'actualizado_en': fila[7]
+                })
+            return empleados
+            
+        except Exception as e:
+            print(f"Error cargando empleados: {e}")
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def cargar_muestras(self, ids=None):
+        """
+        Carga las muestras adicionales de embeddings, en orden de alta.
+        
+        Args:
+            ids: limitar a estos empleados (None = todos)
+        
+        Returns:
+            dict | None: {empleado_id: np.ndarray float32 (K, 128)}
+        """
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            query = "SELECT ID_Empleado, Embedding FROM embeddings_empleados"
+            params = []
+            if ids is not None:
+                query += " WHERE ID_Empleado = ANY(%s)"
+                params.append(list(ids))
+            cursor.execute(query + " ORDER BY ID_Empleado, ID_Muestra", params)
+            
+            muestras = {}
+            for empleado_id, embedding in cursor.fetchall():
+                muestras.setdefault(empleado_id, []).append(bytes(embedding))
+            return {empleado_id: np.frombuffer(b''.join(bloques), dtype=np.float32).reshape(len(bloques), -1)
+                    for empleado_id, bloques in muestras.items()}
+            
+        except Exception as e:
+            print(f"Error cargando muestras de embeddings: {e}")
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def agregar_muestras(self, muestras, origen='enrolamiento'):
+        """
+        Agrega muestras de embeddings en una sola transacción. De las automáticas
+        solo se conservan las MUESTRAS_MAX_POR_EMPLEADO más recientes por empleado.
+        
+        Args:
+            muestras: lista de (empleado_id, embedding, foto_path o None)
+            origen: 'enrolamiento' (fotos cargadas por RR.HH.) o 'auto' (capturas en vivo)
+        
+        Returns:
+            bool: True si se guardaron
+        """
+        if not muestras:
+            return True
+        
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            execute_values(cursor, '''
+            INSERT INTO embeddings_empleados (ID_Empleado, Embedding, Origen, Foto_Path)
+            VALUES %s
+            ''', [(empleado_id, psycopg2.Binary(np.asarray(vector, dtype=np.float32).tobytes()), origen, foto_path)
+                  for empleado_id, vector, foto_path in muestras])
+            
+            if origen == 'auto':
+                cursor.execute('''
+                DELETE FROM embeddings_empleados AS e
+                USING (
+                    SELECT ID_Muestra, ROW_NUMBER() OVER (PARTITION BY ID_Empleado ORDER BY ID_Muestra DESC) AS n
+                    FROM embeddings_empleados
+                    WHERE Origen = 'auto' AND ID_Empleado = ANY(%s)
+                ) AS v
+                WHERE e.ID_Muestra = v.ID_Muestra AND v.n > %s
+                ''', (list({m[0] for m in muestras}), MUESTRAS_MAX_POR_EMPLEADO))
+            
+            conexion.commit()
+            return True
+            
+        except Exception as e:
+            print(f"Error agregando muestras de embeddings: {e}")
+            conexion.rollback()
+            return False
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def obtener_ids_empleados(self):
+        """Devuelve el conjunto de IDs de empleados existentes (para detectar bajas)"""
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            cursor.execute("SELECT ID_Empleado FROM empleados")
+            return {fila[0] for fila in cursor.fetchall()}
+            
+        except Exception as e:
+            print(f"Error obteniendo IDs de empleados: {e}")
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def obtener_version_empleados(self):
+        """Firma barata de la tabla empleados: cambia ante altas, bajas o modificaciones"""
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            cursor.execute('''
+            SELECT COUNT(*), COALESCE(MAX(ID_Empleado), 0), MAX(Actualizado_En)
+            FROM empleados
+            ''')
+            return tuple(cursor.fetchone())
+            
+        except Exception as e:
+            print(f"Error obteniendo versión de empleados: {e}")
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def abrir_escucha_empleados(self, canal=DIRECTORIO_CANAL):
+        """
+        Abre una conexión dedicada (fuera del pool, en autocommit) suscripta con LISTEN
+        a los cambios de empleados. Devuelve None si no se pudo abrir.
+        """
+        try:
+            conexion = psycopg2.connect(**{**PARAMETROS_KEEPALIVE, **self.db_config})
+            conexion.autocommit = True
+            with conexion.cursor() as cursor:
+                cursor.execute(f"LISTEN {canal}")
+            return conexion
+        except Exception as e:
+            print(f"No se pudo escuchar cambios de empleados: {e}")
+            return None
+    
+    def esperar_cambios_empleados(self, conexion, timeout):
+        """
+        Espera hasta timeout segundos una notificación de cambios en empleados.
+        
+        Returns:
+            set | None: IDs notificados (vacío si no hubo cambios), None si la conexión se cayó
+        """
+        try:
+            if conexion.closed:
+                return None
+            if not conexion.notifies and select.select([conexion], [], [], timeout) == ([], [], []):
+                return set()
+            conexion.poll()
+            ids = {int(aviso.payload) for aviso in conexion.notifies if aviso.payload.isdigit()}
+            conexion.notifies.clear()
+            return ids
+        except Exception as e:
+            print(f"Escucha de cambios de empleados interrumpida: {e}")
+            return None
     
     def obtener_empleado(self, empleado_id):
         """Obtiene información de un empleado por su ID"""
@@ -158,15 +567,15 @@ class DatabaseManager:
             return None
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
     
-    def verificar_asistencia_hoy(self, empleado_id):
-        """Verifica si el empleado ya registró asistencia hoy"""
+    def verificar_asistencia_hoy(self, empleado_id, fecha=None):
+        """Verifica si el empleado ya registró asistencia hoy (o en la jornada indicada)"""
         conexion = self._get_connection()
         cursor = conexion.cursor()
         
         try:
-            fecha_actual = datetime.now().date().isoformat()
+            fecha_actual = (fecha or datetime.now().date()).isoformat()
             
             cursor.execute('''
             SELECT ID_Asistencia, Hora_Ingreso, Hora_Egreso 
@@ -191,15 +600,15 @@ class DatabaseManager:
             return None
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
     
-    def registrar_ingreso(self, empleado_id, turno, hora_actual, minutos_tarde, observacion):
+    def registrar_ingreso(self, empleado_id, turno, hora_actual, minutos_tarde, observacion, fecha=None):
         """Registra el ingreso de un empleado"""
         conexion = self._get_connection()
         cursor = conexion.cursor()
         
         try:
-            fecha_actual = datetime.now().date().isoformat()
+            fecha_actual = (fecha or datetime.now().date()).isoformat()
             
             cursor.execute('''
             INSERT INTO asistencias 
@@ -218,15 +627,15 @@ class DatabaseManager:
             return None
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
     
-    def registrar_egreso(self, empleado_id, hora_actual):
+    def registrar_egreso(self, empleado_id, hora_actual, fecha=None):
         """Registra el egreso de un empleado"""
         conexion = self._get_connection()
         cursor = conexion.cursor()
         
         try:
-            fecha_actual = datetime.now().date().isoformat()
+            fecha_actual = (fecha or datetime.now().date()).isoformat()
             
             cursor.execute('''
             UPDATE asistencias 
@@ -245,7 +654,29 @@ class DatabaseManager:
             return False
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
+    
+    def cargar_asistencias_desde(self, fecha_desde):
+        """Carga las asistencias con Fecha >= fecha_desde en una sola consulta"""
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            cursor.execute('''
+            SELECT ID_Asistencia, Fecha, ID_Empleado, Hora_Ingreso, Hora_Egreso
+            FROM asistencias
+            WHERE Fecha >= %s
+            ORDER BY ID_Asistencia
+            ''', (fecha_desde,))
+            
+            return cursor.fetchall()
+            
+        except Exception as e:
+            print(f"Error cargando asistencias: {e}")
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
     
     def crear_tabla_denegaciones(self):
         """Crea la tabla de denegaciones si no existe"""
@@ -288,7 +719,7 @@ class DatabaseManager:
             conexion.rollback()
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
 
     def registrar_denegacion(self, motivo, modo_operacion, id_empleado=None, 
                             minutos_tarde=None, turno_esperado=None, turno_detectado=None,
@@ -322,7 +753,101 @@ class DatabaseManager:
             return None
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
+
+    def escribir_eventos_lote(self, eventos, origen=None, ultimo_seq=None):
+        """
+        Escribe un lote de eventos (ingreso, egreso, denegacion) en una sola transacción.
+        Los eventos consecutivos del mismo tipo se agrupan en un INSERT multi-fila,
+        respetando el orden original. Si se indica origen, registra ultimo_seq en la
+        misma transacción para que la reproducción del spool sea exactamente-una-vez.
+        
+        Returns:
+            bool: True si el lote quedó confirmado
+        """
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            grupos = []
+            for evento in eventos:
+                if grupos and grupos[-1][0] == evento['tipo']:
+                    grupos[-1][1].append(evento['datos'])
+                else:
+                    grupos.append((evento['tipo'], [evento['datos']]))
+            
+            for tipo, datos in grupos:
+                if tipo == 'ingreso':
+                    execute_values(cursor, '''
+                    INSERT INTO asistencias 
+                    (Fecha, ID_Empleado, Turno, Hora_Ingreso, Estado_Asistencia, Minutos_Tarde, Observacion)
+                    VALUES %s
+                    ''', [(d['fecha'], d['id_empleado'], d['turno'], d['hora'], True,
+                           d['minutos_tarde'], d['observacion']) for d in datos])
+                elif tipo == 'egreso':
+                    execute_values(cursor, '''
+                    UPDATE asistencias AS a
+                    SET Hora_Egreso = v.hora::time
+                    FROM (VALUES %s) AS v(id_empleado, fecha, hora)
+                    WHERE a.ID_Empleado = v.id_empleado AND a.Fecha = v.fecha::date
+                      AND a.Hora_Egreso IS NULL
+                    ''', [(d['id_empleado'], d['fecha'], d['hora']) for d in datos])
+                elif tipo == 'denegacion':
+                    execute_values(cursor, '''
+                    INSERT INTO denegaciones 
+                    (fecha, hora, id_empleado, motivo, modo_operacion, minutos_tarde, 
+                    turno_esperado, turno_detectado, nombre_detectado, observaciones)
+                    VALUES %s
+                    ''', [(d['fecha'], d['hora'], d.get('id_empleado'), d['motivo'], d['modo_operacion'],
+                           d.get('minutos_tarde'), d.get('turno_esperado'), d.get('turno_detectado'),
+                           d.get('nombre_detectado'), d.get('observaciones')) for d in datos])
+                else:
+                    raise ValueError(f"Tipo de evento desconocido: {tipo}")
+            
+            if origen is not None:
+                cursor.execute('''
+                INSERT INTO eventos_confirmados (origen, ultimo_seq, actualizado_en)
+                VALUES (%s, %s, now())
+                ON CONFLICT (origen) DO UPDATE
+                SET ultimo_seq = EXCLUDED.ultimo_seq, actualizado_en = now()
+                ''', (origen, ultimo_seq))
+            
+            conexion.commit()
+            return True
+            
+        except Exception as e:
+            print(f"Error escribiendo lote de eventos: {e}")
+            conexion.rollback()
+            return False
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def obtener_ultimo_evento_confirmado(self, origen):
+        """Devuelve el último seq confirmado para un origen (0 si no hay), None si falla"""
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS eventos_confirmados (
+                origen TEXT PRIMARY KEY,
+                ultimo_seq BIGINT NOT NULL,
+                actualizado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            ''')
+            cursor.execute("SELECT ultimo_seq FROM eventos_confirmados WHERE origen = %s", (origen,))
+            fila = cursor.fetchone()
+            conexion.commit()
+            return fila[0] if fila else 0
+            
+        except Exception as e:
+            print(f"Error obteniendo último evento confirmado: {e}")
+            conexion.rollback()
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
 
     def obtener_denegaciones_por_empleado(self, id_empleado, fecha_inicio=None, fecha_fin=None):
         """Obtiene las denegaciones de un empleado en un rango de fechas"""
@@ -353,7 +878,7 @@ class DatabaseManager:
             return []
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
 
     def obtener_estadisticas_denegaciones(self, fecha_inicio=None, fecha_fin=None):
         """Obtiene estadísticas de denegaciones"""
@@ -389,7 +914,251 @@ class DatabaseManager:
             return []
         finally:
             cursor.close()
-            conexion.close()
+            self._release_connection(conexion)
+    
+    @staticmethod
+    def _filtros_metricas(alias, fecha_inicio=None, fecha_fin=None, columnas=None, extra=()):
+        """WHERE de las consultas agregadas: período e igualdades sobre columnas (los valores vacíos se ignoran)"""
+        condiciones, params = list(extra), []
+        if fecha_inicio:
+            condiciones.append(f"{alias}.fecha >= %s")
+            params.append(fecha_inicio)
+        if fecha_fin:
+            condiciones.append(f"{alias}.fecha <= %s")
+            params.append(fecha_fin)
+        for columna, valor in (columnas or {}).items():
+            if valor:
+                condiciones.append(f"{alias}.{columna} = %s")
+                params.append(valor)
+        return (f"WHERE {' AND '.join(condiciones)}" if condiciones else ""), params
+
+    def obtener_metricas(self, fecha_inicio=None, fecha_fin=None, turno=None, departamento=None, producto=None):
+        """
+        Calcula los indicadores del tablero desde los resúmenes diarios (rollups):
+        asistencia y puntualidad (total y por turno), distribución de tardanzas,
+        denegaciones por motivo y resumen de OEE (total, por producto y diario con
+        media móvil). Un año de datos son unos cientos de filas por resumen.
+        
+        Returns:
+            dict | None: secciones 'asistencia', 'denegaciones' y 'produccion'; None si falla
+        """
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        filtros = {'turno': turno, 'departamento': departamento}
+        
+        try:
+            # Asistencia: totales y por turno en una sola pasada (GROUPING SETS)
+            where, params = self._filtros_metricas('r', fecha_inicio, fecha_fin, filtros)
+            cursor.execute(f"""
+                SELECT GROUPING(r.turno) = 1 AS es_total,
+                       r.turno,
+                       COALESCE(SUM(r.registros), 0),
+                       COALESCE(SUM(r.presentes), 0),
+                       COALESCE(SUM(r.puntuales), 0),
+                       SUM(r.minutos_tarde) / NULLIF(SUM(r.tardes), 0)
+                FROM rollup_asistencias r
+                {where}
+                GROUP BY GROUPING SETS ((), (r.turno))
+                ORDER BY es_total DESC, r.turno
+            """, params)
+            asistencia = {'por_turno': []}
+            for es_total, turno_fila, total, presentes, puntuales, promedio in cursor.fetchall():
+                if es_total:
+                    asistencia.update({
+                        'total': total,
+                        'presentes': presentes,
+                        'puntuales': puntuales,
+                        'tasa_asistencia': _porcentaje(presentes, total),
+                        'puntualidad': _porcentaje(puntuales, presentes),
+                        'ausentismo': round(100 - _porcentaje(presentes, total), 2) if total else 0,
+                        'tardanza_promedio': _redondear(promedio)
+                    })
+                else:
+                    asistencia['por_turno'].append({'turno': turno_fila, 'total': total,
+                                                    'presentes': presentes, 'puntuales': puntuales})
+            
+            # Mediana y p90 de las tardanzas desde el histograma (percentil discreto)
+            where, params = self._filtros_metricas('r', fecha_inicio, fecha_fin, filtros, extra=['r.minutos_tarde > 0'])
+            cursor.execute(f"""
+                WITH histograma AS (
+                    SELECT r.minutos_tarde, SUM(r.cantidad) AS cantidad
+                    FROM rollup_tardanzas r
+                    {where}
+                    GROUP BY r.minutos_tarde
+                ), acumulado AS (
+                    SELECT minutos_tarde,
+                           SUM(cantidad) OVER (ORDER BY minutos_tarde) AS hasta_aqui,
+                           SUM(cantidad) OVER () AS total
+                    FROM histograma
+                )
+                SELECT MIN(minutos_tarde) FILTER (WHERE hasta_aqui >= 0.5 * total),
+                       MIN(minutos_tarde) FILTER (WHERE hasta_aqui >= 0.9 * total)
+                FROM acumulado
+            """, params)
+            mediana, p90 = cursor.fetchone()
+            asistencia['tardanza_mediana'] = _redondear(mediana)
+            asistencia['tardanza_p90'] = _redondear(p90)
+            
+            # Histograma de tardanzas de los presentes en tramos: tramo 0 = puntual
+            limites = [1] + [limite + 1 for limite in TRAMOS_TARDANZA]
+            where, params = self._filtros_metricas('r', fecha_inicio, fecha_fin, filtros)
+            cursor.execute(f"""
+                SELECT width_bucket(r.minutos_tarde, %s::int[]) AS tramo, SUM(r.cantidad)
+                FROM rollup_tardanzas r
+                {where}
+                GROUP BY tramo
+            """, [limites] + params)
+            cantidades = dict(cursor.fetchall())
+            etiquetas = ['0'] + [f"{desde}-{hasta - 1}" for desde, hasta in zip(limites, limites[1:])] + [f">{TRAMOS_TARDANZA[-1]}"]
+            asistencia['tardanzas'] = [{'tramo': etiqueta, 'cantidad': int(cantidades.get(i, 0))}
+                                       for i, etiqueta in enumerate(etiquetas)]
+            
+            # Denegaciones por motivo (turno y departamento del empleado)
+            where, params = self._filtros_metricas('r', fecha_inicio, fecha_fin, filtros)
+            cursor.execute(f"""
+                SELECT r.motivo, SUM(r.cantidad) AS cantidad
+                FROM rollup_denegaciones r
+                {where}
+                GROUP BY r.motivo
+                HAVING SUM(r.cantidad) > 0
+                ORDER BY cantidad DESC
+            """, params)
+            por_motivo = [{'motivo': motivo, 'cantidad': int(cantidad)} for motivo, cantidad in cursor.fetchall()]
+            denegaciones = {'total': sum(m['cantidad'] for m in por_motivo), 'por_motivo': por_motivo}
+            
+            # Producción: resumen OEE (mismas claves que generar_reporte_resumen) y por producto.
+            # Los promedios se ponderan por registros, igual que AVG sobre la tabla cruda
+            where, params = self._filtros_metricas('r', fecha_inicio, fecha_fin, dict(filtros, producto=producto))
+            cursor.execute(f"""
+                SELECT GROUPING(r.producto) = 1 AS es_total,
+                       r.producto,
+                       COALESCE(SUM(r.registros), 0),
+                       COALESCE(SUM(r.produccion_real), 0),
+                       SUM(r.suma_oee) / NULLIF(SUM(r.registros), 0),
+                       SUM(r.suma_disponibilidad) / NULLIF(SUM(r.registros), 0),
+                       SUM(r.suma_rendimiento) / NULLIF(SUM(r.registros), 0),
+                       SUM(r.suma_calidad) / NULLIF(SUM(r.registros), 0),
+                       MAX(r.mejor_oee), MIN(r.peor_oee),
+                       COALESCE(SUM(r.excelentes), 0), COALESCE(SUM(r.buenos), 0),
+                       COALESCE(SUM(r.regulares), 0), COALESCE(SUM(r.deficientes), 0)
+                FROM rollup_produccion r
+                {where}
+                GROUP BY GROUPING SETS ((), (r.producto))
+                HAVING GROUPING(r.producto) = 1 OR SUM(r.registros) > 0
+                ORDER BY es_total DESC, r.producto
+            """, params)
+            produccion = {'por_producto': []}
+            for (es_total, producto_fila, registros, total_real, oee, disponibilidad, rendimiento, calidad,
+                 mejor, peor, excelentes, buenos, regulares, deficientes) in cursor.fetchall():
+                if es_total:
+                    produccion.update({
+                        'total_registros': registros,
+                        'produccion_total': _redondear(total_real),
+                        'oee_promedio': _redondear(oee),
+                        'disponibilidad_promedio': _redondear(disponibilidad),
+                        'rendimiento_promedio': _redondear(rendimiento),
+                        'calidad_promedio': _redondear(calidad),
+                        'mejor_oee': _redondear(mejor),
+                        'peor_oee': _redondear(peor),
+                        'registros_excelentes': excelentes,
+                        'registros_buenos': buenos,
+                        'registros_regulares': regulares,
+                        'registros_deficientes': deficientes
+                    })
+                else:
+                    produccion['por_producto'].append({'producto': producto_fila, 'registros': registros,
+                                                       'produccion_real': _redondear(total_real),
+                                                       'oee_promedio': _redondear(oee)})
+            
+            # OEE diario con media móvil de los últimos días con datos
+            cursor.execute(f"""
+                SELECT r.fecha,
+                       SUM(r.suma_oee) / SUM(r.registros),
+                       AVG(SUM(r.suma_oee) / SUM(r.registros)) OVER (ORDER BY r.fecha ROWS BETWEEN %s PRECEDING AND CURRENT ROW)
+                FROM rollup_produccion r
+                {where}
+                GROUP BY r.fecha
+                HAVING SUM(r.registros) > 0
+                ORDER BY r.fecha
+            """, [METRICAS_VENTANA_OEE - 1] + params)
+            produccion['oee_diario'] = [{'fecha': fecha.isoformat(), 'oee': _redondear(oee), 'oee_movil': _redondear(movil)}
+                                        for fecha, oee, movil in cursor.fetchall()]
+            
+            return {
+                'periodo': {'desde': fecha_inicio.isoformat() if fecha_inicio else None,
+                            'hasta': fecha_fin.isoformat() if fecha_fin else None},
+                'asistencia': asistencia,
+                'denegaciones': denegaciones,
+                'produccion': produccion
+            }
+            
+        except Exception as e:
+            print(f"Error calculando métricas: {e}")
+            conexion.rollback()
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def obtener_fotos_empleados(self):
+        """Devuelve las rutas de foto ya enroladas (normalizadas) para no repetir altas"""
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            cursor.execute('''
+            SELECT Foto_Path FROM empleados WHERE Foto_Path IS NOT NULL
+            UNION
+            SELECT Foto_Path FROM embeddings_empleados WHERE Foto_Path IS NOT NULL
+            ''')
+            return {os.path.normpath(fila[0]) for fila in cursor.fetchall()}
+            
+        except Exception as e:
+            print(f"Error obteniendo fotos de empleados: {e}")
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+    
+    def agregar_empleados_lote(self, empleados):
+        """
+        Inserta varios empleados ya codificados en una sola transacción (todos o ninguno)
+        y suma sus embeddings al índice persistido.
+        
+        Args:
+            empleados: lista de dicts con nombre, apellido, departamento, turno,
+                       foto_path y embedding (validados previamente)
+        
+        Returns:
+            list | None: IDs asignados en el mismo orden, o None si falló
+        """
+        conexion = self._get_connection()
+        cursor = conexion.cursor()
+        
+        try:
+            ids = execute_values(cursor, '''
+            INSERT INTO empleados (nombre, apellido, departamento, turno, foto_path, embedding)
+            VALUES %s
+            RETURNING id_empleado
+            ''', [(e['nombre'], e['apellido'], e['departamento'], e['turno'], e['foto_path'],
+                   psycopg2.Binary(np.asarray(e['embedding'], dtype=np.float32).tobytes()))
+                  for e in empleados], page_size=len(empleados) or 1, fetch=True)
+            conexion.commit()
+            ids = [fila[0] for fila in ids]
+            
+        except Exception as e:
+            print(f"Error insertando lote de empleados: {e}")
+            conexion.rollback()
+            return None
+        finally:
+            cursor.close()
+            self._release_connection(conexion)
+        
+        try:
+            agregar_a_indice_persistido(np.vstack([e['embedding'] for e in empleados]), ids)
+        except Exception as e:
+            print(f"⚠ No se pudo actualizar el índice de embeddings: {e}")
+        return ids
     
     def agregar_empleado(self, nombre, apellido, departamento, turno, foto_path):
         print(f"=== DATABASEMANAGER - AGREGANDO EMPLEADO ===")
@@ -451,6 +1220,12 @@ class DatabaseManager:
             conn.commit()
             
             print(f"✅ Empleado {nombre} {apellido} agregado exitosamente! ID: {empleado_id}")
+            
+            # Sumar el nuevo embedding al índice persistido sin reconstruirlo
+            try:
+                agregar_a_indice_persistido(encodings[0], [empleado_id])
+            except Exception as e:
+                print(f"⚠ No se pudo actualizar el índice de embeddings: {e}")
             return True
             
         except Exception as e:
@@ -461,4 +1236,4 @@ class DatabaseManager:
             return False
         finally:
             cursor.close()
-            conn.close()
\ No newline at end of file
+            self._release_connection(conn)
\ No newline at end of file
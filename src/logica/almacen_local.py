@@ -0,0 +1,416 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+from .config import DB_RUTA, SINCRONIZACION_CADA, SINCRONIZACION_TAM_LOTE, DIRECTORIO_MARGEN_MARCA
+
+
+class AlmacenLocal:
+    """
+    Almacén embebido (SQLite en DB_RUTA) para que los tótems decidan sin depender
+    de la base central. Mantiene una réplica de empleados, el estado de asistencias
+    recientes y un diario local de eventos (ingresos, egresos, denegaciones) que se
+    sincroniza en ambos sentidos con PostgreSQL.
+
+    Implementa la misma interfaz de lectura y escritura que DatabaseManager, por lo
+    que puede usarse como origen de DirectorioEmpleados / EstadoAsistenciaDiaria y
+    como escritor de AttendanceManager.
+    """
+
+    def __init__(self, ruta=DB_RUTA, db_remoto=None, sincronizar_cada=SINCRONIZACION_CADA):
+        self.ruta = ruta
+        self.db_remoto = db_remoto  # DatabaseManager de PostgreSQL (None = sin sincronización)
+        self.sincronizar_cada = sincronizar_cada
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._crear_tablas()
+        self.origen = self._leer_estado('origen') or self._guardar_estado('origen', f"local-{uuid.uuid4().hex}")
+
+    def _crear_tablas(self):
+        with self._lock:
+            self._conexion.execute('PRAGMA journal_mode=WAL')
+            self._conexion.execute('PRAGMA synchronous=NORMAL')
+            self._conexion.executescript('''
+            CREATE TABLE IF NOT EXISTS replica_empleados (
+                id_empleado INTEGER PRIMARY KEY,
+                nombre TEXT NOT NULL,
+                apellido TEXT NOT NULL,
+                departamento TEXT,
+                turno TEXT,
+                foto_path TEXT,
+                embedding BLOB NOT NULL,
+                actualizado_en TEXT
+            );
+            CREATE TABLE IF NOT EXISTS replica_muestras (
+                id_muestra INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_empleado INTEGER NOT NULL,
+                embedding BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_replica_muestras ON replica_muestras(id_empleado, id_muestra);
+            CREATE TABLE IF NOT EXISTS replica_asistencias (
+                fecha TEXT NOT NULL,
+                id_empleado INTEGER NOT NULL,
+                id_asistencia INTEGER,
+                hora_ingreso TEXT,
+                hora_egreso TEXT,
+                PRIMARY KEY (fecha, id_empleado)
+            );
+            CREATE TABLE IF NOT EXISTS diario_eventos (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL CHECK(tipo IN ('ingreso', 'egreso', 'denegacion')),
+                datos TEXT NOT NULL,
+                creado_en TEXT NOT NULL,
+                sincronizado INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_diario_pendientes ON diario_eventos(sincronizado, seq);
+            CREATE TABLE IF NOT EXISTS estado_sincronizacion (
+                clave TEXT PRIMARY KEY,
+                valor TEXT
+            );
+            ''')
+
+    def _leer_estado(self, clave):
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT valor FROM estado_sincronizacion WHERE clave = ?", (clave,)
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def _guardar_estado(self, clave, valor):
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO estado_sincronizacion (clave, valor) VALUES (?, ?)", (clave, valor)
+            )
+        return valor
+
+    # -----------------------
+    #   Lecturas (interfaz de DatabaseManager)
+    # -----------------------
+    def _fila_a_empleado(self, fila):
+        return {
+            'id': fila[0],
+            'nombre': fila[1],
+            'apellido': fila[2],
+            'nombre_completo': f"{fila[1]} {fila[2]}",
+            'departamento': fila[3],
+            'turno': fila[4],
+            'foto_path': fila[5]
+        }
+
+    def cargar_empleados(self, desde=None):
+        """Carga la réplica local de empleados con sus embeddings"""
+        with self._lock:
+            filas = self._conexion.execute('''
+            SELECT id_empleado, nombre, apellido, departamento, turno, foto_path, embedding, actualizado_en
+            FROM replica_empleados
+            ''' + (" WHERE actualizado_en > ?" if desde else ""), (desde,) if desde else ()).fetchall()
+
+        empleados = []
+        for fila in filas:
+            empleado = self._fila_a_empleado(fila)
+            empleado['embedding'] = np.frombuffer(fila[6], dtype=np.float32)
+            empleado['actualizado_en'] = fila[7]
+            empleados.append(empleado)
+        return empleados
+
+    def cargar_muestras(self, ids=None):
+        """Muestras adicionales replicadas: {empleado_id: (K, 128)}"""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT id_empleado, embedding FROM replica_muestras ORDER BY id_empleado, id_muestra"
+            ).fetchall()
+
+        muestras = {}
+        for empleado_id, embedding in filas:
+            if ids is None or empleado_id in ids:
+                muestras.setdefault(empleado_id, []).append(embedding)
+        return {empleado_id: np.frombuffer(b''.join(bloques), dtype=np.float32).reshape(len(bloques), -1)
+                for empleado_id, bloques in muestras.items()}
+
+    def obtener_version_empleados(self):
+        with self._lock:
+            return tuple(self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(MAX(id_empleado), 0), MAX(actualizado_en) FROM replica_empleados"
+            ).fetchone())
+
+    def obtener_ids_empleados(self):
+        with self._lock:
+            return {fila[0] for fila in self._conexion.execute("SELECT id_empleado FROM replica_empleados")}
+
+    def abrir_escucha_empleados(self):
+        """La réplica local no emite notificaciones: el directorio la consulta periódicamente"""
+        return None
+
+    def obtener_empleado(self, empleado_id):
+        with self._lock:
+            fila = self._conexion.execute('''
+            SELECT id_empleado, nombre, apellido, departamento, turno, foto_path
+            FROM replica_empleados WHERE id_empleado = ?
+            ''', (empleado_id,)).fetchone()
+        return self._fila_a_empleado(fila) if fila else None
+
+    def cargar_asistencias_desde(self, fecha_desde):
+        with self._lock:
+            filas = self._conexion.execute('''
+            SELECT id_asistencia, fecha, id_empleado, hora_ingreso, hora_egreso
+            FROM replica_asistencias WHERE fecha >= ?
+            ''', (fecha_desde.isoformat(),)).fetchall()
+        return [(id_asistencia, datetime.strptime(fecha, '%Y-%m-%d').date(), empleado_id, ingreso, egreso)
+                for id_asistencia, fecha, empleado_id, ingreso, egreso in filas]
+
+    def verificar_asistencia_hoy(self, empleado_id, fecha=None):
+        fecha = (fecha or datetime.now().date()).isoformat()
+        with self._lock:
+            fila = self._conexion.execute('''
+            SELECT id_asistencia, hora_ingreso, hora_egreso
+            FROM replica_asistencias WHERE id_empleado = ? AND fecha = ?
+            ''', (empleado_id, fecha)).fetchone()
+
+        if fila:
+            return {
+                'id_asistencia': fila[0],
+                'hora_ingreso': fila[1],
+                'hora_egreso': fila[2],
+                'tiene_ingreso': fila[1] is not None,
+                'tiene_egreso': fila[2] is not None
+            }
+        return None
+
+    # -----------------------
+    #   Escrituras (diario local)
+    # -----------------------
+    def _registrar_evento(self, tipo, datos, sentencia=None, parametros=()):
+        """Agrega el evento al diario y aplica su efecto local en una misma transacción"""
+        try:
+            with self._lock:
+                self._conexion.execute('BEGIN')
+                try:
+                    if sentencia:
+                        cursor = self._conexion.execute(sentencia, parametros)
+                        if tipo == 'egreso' and cursor.rowcount == 0:
+                            self._conexion.execute('ROLLBACK')
+                            return False
+                    self._conexion.execute(
+                        "INSERT INTO diario_eventos (tipo, datos, creado_en) VALUES (?, ?, ?)",
+                        (tipo, json.dumps(datos), datetime.now().isoformat())
+                    )
+                    self._conexion.execute('COMMIT')
+                except Exception:
+                    self._conexion.execute('ROLLBACK')
+                    raise
+            return True
+
+        except Exception as e:
+            print(f"Error registrando evento local {tipo}: {e}")
+            return False
+
+    def registrar_ingreso(self, empleado_id, turno, hora_actual, minutos_tarde, observacion, fecha=None):
+        fecha = (fecha or datetime.now().date()).isoformat()
+        return self._registrar_evento('ingreso', {
+            'fecha': fecha,
+            'id_empleado': empleado_id,
+            'turno': turno,
+            'hora': hora_actual,
+            'minutos_tarde': minutos_tarde,
+            'observacion': observacion
+        }, '''
+        INSERT INTO replica_asistencias (fecha, id_empleado, hora_ingreso) VALUES (?, ?, ?)
+        ON CONFLICT (fecha, id_empleado) DO UPDATE SET hora_ingreso = COALESCE(hora_ingreso, excluded.hora_ingreso)
+        ''', (fecha, empleado_id, hora_actual))
+
+    def registrar_egreso(self, empleado_id, hora_actual, fecha=None):
+        fecha = (fecha or datetime.now().date()).isoformat()
+        return self._registrar_evento('egreso', {
+            'fecha': fecha,
+            'id_empleado': empleado_id,
+            'hora': hora_actual
+        }, '''
+        UPDATE replica_asistencias SET hora_egreso = ?
+        WHERE id_empleado = ? AND fecha = ? AND hora_egreso IS NULL
+        ''', (hora_actual, empleado_id, fecha))
+
+    def registrar_denegacion(self, motivo, modo_operacion, id_empleado=None,
+                             minutos_tarde=None, turno_esperado=None, turno_detectado=None,
+                             nombre_detectado=None, observaciones=None):
+        ahora = datetime.now()
+        return self._registrar_evento('denegacion', {
+            'fecha': ahora.date().isoformat(),
+            'hora': ahora.strftime("%H:%M:%S"),
+            'id_empleado': id_empleado,
+            'motivo': motivo,
+            'modo_operacion': modo_operacion,
+            'minutos_tarde': minutos_tarde,
+            'turno_esperado': turno_esperado,
+            'turno_detectado': turno_detectado,
+            'nombre_detectado': nombre_detectado,
+            'observaciones': observaciones
+        })
+
+    def pendientes(self):
+        """Cantidad de eventos del diario aún no enviados a PostgreSQL"""
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT COUNT(*) FROM diario_eventos WHERE sincronizado = 0"
+            ).fetchone()[0]
+
+    # -----------------------
+    #   Sincronización con PostgreSQL
+    # -----------------------
+    def sincronizar(self):
+        """Un ciclo completo de sincronización; devuelve False si la base central no responde"""
+        if self.db_remoto is None:
+            return False
+
+        try:
+            return self._subir_eventos() and self._bajar_empleados() and self._bajar_asistencias()
+        except Exception as e:
+            print(f"Sincronización local: base central no disponible ({e})")
+            return False
+
+    def _marcar_sincronizados(self, hasta_seq):
+        with self._lock:
+            self._conexion.execute(
+                "UPDATE diario_eventos SET sincronizado = 1 WHERE seq <= ? AND sincronizado = 0", (hasta_seq,)
+            )
+
+    def _subir_eventos(self):
+        """Envía el diario en orden; el checkpoint remoto evita duplicados tras un corte"""
+        confirmado = self.db_remoto.obtener_ultimo_evento_confirmado(self.origen)
+        if confirmado is None:
+            return False
+        self._marcar_sincronizados(confirmado)
+
+        while True:
+            with self._lock:
+                filas = self._conexion.execute('''
+                SELECT seq, tipo, datos FROM diario_eventos
+                WHERE sincronizado = 0 ORDER BY seq LIMIT ?
+                ''', (SINCRONIZACION_TAM_LOTE,)).fetchall()
+            if not filas:
+                return True
+
+            eventos = [{'seq': seq, 'tipo': tipo, 'datos': json.loads(datos)} for seq, tipo, datos in filas]
+            if not self.db_remoto.escribir_eventos_lote(eventos, self.origen, eventos[-1]['seq']):
+                return False
+            self._marcar_sincronizados(eventos[-1]['seq'])
+
+    def _bajar_empleados(self):
+        """
+        Trae altas y modificaciones desde la última marca y elimina las bajas. Como en
+        el directorio, se pide con un margen: Actualizado_En es la hora de inicio de la
+        transacción, y una que confirmó tarde puede quedar por debajo de la marca.
+        """
+        version = self.db_remoto.obtener_version_empleados()
+        if version is None:
+            return False
+        if repr(version) == self._leer_estado('version_empleados'):
+            return True
+
+        marca = self._leer_estado('marca_empleados')
+        desde = datetime.fromisoformat(marca) - timedelta(seconds=DIRECTORIO_MARGEN_MARCA) if marca else None
+        cambios = self.db_remoto.cargar_empleados(desde=desde)
+        ids_remotos = self.db_remoto.obtener_ids_empleados()
+        if cambios is None or ids_remotos is None:
+            return False
+        # Una muestra nueva marca al empleado como actualizado: se reemplazan las suyas
+        muestras = self.db_remoto.cargar_muestras([e['id'] for e in cambios]) if cambios else {}
+        if muestras is None:
+            return False
+
+        with self._lock:
+            self._conexion.execute('BEGIN')
+            try:
+                for empleado in cambios:
+                    actualizado = empleado['actualizado_en']
+                    self._conexion.execute('''
+                    INSERT OR REPLACE INTO replica_empleados
+                    (id_empleado, nombre, apellido, departamento, turno, foto_path, embedding, actualizado_en)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (empleado['id'], empleado['nombre'], empleado['apellido'], empleado['departamento'],
+                          empleado['turno'], empleado['foto_path'],
+                          np.asarray(empleado['embedding'], dtype=np.float32).tobytes(),
+                          actualizado.isoformat() if hasattr(actualizado, 'isoformat') else actualizado))
+                    self._conexion.execute("DELETE FROM replica_muestras WHERE id_empleado = ?", (empleado['id'],))
+                    self._conexion.executemany(
+                        "INSERT INTO replica_muestras (id_empleado, embedding) VALUES (?, ?)",
+                        [(empleado['id'], vector.tobytes()) for vector in muestras.get(empleado['id'], [])]
+                    )
+
+                ids_locales = {fila[0] for fila in self._conexion.execute("SELECT id_empleado FROM replica_empleados")}
+                for empleado_id in ids_locales - ids_remotos:
+                    self._conexion.execute("DELETE FROM replica_empleados WHERE id_empleado = ?", (empleado_id,))
+                    self._conexion.execute("DELETE FROM replica_muestras WHERE id_empleado = ?", (empleado_id,))
+                self._conexion.execute('COMMIT')
+            except Exception:
+                self._conexion.execute('ROLLBACK')
+                raise
+
+        if cambios:
+            marcas = [e['actualizado_en'] for e in cambios if e['actualizado_en'] is not None]
+            if marcas:
+                marca_nueva = max(marcas)
+                self._guardar_estado('marca_empleados',
+                                     marca_nueva.isoformat() if hasattr(marca_nueva, 'isoformat') else marca_nueva)
+        self._guardar_estado('version_empleados', repr(version))
+        return True
+
+    def _bajar_asistencias(self):
+        """Trae las asistencias recientes registradas por otros tótems (ayer y hoy)"""
+        desde = datetime.now().date() - timedelta(days=1)
+        filas = self.db_remoto.cargar_asistencias_desde(desde)
+        if filas is None:
+            return False
+
+        with self._lock:
+            self._conexion.execute('BEGIN')
+            try:
+                for id_asistencia, fecha, empleado_id, hora_ingreso, hora_egreso in filas:
+                    # Nunca pisar con NULL un ingreso/egreso local aún no subido
+                    self._conexion.execute('''
+                    INSERT INTO replica_asistencias (fecha, id_empleado, id_asistencia, hora_ingreso, hora_egreso)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (fecha, id_empleado) DO UPDATE SET
+                        id_asistencia = excluded.id_asistencia,
+                        hora_ingreso = COALESCE(replica_asistencias.hora_ingreso, excluded.hora_ingreso),
+                        hora_egreso = COALESCE(replica_asistencias.hora_egreso, excluded.hora_egreso)
+                    ''', (fecha.isoformat(), empleado_id, id_asistencia,
+                          hora_ingreso.strftime("%H:%M:%S") if hora_ingreso else None,
+                          hora_egreso.strftime("%H:%M:%S") if hora_egreso else None))
+                self._conexion.execute("DELETE FROM replica_asistencias WHERE fecha < ?", (desde.isoformat(),))
+                self._conexion.execute('COMMIT')
+            except Exception:
+                self._conexion.execute('ROLLBACK')
+                raise
+        return True
+
+    def iniciar(self):
+        """Sincroniza una vez (sin bloquear si no hay red) e inicia el hilo de sincronización"""
+        if self._hilo is not None:
+            return
+
+        if self.sincronizar():
+            print("Almacén local sincronizado con la base central")
+        else:
+            print(f"⚠ Trabajando sin base central ({self.pendientes()} eventos pendientes de subir)")
+
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle_sincronizacion, daemon=True)
+        self._hilo.start()
+
+    def _bucle_sincronizacion(self):
+        while not self._detener.wait(self.sincronizar_cada):
+            self.sincronizar()
+
+    def detener(self):
+        """Detiene la sincronización intentando subir lo pendiente"""
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(timeout=1.0)
+            self._hilo = None
+        self.sincronizar()
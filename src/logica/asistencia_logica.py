@@ -1,12 +1,21 @@
 import time
 from datetime import datetime
 from .administrador_database import DatabaseManager
+from .directorio_empleados import DirectorioEmpleados
+from .estado_asistencia import EstadoAsistenciaDiaria
 from ..utils.time_utils import determinar_turno_actual, calcular_minutos_tarde, determinar_observacion
 from .config import MAX_MINUTOS_TARDE, REGISTRO_COOLDOWN, DENEGACION_COOLDOWN
 
 class AttendanceManager:
-    def __init__(self):
+    def __init__(self, directorio=None, estado_asistencia=None, escritor=None):
         self.db_manager = DatabaseManager()
+        self.directorio = directorio or DirectorioEmpleados(self.db_manager)
+        # Las escrituras van al escritor asíncrono si existe; si no, directo a la base
+        self.escritor = escritor
+        self.registro_eventos = escritor or self.db_manager
+        self.estado_asistencia = estado_asistencia or EstadoAsistenciaDiaria(
+            self.db_manager, destino=self.registro_eventos
+        )
         self.ultimo_registro = {}  # Para evitar registros múltiples
         self.ultima_denegacion = {}  # Para evitar denegaciones múltiples
         
@@ -17,8 +26,8 @@ class AttendanceManager:
             # No devolver mensaje si está en cooldown, solo ignorar
             return None
         
-        # Obtener información del empleado
-        empleado = self.db_manager.obtener_empleado(empleado_id)
+        # Obtener información del empleado (directorio en memoria, sin ir a la base)
+        empleado = self.directorio.obtener(empleado_id)
         if not empleado:
             #unknown_key = nombre_completo or "desconocido"
             key = "persona_no_registrada_global"
@@ -26,7 +35,7 @@ class AttendanceManager:
 
             if self._cooldown_take(self.ultima_denegacion, key, DENEGACION_COOLDOWN):
                 print('persona_no_registrada')
-                self.db_manager.registrar_denegacion(
+                self.registro_eventos.registrar_denegacion(
                     motivo='persona_no_registrada',
                     modo_operacion='ingreso',
                     nombre_detectado=nombre_completo
@@ -43,8 +52,8 @@ class AttendanceManager:
             # Si está en cooldown, no devolver nada (ignorar)
             return None
         
-        # Verificar si ya registró asistencia hoy
-        asistencia_hoy = self.db_manager.verificar_asistencia_hoy(empleado_id)
+        # Verificar si ya registró asistencia en la jornada (estado en memoria)
+        asistencia_hoy = self.estado_asistencia.consultar(empleado_id, empleado['turno'])
         if asistencia_hoy and asistencia_hoy['tiene_ingreso']:
             return {
                 'success': False,
@@ -58,7 +67,7 @@ class AttendanceManager:
         if empleado['turno'] != turno_actual:
             # REGISTRAR DENEGACIÓN: Turno no corresponde (con cooldown)
             if self._verificar_cooldown_denegacion('turno_no_corresponde', empleado_id):
-                self.db_manager.registrar_denegacion(
+                self.registro_eventos.registrar_denegacion(
                     motivo='turno_no_corresponde',
                     modo_operacion='ingreso',
                     id_empleado=empleado_id,
@@ -82,7 +91,7 @@ class AttendanceManager:
         if minutos_tarde > MAX_MINUTOS_TARDE:
             # REGISTRAR DENEGACIÓN: Llegada tarde (con cooldown)
             if self._verificar_cooldown_denegacion('llegada_tarde', empleado_id):
-                self.db_manager.registrar_denegacion(
+                self.registro_eventos.registrar_denegacion(
                     motivo='llegada_tarde',
                     modo_operacion='ingreso',
                     id_empleado=empleado_id,
@@ -102,7 +111,7 @@ class AttendanceManager:
         observacion = determinar_observacion(minutos_tarde)
         hora_actual = ahora.strftime("%H:%M:%S")
         
-        success = self.db_manager.registrar_ingreso(
+        success = self.estado_asistencia.registrar_ingreso(
             empleado_id, empleado['turno'], hora_actual, minutos_tarde, observacion
         )
         
@@ -145,12 +154,14 @@ class AttendanceManager:
             # No devolver mensaje si está en cooldown, solo ignorar
             return None
         
-        # Verificar si tiene ingreso registrado hoy
-        asistencia_hoy = self.db_manager.verificar_asistencia_hoy(empleado_id)
+        # Verificar si tiene ingreso registrado en la jornada (el turno noche cruza la medianoche)
+        empleado = self.directorio.obtener(empleado_id)
+        turno = empleado['turno'] if empleado else None
+        asistencia_hoy = self.estado_asistencia.consultar(empleado_id, turno)
         if not asistencia_hoy or not asistencia_hoy['tiene_ingreso']:
             # REGISTRAR DENEGACIÓN: Sin ingreso previo (con cooldown)
             if self._verificar_cooldown_denegacion('sin_ingreso_previo', empleado_id):
-                self.db_manager.registrar_denegacion(
+                self.registro_eventos.registrar_denegacion(
                     motivo='sin_ingreso_previo',
                     modo_operacion='egreso',
                     id_empleado=empleado_id,
@@ -178,7 +189,7 @@ class AttendanceManager:
         ahora = datetime.now()
         hora_actual = ahora.strftime("%H:%M:%S")
         
-        success = self.db_manager.registrar_egreso(empleado_id, hora_actual)
+        success = self.estado_asistencia.registrar_egreso(empleado_id, turno, hora_actual)
         
         if success:
             # Actualizar cooldown
@@ -202,6 +213,11 @@ class AttendanceManager:
                 'empleado_id': empleado_id  # Mensaje persistente para este empleado
             }
     
+    def cerrar(self):
+        """Vacía los eventos pendientes del escritor asíncrono (si se usa)"""
+        if self.escritor:
+            self.escritor.detener()
+    
     def _verificar_cooldown(self, empleado_id):
         """Verifica si ha pasado suficiente tiempo desde el ultimo registro"""
         ahora = time.time()
@@ -231,12 +247,13 @@ class AttendanceManager:
     
     def get_employee_status_today(self, empleado_id):
         """Obtiene el estado de asistencia del empleado hoy"""
-        asistencia = self.db_manager.verificar_asistencia_hoy(empleado_id)
-        empleado = self.db_manager.obtener_empleado(empleado_id)
+        empleado = self.directorio.obtener(empleado_id)
         
         if not empleado:
             return None
         
+        asistencia = self.estado_asistencia.consultar(empleado_id, empleado['turno'])
+        
         status = {
             'empleado': empleado,
             'tiene_ingreso': False,
@@ -0,0 +1,46 @@
+import cv2
+import face_recognition
+from .config import FRAME_SCALE, ROI_MARGEN
+
+
+def escalar_ubicaciones(ubicaciones, escala=1 / FRAME_SCALE, forma=None):
+    """
+    Lleva ubicaciones (top, right, bottom, left) detectadas en el frame reducido al
+    frame original con precisión de punto flotante. escala puede ser un número o
+    (escala_y, escala_x); si se indica forma, se recortan a los bordes de la imagen.
+    """
+    escala_y, escala_x = escala if isinstance(escala, tuple) else (escala, escala)
+    escaladas = []
+    for top, right, bottom, left in ubicaciones:
+        top, right = int(round(top * escala_y)), int(round(right * escala_x))
+        bottom, left = int(round(bottom * escala_y)), int(round(left * escala_x))
+        if forma is not None:
+            top, left = max(0, top), max(0, left)
+            bottom, right = min(forma[0] - 1, bottom), min(forma[1] - 1, right)
+        escaladas.append((top, right, bottom, left))
+    return escaladas
+
+
+def escala_entre(frame, small_frame):
+    """Escala real (y, x) de small_frame a frame (cv2.resize redondea los tamaños)"""
+    return frame.shape[0] / small_frame.shape[0], frame.shape[1] / small_frame.shape[1]
+
+
+def codificar_regiones(frame, ubicaciones, margen=ROI_MARGEN):
+    """
+    Calcula el encoding de cada cara recortando su región (con margen para los
+    landmarks) del frame BGR a resolución completa. Solo se convierte a RGB el
+    recorte, que es el espacio de color con el que se enrolan las fotos.
+    """
+    alto, ancho = frame.shape[:2]
+    encodings = []
+    for top, right, bottom, left in ubicaciones:
+        extra_y = int((bottom - top) * margen)
+        extra_x = int((right - left) * margen)
+        y0, y1 = max(0, top - extra_y), min(alto, bottom + extra_y)
+        x0, x1 = max(0, left - extra_x), min(ancho, right + extra_x)
+
+        region = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+        local = (top - y0, right - x0, bottom - y0, left - x0)
+        encodings.append(face_recognition.face_encodings(region, [local])[0])
+    return encodings
@@ -4,7 +4,33 @@ from datetime import time as dt_time
 TOLERANCIA = 0.6
 GROSOR_MARCO_CARA = 3
 GROSOR_FUENTE_MARCO = 2
-MODEL = 'hog'
+MODEL = 'hog'  # Modelo de dlib para el detector 'hog' ('hog' o 'cnn')
+ROI_MARGEN = 0.25  # Margen alrededor de la cara al recortarla del frame original para el encoding
+
+# DETECTOR DE CARAS
+DETECTOR_TIPO = 'hog'        # 'hog' (dlib), 'haar' (cascada de OpenCV) o 'dnn' (SSD de OpenCV, requiere los archivos del modelo)
+DETECTOR_RESPALDO = 'hog'    # Se usa si el detector configurado no puede cargarse
+DETECTOR_DNN_MODELO = 'modelos/res10_300x300_ssd_iter_140000.caffemodel'  # o un .onnx equivalente
+DETECTOR_DNN_CONFIG = 'modelos/deploy.prototxt'
+DETECTOR_DNN_CONFIANZA = 0.6  # Confianza mínima de una detección del SSD
+DETECTOR_HAAR_VECINOS = 5     # minNeighbors de la cascada (más alto = menos falsos positivos)
+
+# CONFIGURACIÓN DEL ÍNDICE DE EMBEDDINGS
+INDICE_TIPO = 'flat'                             # 'flat' (exacto), 'ivf' (aproximado), 'flat_f16' o 'flat_int8' (cuantizados)
+INDICE_RERANKING = 32                            # Candidatos re-evaluados en float32 en los índices cuantizados (0 = ninguno, sin conservar los float32)
+INDICE_RUTA = 'database/indice_embeddings.npz'   # Índice persistido junto a la base local
+IVF_NLIST = 256          # Cantidad de listas invertidas (centroides k-means)
+IVF_NPROBE = 16          # Listas revisadas por consulta (más = mejor recall, más lento)
+IVF_MIN_VECTORES = 2000  # Por debajo de este tamaño se usa búsqueda exacta
+
+# GALERÍA DE EMBEDDINGS (varias muestras por empleado)
+GALERIA_MODO = 'muestras'            # 'muestras' (distancia mínima entre muestras) o 'centroide' (promedio por empleado)
+MUESTRAS_MAX_POR_EMPLEADO = 8        # Muestras adicionales usadas (y automáticas conservadas) por empleado
+MUESTRAS_DISTANCIA_OUTLIER = 0.45    # Muestras más lejos que esto de la mediana del empleado se descartan
+AUTOENROLAMIENTO_HABILITADO = False  # Sumar muestras en vivo de coincidencias de alta confianza
+AUTOENROLAMIENTO_DISTANCIA = 0.35    # Distancia máxima para considerar una coincidencia de alta confianza
+AUTOENROLAMIENTO_NOVEDAD = 0.15      # Distancia mínima a la galería para que la muestra aporte variación
+AUTOENROLAMIENTO_INTERVALO = 3600    # Segundos mínimos entre muestras automáticas del mismo empleado
 
 # CONFIGURACIÓN DE BASE DE DATOS
 DB_RUTA = 'database/asistencia_empleados.db'
@@ -19,6 +45,16 @@ DB_CONFIG = {
     'sslmode': "require"
 }
 
+# POOL DE CONEXIONES POSTGRESQL
+POOL_MIN_CONEXIONES = 1      # Conexiones abiertas al iniciar el pool
+POOL_MAX_CONEXIONES = 8      # Máximo de conexiones simultáneas por proceso
+POOL_VERIFICAR_CADA = 30     # Segundos de inactividad tras los cuales se verifica la conexión
+POOL_ESPERA_MAXIMA = 10      # Segundos máximos esperando una conexión libre
+POOL_REINTENTOS = 3          # Intentos de reconexión ante fallas
+POOL_ASYNC_MIN_CONEXIONES = 2   # Conexiones del pool asíncrono de la API web al iniciar
+POOL_ASYNC_MAX_CONEXIONES = 16  # Máximo de consultas simultáneas de la API web
+WEB_HILOS_IMAGEN = 2         # Hilos de la API web para detección y codificación de caras
+
 # CONFIGURACIÓN DE MENSAJES EN PANTALLA
 DURACION_MENSAJE = 7 
 MAX_CANT_MENSAJES = 5 
@@ -38,6 +74,8 @@ FRAME_SCALE = 0.25  # Para acelerar el procesamiento
 # DEPARTAMENTOS Y TURNOS VÁLIDOS
 DEPARTAMENTOS_VALIDOS = ['Administración', 'Ventas', 'Producción', 'Recursos Humanos']
 TURNOS_VALIDOS = ['Manana', 'Tarde', 'Noche']
+ENROLAMIENTO_PROCESOS = 0   # Procesos para codificar fotos en el enrolamiento masivo (0 = uno por CPU)
+ENROLAMIENTO_DIRECTORIO_BASE = 'imagenes_empleados'  # Único directorio desde el que la API web enrola en lote
 
 # LÍMITES DE TARDANZA
 MAX_MINUTOS_TARDE = 120  # Máximo permitido para acceso
@@ -45,9 +83,50 @@ LIMITE_PUNTUAL = 10      # Hasta 10 min = puntual
 LIMITE_MEDIO_TARDE = 30  # 11-30 min = medio tarde
 
 # THREADING
-RECOGNITION_SLEEP = 0.05  # Segundos entre procesamiento de frames
+RECOGNITION_SLEEP = 0.05  # Segundos máximos de espera por resultados del pipeline
+RECONOCIMIENTO_FPS_REPOSO = 2      # FPS de reconocimiento cuando no hay nadie frente a la cámara
+RECONOCIMIENTO_INACTIVO_TRAS = 10  # Segundos sin ver caras para pasar a reposo
+RECONOCIMIENTO_PROCESOS = 0        # Procesos de reconocimiento (0 = hilo único, sin pipeline)
+PIPELINE_SLOTS_POR_PROCESO = 2     # Frames en memoria compartida por proceso (en vuelo como máximo)
+SERVIDOR_ESTADISTICAS_CADA = 10    # Segundos entre reportes de FPS/latencia en modo multi-cámara
 REGISTRO_COOLDOWN = 5     # Segundos antes de permitir nuevo procesamiento del mismo empleado
 
+# SEGUIMIENTO DE CARAS
+SEGUIMIENTO_IOU_MINIMO = 0.3           # IoU mínimo entre predicción y detección para asociarlas
+SEGUIMIENTO_DISTANCIA_CENTRO = 0.5     # Respaldo: distancia entre centros relativa al tamaño de la cara
+SEGUIMIENTO_MAX_PERDIDOS = 5           # Frames sin detección antes de descartar una pista
+SEGUIMIENTO_REVERIFICAR_CADA = 3.0     # Segundos entre re-verificaciones de una pista identificada
+SEGUIMIENTO_REINTENTO_DESCONOCIDO = 0.5  # Segundos entre intentos sobre una pista no identificada
+
+# DETECCIÓN DE MOVIMIENTO (compuerta previa a la detección de caras)
+MOVIMIENTO_HABILITADO = True
+MOVIMIENTO_UMBRAL_PIXEL = 25      # Diferencia de gris (0-255) para que un píxel cuente como cambiado
+MOVIMIENTO_UMBRAL_AREA = 0.01     # Fracción de píxeles cambiados que dispara la detección (más bajo = más sensible)
+MOVIMIENTO_APRENDIZAJE = 0.05     # Adaptación del fondo a cambios lentos de iluminación
+MOVIMIENTO_ANCHO = 160            # Ancho en píxeles del frame usado para comparar
+MOVIMIENTO_VERIFICAR_CADA = 5.0   # Segundos máximos sin correr la detección aunque no haya movimiento
+
+# DIRECTORIO DE EMPLEADOS EN MEMORIA
+DIRECTORIO_TTL = 600             # Segundos máximos sin recargar el directorio completo
+DIRECTORIO_VERIFICAR_CADA = 30   # Segundos entre verificaciones de cambios en empleados
+DIRECTORIO_ESCUCHAR_CAMBIOS = True   # LISTEN/NOTIFY para aplicar altas al instante (requiere conexión directa, no PgBouncer)
+DIRECTORIO_CANAL = 'empleados_cambios'  # Canal NOTIFY usado por el trigger de empleados
+DIRECTORIO_MARGEN_MARCA = 5      # Segundos de solapamiento al pedir cambios desde la última marca
+DIRECTORIO_SNAPSHOT = 'database/snapshot_directorio'  # Snapshot local para arrancar sin descargar todo (None = desactivado)
+
+# ESTADO DE ASISTENCIA DIARIA EN MEMORIA
+ESTADO_NEGATIVO_TTL = 30   # Segundos que se confía en "sin registro" antes de reconsultar la base
+
+# ESCRITOR ASÍNCRONO DE EVENTOS
+SPOOL_RUTA = 'database/eventos_pendientes.jsonl'  # Eventos aún no confirmados en la base
+ESCRITOR_TAM_LOTE = 200           # Máximo de eventos por transacción
+ESCRITOR_LATENCIA_MAXIMA = 0.5    # Segundos máximos que un evento espera para formar lote
+ESCRITOR_REINTENTO_MAXIMO = 30    # Segundos máximos entre reintentos con la base caída
+
+# ALMACÉN LOCAL (MODO OFFLINE)
+SINCRONIZACION_CADA = 15        # Segundos entre sincronizaciones con PostgreSQL
+SINCRONIZACION_TAM_LOTE = 200   # Máximo de eventos del diario local por transacción
+
 
 DENEGACION_COOLDOWN = 5  
 
@@ -70,6 +149,10 @@ OEE_REGULAR = 50        # >= 50% se considera regular
 # CONFIGURACIÓN DE REPORTES
 DIAS_REPORTE_DEFAULT = 30       # Días por defecto para reportes
 MAX_REGISTROS_CONSULTA = 1000   # Máximo registros por consulta
+API_LIMITE_DEFAULT = 200       # Registros por página en los listados de la API (máximo MAX_REGISTROS_CONSULTA)
+TRAMOS_TARDANZA = [5, 15, 30, 60]  # Límites (minutos) de los tramos del histograma de tardanzas
+METRICAS_VENTANA_OEE = 7        # Días de la media móvil del OEE diario
+EXPORTACION_FILAS_POR_LOTE = 2000  # Filas por lectura del cursor del servidor al exportar NDJSON
 FORMATO_FECHA_REPORTE = '%Y-%m-%d'
 FORMATO_HORA_REPORTE = '%H:%M:%S'
 
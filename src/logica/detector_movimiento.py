@@ -0,0 +1,64 @@
+import time
+import cv2
+import numpy as np
+from .config import (
+    MOVIMIENTO_UMBRAL_PIXEL, MOVIMIENTO_UMBRAL_AREA, MOVIMIENTO_APRENDIZAJE,
+    MOVIMIENTO_ANCHO, MOVIMIENTO_VERIFICAR_CADA
+)
+
+
+class DetectorMovimiento:
+    """
+    Compuerta barata previa a la detección de caras: compara una versión muy reducida
+    del frame contra un fondo con promedio móvil y solo deja pasar los frames con
+    cambios. Con la escena quieta se evita correr HOG/encodings.
+    """
+
+    def __init__(self, umbral_pixel=MOVIMIENTO_UMBRAL_PIXEL, umbral_area=MOVIMIENTO_UMBRAL_AREA,
+                 aprendizaje=MOVIMIENTO_APRENDIZAJE, ancho=MOVIMIENTO_ANCHO,
+                 verificar_cada=MOVIMIENTO_VERIFICAR_CADA):
+        self.umbral_pixel = umbral_pixel      # Diferencia de gris (0-255) para considerar un píxel cambiado
+        self.umbral_area = umbral_area        # Fracción de píxeles cambiados para considerar movimiento
+        self.aprendizaje = aprendizaje        # Velocidad con que el fondo absorbe cambios (luz, sombras)
+        self.ancho = ancho
+        self.verificar_cada = verificar_cada  # Detección forzada periódica aunque no haya movimiento
+        self.fondo = None
+        self.saltados = 0
+        self.procesados = 0
+        self._ultimo_paso = 0.0
+
+    def _preparar(self, frame):
+        alto = max(1, int(frame.shape[0] * self.ancho / frame.shape[1]))
+        gris = cv2.cvtColor(cv2.resize(frame, (self.ancho, alto), interpolation=cv2.INTER_AREA),
+                            cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gris, (5, 5), 0)
+
+    def hay_movimiento(self, frame):
+        """Compara contra el fondo y lo actualiza; True si cambió una fracción suficiente"""
+        gris = self._preparar(frame)
+        if self.fondo is None or self.fondo.shape != gris.shape:
+            self.fondo = gris.astype(np.float32)
+            return True
+
+        diferencia = cv2.absdiff(gris, cv2.convertScaleAbs(self.fondo))
+        cambiados = np.count_nonzero(diferencia > self.umbral_pixel) / diferencia.size
+        cv2.accumulateWeighted(gris, self.fondo, self.aprendizaje)
+        return cambiados >= self.umbral_area
+
+    def evaluar(self, frame, forzar=False):
+        """
+        Decide si el frame debe pasar a la detección de caras.
+        forzar: hay caras seguidas (una persona quieta no genera movimiento).
+        """
+        ahora = time.time()
+        movimiento = self.hay_movimiento(frame)
+        if movimiento or forzar or ahora - self._ultimo_paso >= self.verificar_cada:
+            self.procesados += 1
+            self._ultimo_paso = ahora
+            return True
+
+        self.saltados += 1
+        return False
+
+    def contadores(self):
+        return {'procesados': self.procesados, 'saltados': self.saltados}
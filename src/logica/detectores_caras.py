@@ -0,0 +1,117 @@
+import os
+import cv2
+import numpy as np
+from .config import (
+    MODEL, DETECTOR_TIPO, DETECTOR_RESPALDO, DETECTOR_DNN_MODELO, DETECTOR_DNN_CONFIG,
+    DETECTOR_DNN_CONFIANZA, DETECTOR_HAAR_VECINOS
+)
+
+
+class DetectorCaras:
+    """
+    Interfaz común de los detectores de caras.
+    detectar() recibe una imagen BGR y devuelve ubicaciones (top, right, bottom, left)
+    en píxeles de esa imagen, el mismo formato que face_recognition.face_locations,
+    por lo que pueden pasarse directamente a face_recognition.face_encodings.
+    """
+
+    tipo = None
+
+    def detectar(self, imagen):
+        raise NotImplementedError
+
+
+class DetectorHOG(DetectorCaras):
+    """Detector HOG (o CNN) de dlib vía face_recognition: el comportamiento original"""
+
+    tipo = 'hog'
+
+    def __init__(self, modelo=MODEL):
+        import face_recognition
+        self._face_recognition = face_recognition
+        self.modelo = modelo
+
+    def detectar(self, imagen):
+        return self._face_recognition.face_locations(imagen, model=self.modelo)
+
+
+class DetectorHaar(DetectorCaras):
+    """Cascada Haar frontal incluida en OpenCV; la opción más liviana, con menos recall"""
+
+    tipo = 'haar'
+
+    def __init__(self, vecinos=DETECTOR_HAAR_VECINOS):
+        ruta = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        self.cascada = cv2.CascadeClassifier(ruta)
+        if self.cascada.empty():
+            raise RuntimeError(f"No se pudo cargar la cascada Haar: {ruta}")
+        self.vecinos = vecinos
+
+    def detectar(self, imagen):
+        gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+        cv2.equalizeHist(gris, gris)
+        minimo = max(20, min(gris.shape) // 12)
+        caras = self.cascada.detectMultiScale(gris, scaleFactor=1.1, minNeighbors=self.vecinos,
+                                              minSize=(minimo, minimo))
+        return [(int(y), int(x + w), int(y + h), int(x)) for (x, y, w, h) in caras]
+
+
+class DetectorDNN(DetectorCaras):
+    """
+    Detector SSD de OpenCV DNN (res10 300x300) desde un archivo local: Caffe
+    (.caffemodel + .prototxt) u ONNX exportado con la misma salida (1, 1, N, 7).
+    """
+
+    tipo = 'dnn'
+
+    def __init__(self, modelo=DETECTOR_DNN_MODELO, configuracion=DETECTOR_DNN_CONFIG,
+                 confianza=DETECTOR_DNN_CONFIANZA):
+        if not os.path.exists(modelo):
+            raise FileNotFoundError(f"Modelo DNN no encontrado: {modelo}")
+
+        if modelo.endswith('.onnx'):
+            self.red = cv2.dnn.readNetFromONNX(modelo)
+        else:
+            self.red = cv2.dnn.readNetFromCaffe(configuracion, modelo)
+        self.red.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.red.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confianza = confianza
+
+    def detectar(self, imagen):
+        alto, ancho = imagen.shape[:2]
+        blob = cv2.dnn.blobFromImage(imagen, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.red.setInput(blob)
+        salida = self.red.forward().reshape(-1, 7)
+
+        ubicaciones = []
+        for deteccion in salida[salida[:, 2] >= self.confianza]:
+            left, top, right, bottom = (deteccion[3:7] * np.array([ancho, alto, ancho, alto])).astype(int)
+            left, top = max(0, left), max(0, top)
+            right, bottom = min(ancho - 1, right), min(alto - 1, bottom)
+            if right > left and bottom > top:
+                ubicaciones.append((int(top), int(right), int(bottom), int(left)))
+        return ubicaciones
+
+
+TIPOS_DETECTOR = {
+    DetectorHOG.tipo: DetectorHOG,
+    DetectorHaar.tipo: DetectorHaar,
+    DetectorDNN.tipo: DetectorDNN
+}
+
+
+def crear_detector(tipo=DETECTOR_TIPO, respaldo=DETECTOR_RESPALDO):
+    """
+    Crea el detector configurado. Si no puede inicializarse (por ejemplo, falta el
+    archivo del modelo DNN) usa el de respaldo en lugar de dejar el tótem sin detección.
+    """
+    if tipo not in TIPOS_DETECTOR:
+        raise ValueError(f"Tipo de detector inválido: {tipo}. Debe ser uno de: {', '.join(TIPOS_DETECTOR)}")
+
+    try:
+        return TIPOS_DETECTOR[tipo]()
+    except Exception as e:
+        if not respaldo or respaldo == tipo:
+            raise
+        print(f"⚠ Detector '{tipo}' no disponible ({e}); se usa '{respaldo}'")
+        return TIPOS_DETECTOR[respaldo]()
@@ -0,0 +1,361 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from .administrador_database import DatabaseManager
+from .config import (
+    DIRECTORIO_TTL, DIRECTORIO_VERIFICAR_CADA, DIRECTORIO_ESCUCHAR_CAMBIOS, DIRECTORIO_MARGEN_MARCA,
+    DIRECTORIO_SNAPSHOT, GALERIA_MODO
+)
+from .galeria_embeddings import armar_galeria, actualizar_galeria
+from .snapshot_directorio import guardar_snapshot, cargar_snapshot
+
+
+class DirectorioEmpleados:
+    """
+    Directorio en memoria de empleados, cargado una vez al iniciar y compartido por
+    el motor de reconocimiento y la lógica de asistencia. Cuando cambia la versión
+    de la tabla empleados (aviso LISTEN/NOTIFY o consulta periódica) trae solo las
+    filas modificadas desde la última marca; por TTL se recarga completo. La primera
+    carga parte del snapshot local (si existe) y solo pide a la base el delta.
+    """
+
+    def __init__(self, db_manager=None, ttl=DIRECTORIO_TTL, verificar_cada=DIRECTORIO_VERIFICAR_CADA,
+                 escuchar=DIRECTORIO_ESCUCHAR_CAMBIOS, ruta_snapshot=DIRECTORIO_SNAPSHOT):
+        self.db_manager = db_manager or DatabaseManager()
+        self.ttl = ttl
+        self.verificar_cada = verificar_cada
+        self.escuchar = escuchar
+        self.ruta_snapshot = ruta_snapshot
+        self.empleados = {}      # {empleado_id: dict del empleado (sin embedding)}
+        self.embeddings = {}     # {empleado_id: np.ndarray float32 (128,)}
+        self.muestras = {}       # {empleado_id: np.ndarray float32 (K, 128)} muestras adicionales
+        self.version = None
+        self.marca = None        # Mayor Actualizado_En visto (high-water mark de cambios)
+        self.cargado_en = 0
+        self._ultimo_intento = 0
+        self._ausentes = set()   # IDs consultados que no existen (hasta la próxima recarga)
+        self._galeria = None     # (generación, modo, vectores, ids) de la última galería armada
+        self._generacion = 0     # Cambia con cada reemplazo de los datos
+        # Qué cambió en la última notificación (None = recarga completa): ver actualizar() y _usar_snapshot()
+        self.ultimos_cambios = None
+        self._lock = threading.Lock()
+        self._lock_snapshot = threading.Lock()
+        self._suscriptores = []
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def cargar(self):
+        """Carga el directorio completo con una sola consulta y lo reemplaza atómicamente"""
+        if not self.cargado_en and self._cargar_snapshot():
+            return True
+
+        self._ultimo_intento = time.time()
+        version = self.db_manager.obtener_version_empleados()
+        filas = self.db_manager.cargar_empleados()
+        if filas is None:
+            return False
+        muestras = self.db_manager.cargar_muestras()
+        if muestras is None:
+            muestras = self.muestras  # Sin muestras nuevas se conservan las anteriores
+
+        empleados = {}
+        embeddings = {}
+        for fila in filas:
+            embeddings[fila['id']] = fila.pop('embedding')
+            empleados[fila['id']] = fila
+
+        with self._lock:
+            self.empleados = empleados
+            self.embeddings = embeddings
+            self.muestras = muestras
+            self.version = version
+            self.marca = self._marca_maxima(filas, None)
+            self.cargado_en = time.time()
+            self._ausentes = set()
+            self._generacion += 1
+            self.ultimos_cambios = None
+
+        self._notificar()
+        self._programar_snapshot()
+        return True
+
+    def _cargar_snapshot(self):
+        """
+        Arranque rápido: mapea el snapshot local en memoria y trae de la base solo lo
+        que cambió desde entonces. Sin base disponible se arranca con el snapshot.
+        """
+        if not self.ruta_snapshot:
+            return False
+        datos = cargar_snapshot(self.ruta_snapshot)
+        if datos is None:
+            return False
+
+        with self._lock:
+            self.empleados = datos['empleados']
+            self.embeddings = datos['embeddings']
+            self.muestras = datos['muestras']
+            self.marca = datos['marca']
+            self.version = None
+            self.cargado_en = self._ultimo_intento = time.time()
+            self._ausentes = set()
+            self._generacion += 1
+            self.ultimos_cambios = None
+            if datos['galeria'] is not None:
+                self._galeria = (self._generacion,) + datos['galeria']
+        print(f"Directorio de empleados cargado desde snapshot ({len(self.empleados)} empleados)")
+
+        version = self.db_manager.obtener_version_empleados()
+        if version is not None and repr(version) == datos['version']:
+            self.version = version
+        elif version is not None and self.actualizar():
+            return True  # actualizar ya notificó y guardó el snapshot nuevo
+        self._notificar()
+        return True
+
+    def _programar_snapshot(self):
+        """Escribe el snapshot en segundo plano para no demorar el arranque ni los cambios"""
+        if self.ruta_snapshot:
+            threading.Thread(target=self._guardar_snapshot, daemon=True).start()
+
+    def _guardar_snapshot(self):
+        with self._lock_snapshot:
+            with self._lock:
+                empleados, embeddings, muestras = self.empleados, self.embeddings, self.muestras
+                version, marca = self.version, self.marca
+                generacion = self._generacion
+            try:
+                vectores, ids = self.obtener_galeria()
+                guardar_snapshot(self.ruta_snapshot, empleados, embeddings, muestras,
+                                 (GALERIA_MODO, vectores, ids), version, marca)
+            except Exception as e:
+                print(f"No se pudo guardar el snapshot del directorio: {e}")
+                return
+            self._usar_snapshot(generacion)
+
+    def _usar_snapshot(self, generacion):
+        """
+        Reemplaza los vectores en RAM por sus copias idénticas del snapshot recién
+        escrito: tras una carga desde la base o un cambio en caliente la galería
+        vuelve a ser memoria de archivo (que el sistema puede liberar) en lugar de
+        quedar en RAM. Se avisa a los suscriptores para que hagan lo mismo.
+        """
+        datos = cargar_snapshot(self.ruta_snapshot)
+        if datos is None or datos['galeria'] is None:
+            return
+        with self._lock:
+            galeria = self._galeria
+            if (self._generacion != generacion or galeria is None or galeria[0] != generacion
+                    or galeria[1] != datos['galeria'][0] or not np.array_equal(galeria[3], datos['galeria'][2])
+                    or datos['embeddings'].keys() != self.embeddings.keys()):
+                return  # Hubo cambios mientras se escribía: se remapea con el próximo snapshot
+            self.embeddings = datos['embeddings']
+            self.muestras = datos['muestras']
+            self._galeria = (generacion,) + datos['galeria']
+            self.ultimos_cambios = {'generacion': generacion, 'remapeo': True}
+        self._notificar()
+
+    def actualizar(self):
+        """
+        Aplica altas, modificaciones y bajas sin recargar todo: pide solo las filas
+        con Actualizado_En posterior a la marca (con un margen por transacciones que
+        confirmaron tarde) y la lista de IDs vigentes. Devuelve True si hubo cambios.
+        """
+        if self.marca is None:
+            return self.cargar()
+
+        version = self.db_manager.obtener_version_empleados()
+        desde = self.marca - timedelta(seconds=DIRECTORIO_MARGEN_MARCA) if isinstance(self.marca, datetime) else self.marca
+        filas = self.db_manager.cargar_empleados(desde=desde)
+        ids_vigentes = self.db_manager.obtener_ids_empleados()
+        if filas is None or ids_vigentes is None:
+            return False
+        muestras = self.db_manager.cargar_muestras([fila['id'] for fila in filas]) if filas else {}
+        if muestras is None:
+            return False
+
+        with self._lock:
+            empleados = dict(self.empleados)
+            embeddings = dict(self.embeddings)
+            todas_muestras = dict(self.muestras)
+            galeria = self._galeria if self._galeria and self._galeria[0] == self._generacion else None
+            bajas = set(embeddings) - ids_vigentes
+            cambiados = {fila['id'] for fila in filas}
+            altas = cambiados - set(embeddings)
+            previas = None
+            if galeria is not None:
+                # Filas anteriores de los empleados tocados, para que el índice aplique solo la diferencia
+                tocadas = np.isin(galeria[3], list(bajas | cambiados))
+                previas = (galeria[2][tocadas], galeria[3][tocadas])
+            for empleado_id in bajas:
+                empleados.pop(empleado_id, None)
+                embeddings.pop(empleado_id, None)
+                todas_muestras.pop(empleado_id, None)
+
+            for fila in filas:
+                embeddings[fila['id']] = fila.pop('embedding')
+                empleados[fila['id']] = fila
+                if fila['id'] in muestras:
+                    todas_muestras[fila['id']] = muestras[fila['id']]
+                else:
+                    todas_muestras.pop(fila['id'], None)
+
+            self.empleados = empleados
+            self.embeddings = embeddings
+            self.muestras = todas_muestras
+            self.version = version
+            self.marca = self._marca_maxima(filas, self.marca)
+            self._ausentes = set()
+            self._generacion += 1
+            self.ultimos_cambios = None if previas is None else {
+                'generacion': self._generacion, 'altas': altas, 'modificados': cambiados - altas,
+                'bajas': bajas, 'previas': previas
+            }
+            if galeria is not None:
+                # Solo se rearman las filas de los empleados que cambiaron
+                self._galeria = (self._generacion, galeria[1]) + actualizar_galeria(
+                    galeria[2], galeria[3], embeddings, todas_muestras,
+                    bajas | cambiados, galeria[1])
+
+        if not filas and not bajas:
+            return False
+        self._notificar()
+        self._programar_snapshot()
+        return True
+
+    @staticmethod
+    def _marca_maxima(filas, marca):
+        marcas = [fila['actualizado_en'] for fila in filas if fila.get('actualizado_en') is not None]
+        if marca is not None:
+            marcas.append(marca)
+        return max(marcas) if marcas else None
+
+    def _notificar(self):
+        for callback in list(self._suscriptores):
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Error notificando cambio de directorio: {e}")
+
+    def obtener(self, empleado_id):
+        """Devuelve los datos del empleado sin consultar la base (None si no existe)"""
+        if empleado_id is None:
+            return None
+
+        if time.time() - max(self.cargado_en, self._ultimo_intento) > self.ttl and self._hilo is None:
+            # Sin refresco en segundo plano, el TTL se aplica en la consulta
+            self.cargar()
+
+        empleado = self.empleados.get(empleado_id)
+        if empleado is None and empleado_id not in self._ausentes:
+            # Alta reciente aún no refrescada: traerla una sola vez y cachearla
+            empleado = self.db_manager.obtener_empleado(empleado_id)
+            with self._lock:
+                if empleado:
+                    self.empleados = {**self.empleados, empleado_id: empleado}
+                else:
+                    self._ausentes.add(empleado_id)
+        return empleado
+
+    def obtener_embeddings(self):
+        """Devuelve (caras, nombres, ids) con el mismo formato que cargar_embeddings"""
+        with self._lock:
+            empleados = self.empleados
+            embeddings = self.embeddings
+
+        ids = [empleado_id for empleado_id in embeddings if empleado_id in empleados]
+        caras = [embeddings[empleado_id] for empleado_id in ids]
+        nombres = [empleados[empleado_id]['nombre_completo'] for empleado_id in ids]
+        return caras, nombres, ids
+
+    def obtener_galeria(self, modo=GALERIA_MODO):
+        """
+        Devuelve (vectores, ids) con todas las muestras de cada empleado (ver armar_galeria).
+        Se arma una vez por versión de los datos (o viene ya armada en el snapshot).
+        """
+        with self._lock:
+            empleados = self.empleados
+            embeddings = self.embeddings
+            muestras = self.muestras
+            generacion = self._generacion
+            galeria = self._galeria
+
+        if galeria is not None and galeria[0] == generacion and galeria[1] == modo:
+            return galeria[2], galeria[3]
+
+        vectores, ids = armar_galeria({empleado_id: embedding for empleado_id, embedding in embeddings.items()
+                                       if empleado_id in empleados}, muestras, modo)
+        with self._lock:
+            if self._generacion == generacion:
+                self._galeria = (generacion, modo, vectores, ids)
+        return vectores, ids
+
+    @property
+    def generacion(self):
+        """Cambia con cada reemplazo de los datos (permite saber a qué versión corresponde una galería)"""
+        return self._generacion
+
+    def suscribir(self, callback):
+        """Registra una función callback(directorio) a invocar tras cada recarga"""
+        self._suscriptores.append(callback)
+
+    def verificar_cambios(self):
+        """Aplica los cambios si cambió la tabla empleados; recarga completa si venció el TTL"""
+        if time.time() - self.cargado_en > self.ttl:
+            return self.cargar()
+
+        version = self.db_manager.obtener_version_empleados()
+        if version is not None and version != self.version:
+            return self.actualizar()
+        return False
+
+    def iniciar_actualizacion(self):
+        """Inicia el hilo que refresca el directorio en segundo plano"""
+        if self._hilo is not None:
+            return
+
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle_actualizacion, daemon=True)
+        self._hilo.start()
+
+    def _bucle_actualizacion(self):
+        """
+        Con LISTEN/NOTIFY despierta apenas la base avisa un cambio; la verificación
+        periódica sigue corriendo como respaldo (avisos perdidos, base sin trigger,
+        réplica local o conexión a través de PgBouncer).
+        """
+        escucha = None
+        while not self._detener.is_set():
+            if self.escuchar and escucha is None:
+                escucha = self.db_manager.abrir_escucha_empleados()
+
+            if escucha is not None:
+                avisos = self.db_manager.esperar_cambios_empleados(escucha, self.verificar_cada)
+                if avisos is None:
+                    self._cerrar_escucha(escucha)
+                    escucha = None
+                    self._detener.wait(self.verificar_cada)
+            else:
+                self._detener.wait(self.verificar_cada)
+
+            if self._detener.is_set():
+                break
+            try:
+                if self.verificar_cambios():
+                    print(f"Directorio de empleados actualizado ({len(self.empleados)} empleados)")
+            except Exception as e:
+                print(f"Error actualizando directorio de empleados: {e}")
+        self._cerrar_escucha(escucha)
+
+    @staticmethod
+    def _cerrar_escucha(escucha):
+        if escucha is not None:
+            try:
+                escucha.close()
+            except Exception:
+                pass
+
+    def detener(self):
+        """Detiene el refresco en segundo plano"""
+        self._detener.set()
+        self._hilo = None
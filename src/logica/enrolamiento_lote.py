@@ -0,0 +1,269 @@
+"""
+Enrolamiento masivo de empleados desde una carpeta de fotos o un manifiesto CSV.
+
+Las fotos se codifican en paralelo en varios procesos; las que no tienen
+exactamente una cara se rechazan con su motivo y el resto se inserta en una
+sola transacción.
+
+Uso:
+    python -m src.logica.enrolamiento_lote imagenes_empleados/ --departamento Ventas --turno Manana
+    python -m src.logica.enrolamiento_lote altas.csv [--procesos 4] [--simular]
+
+El CSV debe tener las columnas nombre, apellido, departamento, turno y foto_path
+(rutas relativas al CSV). Si una fila trae id_empleado, la foto se agrega como
+muestra adicional de ese empleado en lugar de darlo de alta. En una carpeta, el
+nombre sale del archivo: Nombre_Apellido_27.png -> Nombre "Nombre", Apellido "Apellido".
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .config import MODEL, DEPARTAMENTOS_VALIDOS, TURNOS_VALIDOS, ENROLAMIENTO_PROCESOS
+
+EXTENSIONES_IMAGEN = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+
+def _nombre_desde_archivo(ruta):
+    """Nombre_Apellido_27.png -> ('Nombre', 'Apellido'); los dígitos finales son el ID anterior"""
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    partes = [p for p in re.sub(r'\d+$', '', base).replace('-', '_').split('_') if p]
+    if not partes:
+        return base, ''
+    return partes[0], ' '.join(partes[1:])
+
+
+def leer_carpeta(carpeta, departamento, turno):
+    """Una entrada por imagen de la carpeta, con departamento y turno comunes"""
+    entradas = []
+    for archivo in sorted(os.listdir(carpeta)):
+        if not archivo.lower().endswith(EXTENSIONES_IMAGEN):
+            continue
+        nombre, apellido = _nombre_desde_archivo(archivo)
+        entradas.append({
+            'nombre': nombre,
+            'apellido': apellido,
+            'departamento': departamento,
+            'turno': turno,
+            'foto_path': os.path.join(carpeta, archivo)
+        })
+    return entradas
+
+
+def leer_manifiesto(ruta_csv, departamento=None, turno=None):
+    """
+    Lee un CSV con columnas nombre, apellido, departamento, turno, foto_path y,
+    opcionalmente, id_empleado. departamento y turno son opcionales en el CSV si
+    se indican por defecto.
+    """
+    base = os.path.dirname(os.path.abspath(ruta_csv))
+    entradas = []
+    with open(ruta_csv, newline='', encoding='utf-8-sig') as archivo:
+        for fila in csv.DictReader(archivo):
+            fila = {clave.strip().lower(): (valor or '').strip() for clave, valor in fila.items() if clave}
+            foto = fila.get('foto_path', '')
+            if foto and not os.path.isabs(foto):
+                foto = os.path.join(base, foto)
+            entradas.append({
+                'nombre': fila.get('nombre', ''),
+                'apellido': fila.get('apellido', ''),
+                'departamento': fila.get('departamento') or departamento,
+                'turno': fila.get('turno') or turno,
+                'foto_path': foto,
+                'id_empleado': fila.get('id_empleado') or None
+            })
+    return entradas
+
+
+def ruta_dentro_de(ruta, base):
+    """
+    Resuelve ruta (relativa a base si no es absoluta, siguiendo enlaces) y la
+    devuelve solo si queda dentro de base; si no, None.
+    """
+    base = os.path.realpath(base)
+    resuelta = os.path.realpath(os.path.join(base, ruta))
+    return resuelta if os.path.commonpath([base, resuelta]) == base else None
+
+
+def leer_entradas(ruta, departamento=None, turno=None):
+    """Carpeta de fotos o manifiesto CSV, según lo que sea ruta"""
+    if os.path.isdir(ruta):
+        return leer_carpeta(ruta, departamento, turno)
+    return leer_manifiesto(ruta, departamento, turno)
+
+
+def codificar_foto(foto_path, modelo=MODEL):
+    """
+    Detecta y codifica la cara de una foto (se ejecuta en los procesos del pool).
+    Las ubicaciones detectadas se reutilizan en face_encodings para no detectar dos veces.
+
+    Returns:
+        tuple: (embedding float32, None) o (None, motivo de rechazo)
+    """
+    import face_recognition
+
+    try:
+        imagen = face_recognition.load_image_file(foto_path)
+    except Exception as e:
+        return None, f"no se pudo leer la imagen ({e})"
+
+    ubicaciones = face_recognition.face_locations(imagen, model=modelo)
+    if not ubicaciones:
+        return None, "sin caras"
+    if len(ubicaciones) > 1:
+        return None, f"{len(ubicaciones)} caras"
+
+    encoding = face_recognition.face_encodings(imagen, ubicaciones)[0]
+    return encoding.astype(np.float32), None
+
+
+def validar_entrada(entrada):
+    """Devuelve el motivo de rechazo de los datos (sin mirar la cara) o None si son válidos"""
+    if not entrada['foto_path'] or not os.path.exists(entrada['foto_path']):
+        return f"el archivo no existe: {entrada['foto_path']}"
+    if entrada.get('id_empleado') is not None:
+        return None if str(entrada['id_empleado']).isdigit() else f"id_empleado inválido: {entrada['id_empleado']}"
+    if not entrada['nombre']:
+        return "nombre vacío"
+    if entrada['departamento'] not in DEPARTAMENTOS_VALIDOS:
+        return f"departamento inválido: {entrada['departamento']}"
+    if entrada['turno'] not in TURNOS_VALIDOS:
+        return f"turno inválido: {entrada['turno']}"
+    return None
+
+
+def enrolar_lote(entradas, db_manager=None, procesos=ENROLAMIENTO_PROCESOS, simular=False):
+    """
+    Codifica las fotos en paralelo e inserta las aceptadas en una sola transacción.
+    Las entradas con id_empleado se guardan como muestras adicionales de ese empleado.
+
+    Args:
+        entradas: lista de dicts con nombre, apellido, departamento, turno y foto_path
+        db_manager: DatabaseManager destino (no se usa si simular=True)
+        procesos: procesos de codificación (0 = uno por CPU)
+        simular: solo codificar y reportar, sin escribir en la base
+
+    Returns:
+        dict: {'aceptados': [...], 'rechazados': [(foto_path, motivo)], 'ids': [...],
+               'muestras': int, 'ok': bool}
+    """
+    reporte = {'aceptados': [], 'rechazados': [], 'ids': [], 'muestras': 0, 'ok': True}
+
+    registradas = set()
+    if db_manager is not None and not simular:
+        registradas = db_manager.obtener_fotos_empleados() or set()
+
+    candidatas = []
+    vistas = set()
+    for entrada in entradas:
+        foto = os.path.normpath(entrada['foto_path']) if entrada['foto_path'] else ''
+        motivo = validar_entrada(entrada)
+        if motivo is None and (foto in vistas or foto in registradas):
+            motivo = "foto ya enrolada"
+        if motivo:
+            reporte['rechazados'].append((entrada['foto_path'], motivo))
+        else:
+            vistas.add(foto)
+            candidatas.append(entrada)
+
+    if candidatas:
+        procesos = procesos or os.cpu_count() or 1
+        fotos = [entrada['foto_path'] for entrada in candidatas]
+        if procesos == 1 or len(candidatas) == 1:
+            resultados = map(codificar_foto, fotos)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=min(procesos, len(candidatas)),
+                                           mp_context=multiprocessing.get_context('spawn'))
+            resultados = executor.map(codificar_foto, fotos,
+                                      chunksize=max(1, len(fotos) // (procesos * 4)))
+        try:
+            for entrada, (embedding, motivo) in zip(candidatas, resultados):
+                if motivo:
+                    reporte['rechazados'].append((entrada['foto_path'], motivo))
+                else:
+                    reporte['aceptados'].append(dict(entrada, embedding=embedding))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    if simular:
+        return reporte
+
+    nuevos = [e for e in reporte['aceptados'] if e.get('id_empleado') is None]
+    muestras = [(int(e['id_empleado']), e['embedding'], e['foto_path'])
+                for e in reporte['aceptados'] if e.get('id_empleado') is not None]
+    if nuevos:
+        ids = db_manager.agregar_empleados_lote(nuevos)
+        if ids is None:
+            reporte['ok'] = False
+        else:
+            reporte['ids'] = ids
+    if muestras:
+        if db_manager.agregar_muestras(muestras):
+            reporte['muestras'] = len(muestras)
+        else:
+            reporte['ok'] = False
+    return reporte
+
+
+def imprimir_reporte(reporte, duracion=None, simular=False):
+    print("=" * 60)
+    accion = "a enrolar (simulación)" if simular else "enrolados"
+    print(f"Empleados {accion}: {len(reporte['aceptados'])} | rechazados: {len(reporte['rechazados'])}"
+          + (f" | {duracion:.1f} s" if duracion is not None else ""))
+    if reporte['muestras']:
+        print(f"Muestras agregadas a empleados existentes: {reporte['muestras']}")
+    if not reporte['ok']:
+        print("❌ La inserción en la base falló; revisar los IDs y muestras reportados")
+    print("=" * 60)
+    for foto, motivo in reporte['rechazados']:
+        print(f"  ✗ {foto}: {motivo}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrolamiento masivo de empleados desde fotos")
+    parser.add_argument('ruta', help='Carpeta de fotos o manifiesto CSV')
+    parser.add_argument('--departamento', choices=DEPARTAMENTOS_VALIDOS,
+                        help='Departamento para las fotos de una carpeta (o faltante en el CSV)')
+    parser.add_argument('--turno', choices=TURNOS_VALIDOS,
+                        help='Turno para las fotos de una carpeta (o faltante en el CSV)')
+    parser.add_argument('--procesos', type=int, default=ENROLAMIENTO_PROCESOS,
+                        help='Procesos de codificación (0 = uno por CPU)')
+    parser.add_argument('--simular', action='store_true',
+                        help='Codificar y reportar sin escribir en la base')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta):
+        print(f"No existe: {args.ruta}")
+        return 1
+
+    if os.path.isdir(args.ruta) and not (args.departamento and args.turno):
+        print("Para enrolar una carpeta hay que indicar --departamento y --turno")
+        return 1
+
+    entradas = leer_entradas(args.ruta, args.departamento, args.turno)
+    if not entradas:
+        print(f"No se encontraron fotos en {args.ruta}")
+        return 1
+
+    db_manager = None
+    if not args.simular:
+        from .administrador_database import DatabaseManager
+        db_manager = DatabaseManager()
+
+    inicio = time.perf_counter()
+    reporte = enrolar_lote(entradas, db_manager, args.procesos, args.simular)
+    imprimir_reporte(reporte, time.perf_counter() - inicio, args.simular)
+    return 0 if reporte['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
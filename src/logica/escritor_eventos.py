@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from .administrador_database import DatabaseManager
+from .config import SPOOL_RUTA, ESCRITOR_TAM_LOTE, ESCRITOR_LATENCIA_MAXIMA, ESCRITOR_REINTENTO_MAXIMO
+
+
+class EscritorEventos:
+    """
+    Escritor asíncrono de ingresos, egresos y denegaciones.
+    Cada evento se agrega primero a un spool local (JSON lines con fsync) y luego a
+    una cola en memoria; un hilo en segundo plano los escribe en lotes con latencia
+    acotada. Si la base no responde, los eventos quedan en el spool y se reproducen
+    en orden al reconectar (también tras un reinicio del tótem).
+
+    Expone la misma interfaz de escritura que DatabaseManager, por lo que puede
+    usarse como destino de EstadoAsistenciaDiaria y de AttendanceManager.
+    """
+
+    def __init__(self, db_manager=None, ruta_spool=SPOOL_RUTA, tam_lote=ESCRITOR_TAM_LOTE,
+                 latencia_maxima=ESCRITOR_LATENCIA_MAXIMA):
+        self.db_manager = db_manager or DatabaseManager()
+        self.ruta_spool = ruta_spool
+        self.tam_lote = tam_lote
+        self.latencia_maxima = latencia_maxima
+        self.origen = None          # Identificador estable del spool (para el checkpoint en la base)
+        self._seq = 0               # Último número de secuencia asignado
+        self._confirmado = None     # Último seq confirmado en la base (None = desconocido)
+        self._pendientes = deque()  # Eventos en spool aún no confirmados, en orden
+        self._condicion = threading.Condition()
+        self._spool_lock = threading.Lock()
+        self._archivo = None
+        self._corriendo = False
+        self._hilo = None
+
+    # -----------------------
+    #   Interfaz de escritura
+    # -----------------------
+    def registrar_ingreso(self, empleado_id, turno, hora_actual, minutos_tarde, observacion, fecha=None):
+        """Encola un ingreso; devuelve True si quedó persistido en el spool"""
+        return self._encolar('ingreso', {
+            'fecha': (fecha or datetime.now().date()).isoformat(),
+            'id_empleado': empleado_id,
+            'turno': turno,
+            'hora': hora_actual,
+            'minutos_tarde': minutos_tarde,
+            'observacion': observacion
+        })
+
+    def registrar_egreso(self, empleado_id, hora_actual, fecha=None):
+        """Encola un egreso; devuelve True si quedó persistido en el spool"""
+        return self._encolar('egreso', {
+            'fecha': (fecha or datetime.now().date()).isoformat(),
+            'id_empleado': empleado_id,
+            'hora': hora_actual
+        })
+
+    def registrar_denegacion(self, motivo, modo_operacion, id_empleado=None,
+                             minutos_tarde=None, turno_esperado=None, turno_detectado=None,
+                             nombre_detectado=None, observaciones=None):
+        """Encola una denegación con la fecha y hora del momento en que ocurrió"""
+        ahora = datetime.now()
+        return self._encolar('denegacion', {
+            'fecha': ahora.date().isoformat(),
+            'hora': ahora.strftime("%H:%M:%S"),
+            'id_empleado': id_empleado,
+            'motivo': motivo,
+            'modo_operacion': modo_operacion,
+            'minutos_tarde': minutos_tarde,
+            'turno_esperado': turno_esperado,
+            'turno_detectado': turno_detectado,
+            'nombre_detectado': nombre_detectado,
+            'observaciones': observaciones
+        })
+
+    # -----------------------
+    #   Spool local
+    # -----------------------
+    def _abrir_spool(self):
+        """Lee el spool existente (eventos pendientes de una ejecución anterior) y lo deja abierto"""
+        os.makedirs(os.path.dirname(self.ruta_spool) or '.', exist_ok=True)
+
+        if os.path.exists(self.ruta_spool):
+            with open(self.ruta_spool, encoding='utf-8') as archivo:
+                for numero, linea in enumerate(archivo):
+                    try:
+                        registro = json.loads(linea)
+                    except json.JSONDecodeError:
+                        # Última línea truncada por un corte: se descarta
+                        print(f"Spool: línea {numero + 1} inválida, se ignora")
+                        continue
+                    if 'origen' in registro:
+                        self.origen = registro['origen']
+                        self._seq = max(self._seq, registro.get('seq', 0))
+                    else:
+                        self._pendientes.append(registro)
+                        self._seq = max(self._seq, registro['seq'])
+
+        if self.origen is None:
+            self.origen = uuid.uuid4().hex
+            self._reescribir_spool([])
+        else:
+            self._archivo = open(self.ruta_spool, 'a', encoding='utf-8')
+
+    def _reescribir_spool(self, pendientes):
+        """Compacta el spool de forma atómica dejando solo los eventos pendientes"""
+        temporal = f"{self.ruta_spool}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            archivo.write(json.dumps({'origen': self.origen, 'seq': self._seq}) + "\n")
+            for evento in pendientes:
+                archivo.write(json.dumps(evento) + "\n")
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+        if self._archivo:
+            self._archivo.close()
+        os.replace(temporal, self.ruta_spool)
+        self._archivo = open(self.ruta_spool, 'a', encoding='utf-8')
+
+    def _encolar(self, tipo, datos):
+        try:
+            with self._spool_lock:
+                if self._archivo is None:
+                    self._abrir_spool()
+                self._seq += 1
+                evento = {'seq': self._seq, 'tipo': tipo, 'datos': datos}
+                self._archivo.write(json.dumps(evento) + "\n")
+                self._archivo.flush()
+                os.fsync(self._archivo.fileno())
+
+                # Dentro del lock del spool para que la cola respete el orden de seq
+                with self._condicion:
+                    self._pendientes.append(evento)
+                    self._condicion.notify()
+            return True
+
+        except Exception as e:
+            print(f"Error encolando evento {tipo}: {e}")
+            return False
+
+    # -----------------------
+    #   Hilo escritor
+    # -----------------------
+    def iniciar(self):
+        """Abre el spool, reproduce pendientes y arranca el hilo escritor"""
+        if self._corriendo:
+            return
+
+        with self._spool_lock:
+            if self._archivo is None:
+                self._abrir_spool()
+        if self._pendientes:
+            print(f"Spool: {len(self._pendientes)} eventos pendientes de una ejecución anterior")
+
+        self._corriendo = True
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def _tomar_lote(self):
+        """Espera el primer evento y junta más hasta tam_lote o latencia_maxima"""
+        with self._condicion:
+            while self._corriendo and not self._pendientes:
+                self._condicion.wait(1.0)
+
+            limite = time.time() + self.latencia_maxima
+            while self._corriendo and len(self._pendientes) < self.tam_lote:
+                restante = limite - time.time()
+                if restante <= 0:
+                    break
+                self._condicion.wait(restante)
+
+            return [self._pendientes[i] for i in range(min(self.tam_lote, len(self._pendientes)))]
+
+    def _bucle(self):
+        espera = 0.5
+        while self._corriendo or self._pendientes:
+            # Conocer el checkpoint de la base antes de escribir (evita duplicar tras un corte)
+            if self._confirmado is None:
+                self._confirmado = self.db_manager.obtener_ultimo_evento_confirmado(self.origen)
+                if self._confirmado is None:
+                    if not self._esperar_reintento(espera):
+                        return
+                    espera = min(espera * 2, ESCRITOR_REINTENTO_MAXIMO)
+                    continue
+                self._descartar_confirmados(self._confirmado)
+
+            lote = self._tomar_lote()
+            if not lote:
+                continue
+
+            if self.db_manager.escribir_eventos_lote(lote, self.origen, lote[-1]['seq']):
+                espera = 0.5
+                self._descartar_confirmados(lote[-1]['seq'])
+            else:
+                # Base caída: conservar el orden y reintentar con backoff
+                if not self._esperar_reintento(espera):
+                    return
+                espera = min(espera * 2, ESCRITOR_REINTENTO_MAXIMO)
+
+    def _esperar_reintento(self, segundos):
+        """Espera antes de reintentar; devuelve False si se pidió detener el escritor"""
+        with self._condicion:
+            self._condicion.wait(segundos)
+        return self._corriendo
+
+    def _descartar_confirmados(self, seq):
+        with self._condicion:
+            while self._pendientes and self._pendientes[0]['seq'] <= seq:
+                self._pendientes.popleft()
+            vacio = not self._pendientes
+        self._confirmado = seq
+
+        if vacio:
+            with self._spool_lock:
+                if self._seq == seq:
+                    self._reescribir_spool([])
+
+    def pendientes(self):
+        """Cantidad de eventos aún no confirmados en la base"""
+        return len(self._pendientes)
+
+    def detener(self, timeout=5.0):
+        """Intenta vaciar la cola antes de detener; lo no escrito queda en el spool"""
+        limite = time.time() + timeout
+        while self._pendientes and time.time() < limite and self._hilo and self._hilo.is_alive():
+            time.sleep(0.05)
+
+        with self._condicion:
+            self._corriendo = False
+            self._condicion.notify_all()
+        if self._hilo:
+            self._hilo.join(timeout=1.0)
+            self._hilo = None
+
+        with self._spool_lock:
+            if self._archivo:
+                self._archivo.close()
+                self._archivo = None
@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from .administrador_database import DatabaseManager
+from .config import ESTADO_NEGATIVO_TTL
+from ..utils.time_utils import fecha_jornada
+
+
+class EstadoAsistenciaDiaria:
+    """
+    Estado de asistencia de la jornada en memoria: {(fecha, empleado_id): ingreso/egreso}.
+    Se precarga con una sola consulta al iniciar y al cambiar el día, y se actualiza
+    en modo write-through por registrar_ingreso/registrar_egreso. Las fechas son de
+    jornada, por lo que el turno noche queda asociado al día en que comenzó.
+    """
+
+    def __init__(self, db_manager=None, destino=None, negativo_ttl=ESTADO_NEGATIVO_TTL):
+        self.db_manager = db_manager or DatabaseManager()
+        self.destino = destino or self.db_manager  # Recibe las escrituras (write-through)
+        self.negativo_ttl = negativo_ttl
+        self._registros = {}   # {(fecha, empleado_id): dict con el formato de verificar_asistencia_hoy}
+        self._sin_registro = {}  # {(fecha, empleado_id): timestamp de la última confirmación negativa}
+        self._dia_cargado = None
+        self._lock = threading.Lock()
+
+    def calentar(self):
+        """Carga las jornadas de ayer y hoy (ayer cubre el turno noche en curso)"""
+        hoy = datetime.now().date()
+        filas = self.db_manager.cargar_asistencias_desde(hoy - timedelta(days=1))
+        if filas is None:
+            return False
+
+        registros = {}
+        for id_asistencia, fecha, empleado_id, hora_ingreso, hora_egreso in filas:
+            registros[(fecha, empleado_id)] = self._armar_registro(id_asistencia, hora_ingreso, hora_egreso)
+
+        with self._lock:
+            self._registros = registros
+            self._sin_registro = {}
+            self._dia_cargado = hoy
+        return True
+
+    def _verificar_cambio_dia(self):
+        if self._dia_cargado != datetime.now().date():
+            if not self.calentar():
+                # Sin base disponible: descartar jornadas viejas y seguir con lo conocido
+                limite = datetime.now().date() - timedelta(days=1)
+                with self._lock:
+                    self._registros = {k: v for k, v in self._registros.items() if k[0] >= limite}
+                    self._dia_cargado = datetime.now().date()
+
+    def _armar_registro(self, id_asistencia, hora_ingreso, hora_egreso):
+        return {
+            'id_asistencia': id_asistencia,
+            'hora_ingreso': hora_ingreso,
+            'hora_egreso': hora_egreso,
+            'tiene_ingreso': hora_ingreso is not None,
+            'tiene_egreso': hora_egreso is not None
+        }
+
+    def consultar(self, empleado_id, turno=None):
+        """Equivalente en memoria de verificar_asistencia_hoy para la jornada actual del turno"""
+        self._verificar_cambio_dia()
+        clave = (fecha_jornada(turno), empleado_id)
+
+        registro = self._registros.get(clave)
+        if registro is not None:
+            return registro
+
+        # Otro tótem pudo registrar el ingreso: confirmar en la base cada negativo_ttl
+        if time.time() - self._sin_registro.get(clave, 0) < self.negativo_ttl:
+            return None
+
+        registro = self.db_manager.verificar_asistencia_hoy(empleado_id, fecha=clave[0])
+        with self._lock:
+            if registro:
+                self._registros[clave] = registro
+                self._sin_registro.pop(clave, None)
+            else:
+                self._sin_registro[clave] = time.time()
+        return registro
+
+    def registrar_ingreso(self, empleado_id, turno, hora_actual, minutos_tarde, observacion):
+        """Registra el ingreso en el destino y actualiza el estado en memoria"""
+        fecha = fecha_jornada(turno)
+        resultado = self.destino.registrar_ingreso(
+            empleado_id, turno, hora_actual, minutos_tarde, observacion, fecha=fecha
+        )
+
+        if resultado:
+            # Con escritura asíncrona el ID aún no existe (el destino devuelve True)
+            id_asistencia = None if resultado is True else resultado
+            with self._lock:
+                self._registros[(fecha, empleado_id)] = self._armar_registro(id_asistencia, hora_actual, None)
+                self._sin_registro.pop((fecha, empleado_id), None)
+        return resultado
+
+    def registrar_egreso(self, empleado_id, turno, hora_actual):
+        """Registra el egreso en el destino y actualiza el estado en memoria"""
+        fecha = fecha_jornada(turno)
+        exito = self.destino.registrar_egreso(empleado_id, hora_actual, fecha=fecha)
+
+        with self._lock:
+            if exito and (fecha, empleado_id) in self._registros:
+                registro = dict(self._registros[(fecha, empleado_id)])
+                registro.update({'hora_egreso': hora_actual, 'tiene_egreso': True})
+                self._registros[(fecha, empleado_id)] = registro
+            elif not exito:
+                # Posible egreso registrado por otro tótem: forzar reconsulta
+                self._registros.pop((fecha, empleado_id), None)
+                self._sin_registro.pop((fecha, empleado_id), None)
+        return exito
@@ -1,76 +1,247 @@
 import face_recognition
 import cv2
 import numpy as np
-from .config import TOLERANCIA, MODEL, FRAME_SCALE
+import threading
+import time
+from .config import (
+    TOLERANCIA, FRAME_SCALE, MOVIMIENTO_HABILITADO, GALERIA_MODO, AUTOENROLAMIENTO_HABILITADO, INDICE_TIPO
+)
 from .administrador_database import DatabaseManager
+from .directorio_empleados import DirectorioEmpleados
+from .indice_embeddings import crear_indice, cargar_indice, TIPOS_INDICE
+from .seguimiento_caras import SeguidorCaras
+from .detector_movimiento import DetectorMovimiento
+from .detectores_caras import crear_detector
+from .codificacion_caras import escalar_ubicaciones, escala_entre, codificar_regiones
+from .galeria_embeddings import AutoEnrolamiento
 
 class FaceRecognitionEngine:
-    def __init__(self):
+    def __init__(self, directorio=None):
         self.db_manager = DatabaseManager()
-        self.empleados_caras = []
+        self.directorio = directorio or DirectorioEmpleados(self.db_manager)
+        self.indice = crear_indice()  # Índice de embeddings (exacto o aproximado según config)
         self.empleados_nombres = []
         self.empleados_ids = []
-        self.last_matches = []  # Para reutilizar encodings previos
+        self.nombres_por_id = {}
+        self._generacion_indice = None  # Generación del directorio reflejada en el índice
+        self._lock_galeria = threading.Lock()  # Los avisos del directorio llegan desde más de un hilo
+        self.seguidor = SeguidorCaras()  # Evita recalcular encodings de caras ya identificadas
+        self.compuerta = DetectorMovimiento() if MOVIMIENTO_HABILITADO else None  # Saltea escenas quietas
+        self.detector = crear_detector()  # Backend de detección configurado (DETECTOR_TIPO)
+        # Muestras en vivo de alta confianza que se suman a la galería de cada empleado
+        self.autoenrolamiento = (AutoEnrolamiento(self.db_manager, al_aceptar=self._sumar_muestras_en_vivo)
+                                 if AUTOENROLAMIENTO_HABILITADO else None)
+        self._suscripto = False
         
     def load_known_faces(self):
         """Carga las caras conocidas desde la base de datos"""
         print("Cargando imágenes conocidas desde la base de datos...")
-        self.empleados_caras, self.empleados_nombres, self.empleados_ids = self.db_manager.cargar_embeddings()
-        print(f"Cargadas {len(self.empleados_caras)} caras conocidas")
-        return len(self.empleados_caras) > 0
+        if not self.directorio.cargado_en:
+            self.directorio.cargar()
+        with self._lock_galeria:
+            self._aplicar_galeria(usar_persistido=True)
+        
+        if not self._suscripto:
+            # Altas, cambios y bajas posteriores se aplican en caliente, sin reiniciar el tótem
+            self.directorio.suscribir(self._al_cambiar_directorio)
+            self._suscripto = True
+        
+        print(f"Cargadas {len(self.indice)} muestras de {len(self.empleados_ids)} caras conocidas")
+        return len(self.indice) > 0
+    
+    def _aplicar_galeria(self, usar_persistido=False):
+        """
+        Arma el índice nuevo a un costado y lo publica con una sola asignación: el
+        reconocimiento en curso termina su consulta con el anterior, sin bloqueos.
+        """
+        generacion = self.directorio.generacion
+        _, nombres, ids_empleados = self.directorio.obtener_embeddings()
+        
+        # Galería con todas las muestras de cada empleado (o su centroide, según GALERIA_MODO)
+        vectores, ids = self.directorio.obtener_galeria()
+        
+        # Reutilizar el índice persistido (solo si entrenarlo es caro) si coincide con la
+        # galería; si no, construirlo sobre los vectores del directorio, que pueden venir
+        # mapeados del snapshot sin ocupar RAM
+        entrenable = TIPOS_INDICE[INDICE_TIPO].entrenable
+        indice = cargar_indice() if usar_persistido and entrenable else None
+        if indice is None or not (np.array_equal(indice.ids, ids) and np.array_equal(indice.vectores, vectores)):
+            indice = crear_indice()
+            indice.construir(vectores, ids)
+            self._persistir(indice)
+        
+        self._publicar(indice, nombres, ids_empleados, generacion)
+    
+    @staticmethod
+    def _persistir(indice):
+        """Guarda el índice solo si entrenarlo es caro (para no reentrenar al reiniciar)"""
+        if len(indice) and indice.entrenable:
+            try:
+                indice.guardar()
+            except OSError as e:
+                print(f"No se pudo persistir el índice de embeddings: {e}")
+    
+    def _publicar(self, indice, nombres, ids_empleados, generacion):
+        # Los nombres se publican antes que el índice para que todo ID encontrado tenga nombre
+        self.empleados_nombres, self.empleados_ids = nombres, ids_empleados
+        self.nombres_por_id = dict(zip(ids_empleados, nombres))
+        self.indice = indice
+        self._generacion_indice = generacion
+    
+    def _aplicar_cambios(self, cambios):
+        """
+        Aplica un cambio incremental del directorio sobre una copia del índice en uso:
+        las filas nuevas de la galería (altas, muestras agregadas) se suman con
+        agregar(); solo si algún empleado perdió filas (baja, foto reemplazada,
+        muestra descartada) se rearma con reemplazar(), que en el IVF conserva los
+        centroides.
+        """
+        vectores, ids = self.directorio.obtener_galeria()
+        if cambios.get('remapeo'):
+            # Mismos datos, ahora mapeados del snapshot: los float32 en RAM se liberan
+            if cambios['generacion'] == self._generacion_indice and np.array_equal(self.indice.ids, ids):
+                self.indice.usar_vectores(vectores)
+            return
+        
+        _, nombres, ids_empleados = self.directorio.obtener_embeddings()
+        vectores_previos, ids_previos = cambios['previas']
+        cambiados = np.fromiter(cambios['altas'] | cambios['modificados'], dtype=np.int64)
+        previas = np.isin(ids_previos, cambiados)
+        nuevas = np.flatnonzero(np.isin(ids, cambiados))
+        claves_previas = {(empleado_id, vector.tobytes())
+                          for empleado_id, vector in zip(ids_previos[previas], vectores_previos[previas])}
+        claves_nuevas = [(ids[posicion], vectores[posicion].tobytes()) for posicion in nuevas]
+        
+        indice = self.indice.copiar()
+        if np.isin(ids_previos, list(cambios['bajas'])).any() or claves_previas - set(claves_nuevas):
+            indice.reemplazar(vectores, ids)
+        else:
+            agregadas = [posicion for posicion, clave in zip(nuevas, claves_nuevas) if clave not in claves_previas]
+            if not agregadas:
+                self._publicar(self.indice, nombres, ids_empleados, cambios['generacion'])
+                return
+            # Una muestra automática ya sumada en vivo puede repetirse: no cambia la búsqueda
+            indice.agregar(vectores[agregadas], ids[agregadas])
+        self._persistir(indice)
+        self._publicar(indice, nombres, ids_empleados, cambios['generacion'])
+    
+    def _sumar_muestras_en_vivo(self, lote):
+        """
+        Suma al índice las muestras automáticas aceptadas, para tenerlas ya en este
+        tótem sin esperar al directorio. Corre en el hilo de escritura del
+        autoenrolamiento: el reentrenamiento del IVF, si toca, no frena el
+        reconocimiento, y la copia evita modificar el índice publicado.
+        """
+        if GALERIA_MODO != 'muestras':
+            return
+        ids = [empleado_id for empleado_id, _ in lote]
+        vectores = np.stack([vector for _, vector in lote])
+        with self._lock_galeria:
+            indice = self.indice.copiar()
+            indice.agregar(vectores, ids)
+            self._publicar(indice, self.empleados_nombres, self.empleados_ids, self._generacion_indice)
+    
+    def _al_cambiar_directorio(self, directorio):
+        """Suscripción al directorio: se ejecuta en su hilo, fuera del reconocimiento"""
+        with self._lock_galeria:
+            cambios = directorio.ultimos_cambios
+            if cambios is None:
+                self._aplicar_galeria()  # Recarga completa (inicial o por TTL)
+            else:
+                self._aplicar_cambios(cambios)
+                if cambios.get('remapeo'):
+                    return
+        print(f"Galería de caras actualizada en caliente ({len(self.indice)} muestras)")
     
     def detect_and_encode_faces(self, frame):
-        """Detecta y codifica caras en un frame"""
-        # Redimensionar para acelerar
+        """Detecta caras en el frame reducido y las codifica recortándolas del original"""
+        # Redimensionar para acelerar la detección
         small_frame = cv2.resize(frame, (0, 0), fx=FRAME_SCALE, fy=FRAME_SCALE)
         
         # Detectar ubicaciones
-        face_locations = face_recognition.face_locations(small_frame, model=MODEL)
-        face_encodings = face_recognition.face_encodings(small_frame, face_locations)
+        face_locations = self.detector.detectar(small_frame)
         
-        # Escalar ubicaciones al tamaño original
-        scale_factor = int(1 / FRAME_SCALE)
-        face_locations = [(t*scale_factor, r*scale_factor, b*scale_factor, l*scale_factor) 
-                         for (t, r, b, l) in face_locations]
+        # Escalar ubicaciones al tamaño original y codificar a resolución completa
+        face_locations = escalar_ubicaciones(face_locations, escala_entre(frame, small_frame), frame.shape)
+        face_encodings = codificar_regiones(frame, face_locations)
         
         return face_locations, face_encodings
     
-    def recognize_faces(self, frame):
-        """Reconoce caras en un frame y devuelve coincidencias"""
-        if not self.empleados_caras:
-            return []
+    def match_faces(self, face_encodings):
+        """
+        Busca el empleado más cercano para cada encoding en una sola consulta al índice.
+        En modo 'muestras' la distancia es la mínima entre las muestras del empleado;
+        en modo 'centroide', la distancia a su promedio.
         
-        face_locations, face_encodings = self.detect_and_encode_faces(frame)
-        current_matches = []
+        Returns:
+            list: [(empleado_id, distancia)] por encoding; empleado_id es None si la
+                  distancia mínima supera TOLERANCIA
+        """
+        indice = self.indice  # Referencia fija: la galería puede reemplazarse en caliente
+        if len(face_encodings) == 0 or len(indice) == 0:
+            return [(None, None) for _ in face_encodings]
         
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            match_id = None
-            match_name = None
-            
-            # Reutilizar coincidencia anterior si la cara está cerca
-            for last_id, last_name, last_loc in self.last_matches:
-                if self._misma_cara(face_location, last_loc):
-                    match_id = last_id
-                    match_name = last_name
-                    break
-            
-            # Si no estaba, comparar contra base de datos
-            if match_id is None:
-                results = face_recognition.compare_faces(self.empleados_caras, face_encoding, TOLERANCIA)
-                if True in results:
-                    match_index = results.index(True)
-                    match_id = self.empleados_ids[match_index]
-                    match_name = self.empleados_nombres[match_index]
-            
-            current_matches.append((match_id, match_name, face_location))
+        ids, distancias = indice.buscar(np.asarray(face_encodings, dtype=np.float32), k=1)
+        
+        return [(int(i), float(d)) if i >= 0 and d <= TOLERANCIA else (None, float(d))
+                for i, d in zip(ids[:, 0], distancias[:, 0])]
+    
+    def debe_detectar(self, frame, seguidor=None, compuerta=None):
+        """Compuerta de movimiento: False si la escena está quieta y no hay caras seguidas"""
+        compuerta = compuerta or self.compuerta
+        if compuerta is None:
+            return True
+        seguidor = seguidor or self.seguidor
+        return compuerta.evaluar(frame, forzar=bool(seguidor.pistas))
+    
+    def recognize_faces(self, frame, seguidor=None, compuerta=None):
+        """
+        Reconoce caras en un frame y devuelve coincidencias.
+        La detección corre en cada frame con movimiento (o con caras ya seguidas);
+        el encoding solo en pistas nuevas, no identificadas o vencidas para
+        re-verificar. Con varias cámaras, cada una pasa su propio seguidor y compuerta.
+        """
+        if len(self.indice) == 0:
+            return []
         
-        # Actualizar matches previos
-        self.last_matches = current_matches.copy()
-        return current_matches
+        if not self.debe_detectar(frame, seguidor, compuerta):
+            return []
+        
+        small_frame = cv2.resize(frame, (0, 0), fx=FRAME_SCALE, fy=FRAME_SCALE)
+        face_locations = self.detector.detectar(small_frame)
+        return self.identificar_caras(face_locations, frame=frame, seguidor=seguidor,
+                                      escala=escala_entre(frame, small_frame))
     
-    def _misma_cara(self, loc1, loc2, threshold=50):
-        """Determina si dos ubicaciones corresponden a la misma cara"""
-        return abs(loc1[0] - loc2[0]) < threshold and abs(loc1[1] - loc2[1]) < threshold
+    def identificar_caras(self, face_locations, face_encodings=None, frame=None, seguidor=None,
+                          escala=1 / FRAME_SCALE):
+        """
+        Asocia las caras detectadas (escala reducida) a pistas y las identifica.
+        Los encodings pueden venir ya calculados (pipeline de procesos); si no, se
+        calculan recortando del frame original solo las pistas que lo requieren.
+        """
+        if len(self.indice) == 0:
+            return []
+        
+        seguidor = seguidor or self.seguidor
+        pistas = seguidor.actualizar(face_locations)
+        ubicaciones = escalar_ubicaciones(face_locations, escala, frame.shape if frame is not None else None)
+        ahora = time.time()
+        pendientes = seguidor.pendientes_de_encoding(pistas, ahora)
+        
+        # Encodings y comparación de todas las pistas pendientes en un solo lote
+        if pendientes:
+            if face_encodings is not None:
+                encodings = [face_encodings[p] for p in pendientes]
+            else:
+                encodings = codificar_regiones(frame, [ubicaciones[p] for p in pendientes])
+            coincidencias = self.match_faces(encodings)
+            for posicion, encoding, (empleado_id, distancia) in zip(pendientes, encodings, coincidencias):
+                pistas[posicion].asignar(empleado_id, self.nombres_por_id.get(empleado_id), distancia, ahora)
+                if self.autoenrolamiento:
+                    # Si se acepta, _sumar_muestras_en_vivo la publica desde el hilo del autoenrolamiento
+                    self.autoenrolamiento.considerar(empleado_id, encoding, distancia, ahora)
+        
+        return [(pista.empleado_id, pista.nombre, ubicacion) for pista, ubicacion in zip(pistas, ubicaciones)]
     
     def encode_face_from_file(self, image_path):
         """Codifica una cara desde un archivo de imagen"""
@@ -87,5 +258,13 @@ class FaceRecognitionEngine:
             return None
     
     def reload_faces(self):
-        """Recarga las caras conocidas (útil después de agregar empleados)"""
-        return self.load_known_faces()
\ No newline at end of file
+        """
+        Recarga completa de las caras conocidas. Las altas y modificaciones normales
+        ya llegan solas a través del directorio; esto fuerza releer todo.
+        """
+        self.seguidor.reiniciar()  # Las identidades de las pistas pueden haber cambiado
+        if not self.directorio.cargar():
+            return False
+        if not self._suscripto:
+            return self.load_known_faces()
+        return len(self.indice) > 0
\ No newline at end of file
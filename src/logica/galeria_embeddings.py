@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+import numpy as np
+from .config import (
+    GALERIA_MODO, MUESTRAS_MAX_POR_EMPLEADO, MUESTRAS_DISTANCIA_OUTLIER,
+    AUTOENROLAMIENTO_DISTANCIA, AUTOENROLAMIENTO_NOVEDAD, AUTOENROLAMIENTO_INTERVALO
+)
+from .indice_embeddings import DIMENSION_EMBEDDING
+
+MODOS_GALERIA = ('muestras', 'centroide')
+
+
+def depurar_muestras(vectores, distancia_maxima=MUESTRAS_DISTANCIA_OUTLIER):
+    """
+    Descarta las muestras alejadas de la mediana del empleado (mala iluminación,
+    cara tapada, otra persona). Con menos de 3 muestras no hay con qué comparar.
+    """
+    if len(vectores) < 3:
+        return vectores
+
+    distancias = np.linalg.norm(vectores - np.median(vectores, axis=0), axis=1)
+    conservar = distancias <= distancia_maxima
+    if not conservar.any():
+        conservar[np.argmin(distancias)] = True
+    return vectores[conservar]
+
+
+def armar_galeria(embeddings, muestras, modo=GALERIA_MODO, max_muestras=MUESTRAS_MAX_POR_EMPLEADO):
+    """
+    Arma la galería de búsqueda en un único arreglo contiguo.
+
+    Args:
+        embeddings: {empleado_id: (128,)} embedding de la foto de enrolamiento
+        muestras: {empleado_id: (K, 128)} muestras adicionales (más recientes al final)
+        modo: 'muestras' (una fila por muestra: gana la distancia mínima) o
+              'centroide' (una fila por empleado con el promedio de sus muestras)
+
+    Returns:
+        tuple: (vectores (M, 128) float32, ids (M,) int64); en modo 'muestras' un
+               mismo id aparece una vez por muestra
+    """
+    if modo not in MODOS_GALERIA:
+        raise ValueError(f"Modo de galería inválido: {modo}. Debe ser uno de: {', '.join(MODOS_GALERIA)}")
+
+    bloques = []
+    ids = []
+    for empleado_id in sorted(embeddings):
+        vectores = np.asarray(embeddings[empleado_id], dtype=np.float32).reshape(1, DIMENSION_EMBEDDING)
+        extra = muestras.get(empleado_id)
+        if extra is not None and len(extra):
+            vectores = np.vstack([vectores, extra[-max_muestras:]])
+        vectores = depurar_muestras(vectores)
+
+        if modo == 'centroide':
+            vectores = vectores.mean(axis=0, keepdims=True)
+        bloques.append(vectores)
+        ids.extend([empleado_id] * len(vectores))
+
+    if not bloques:
+        return np.empty((0, DIMENSION_EMBEDDING), dtype=np.float32), np.empty(0, dtype=np.int64)
+    return np.ascontiguousarray(np.vstack(bloques), dtype=np.float32), np.asarray(ids, dtype=np.int64)
+
+
+def actualizar_galeria(vectores, ids, embeddings, muestras, cambiados, modo=GALERIA_MODO):
+    """
+    Reemplaza en una galería ya armada solo las filas de los empleados indicados
+    (altas, modificaciones o bajas), sin recorrer de nuevo a todos los empleados.
+    """
+    cambiados = list(cambiados)
+    conservar = ~np.isin(ids, cambiados)
+    nuevos_vectores, nuevos_ids = armar_galeria(
+        {empleado_id: embeddings[empleado_id] for empleado_id in cambiados if empleado_id in embeddings},
+        muestras, modo
+    )
+    return (np.ascontiguousarray(np.vstack([vectores[conservar], nuevos_vectores]), dtype=np.float32),
+            np.concatenate([ids[conservar], nuevos_ids]))
+
+
+class AutoEnrolamiento:
+    """
+    Suma a la galería muestras en vivo de coincidencias de alta confianza para que
+    el reconocimiento se adapte a la iluminación real de cada tótem. Las muestras
+    se escriben en la base desde un hilo propio, sin demorar el reconocimiento;
+    si la base no responde se pierden (son oportunistas). Si se pasa al_aceptar,
+    se llama con cada lote desde ese mismo hilo, antes de escribirlo.
+    """
+
+    def __init__(self, db_manager, distancia_maxima=AUTOENROLAMIENTO_DISTANCIA,
+                 novedad=AUTOENROLAMIENTO_NOVEDAD, intervalo=AUTOENROLAMIENTO_INTERVALO, al_aceptar=None):
+        self.db_manager = db_manager
+        self.al_aceptar = al_aceptar              # callback(lote) fuera del hilo de reconocimiento
+        self.distancia_maxima = distancia_maxima  # Solo coincidencias claramente correctas
+        self.novedad = novedad                    # Muestras casi iguales a la galería no aportan
+        self.intervalo = intervalo
+        self.ultima_muestra = {}                  # {empleado_id: timestamp}
+        self._cola = queue.Queue(maxsize=256)
+        self._hilo = None
+
+    def considerar(self, empleado_id, encoding, distancia, ahora=None):
+        """
+        Encola la muestra si es de alta confianza, aporta variación y el empleado
+        no recibió otra hace poco. Devuelve True si fue aceptada.
+        """
+        if empleado_id is None or distancia is None:
+            return False
+        if not self.novedad <= distancia <= self.distancia_maxima:
+            return False
+
+        ahora = ahora or time.time()
+        if ahora - self.ultima_muestra.get(empleado_id, 0) < self.intervalo:
+            return False
+
+        try:
+            self._cola.put_nowait((empleado_id, np.asarray(encoding, dtype=np.float32)))
+        except queue.Full:
+            return False
+        self.ultima_muestra[empleado_id] = ahora
+        self._iniciar()
+        return True
+
+    def _iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle_escritura, daemon=True)
+            self._hilo.start()
+
+    def _bucle_escritura(self):
+        while True:
+            lote = [self._cola.get()]
+            while True:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            if self.al_aceptar:
+                try:
+                    self.al_aceptar(lote)
+                except Exception as e:
+                    print(f"Error sumando muestras automáticas a la galería: {e}")
+            try:
+                self.db_manager.agregar_muestras([(empleado_id, vector, None) for empleado_id, vector in lote],
+                                                 origen='auto')
+            except Exception as e:
+                print(f"Error guardando muestras automáticas: {e}")
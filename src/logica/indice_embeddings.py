@@ -0,0 +1,460 @@
+import copy
+import mmap
+import os
+import numpy as np
+from .config import INDICE_TIPO, INDICE_RUTA, INDICE_RERANKING, IVF_NLIST, IVF_NPROBE, IVF_MIN_VECTORES
+
+DIMENSION_EMBEDDING = 128
+TAM_BLOQUE = 1024  # Filas cuantizadas convertidas a float32 por vez (el bloque queda en caché)
+
+
+def _en_archivo(arreglo):
+    """True si el arreglo es (una vista de) un archivo mapeado en memoria"""
+    while arreglo is not None:
+        if isinstance(arreglo, (np.memmap, mmap.mmap)):
+            return True
+        arreglo = getattr(arreglo, 'base', None)
+    return False
+
+
+def _distancias_cuadradas(consultas, vectores, normas):
+    """Distancias euclídeas al cuadrado (F, N) con un único producto matricial"""
+    normas_consultas = np.einsum('ij,ij->i', consultas, consultas)
+    distancias2 = normas_consultas[:, None] + normas[None, :] - 2.0 * (consultas @ vectores.T)
+    return np.maximum(distancias2, 0.0)
+
+
+class IndiceEmbeddings:
+    """Interfaz común de los índices de embeddings (búsqueda por distancia euclídea)"""
+    tipo = None
+    entrenable = False  # True si construirlo es caro y conviene reutilizar el índice persistido
+
+    def __init__(self):
+        self.vectores = np.empty((0, DIMENSION_EMBEDDING), dtype=np.float32)
+        self.normas = np.empty(0, dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def construir(self, vectores, ids):
+        """Reemplaza el contenido del índice"""
+        self.vectores = np.ascontiguousarray(np.asarray(vectores, dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING))
+        self.normas = np.einsum('ij,ij->i', self.vectores, self.vectores)
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+    def agregar(self, vectores, ids):
+        """Agrega vectores sin reconstruir el índice completo"""
+        vectores = np.asarray(vectores, dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING)
+        self.vectores = np.ascontiguousarray(np.vstack([self.vectores, vectores]))
+        self.normas = np.concatenate([self.normas, np.einsum('ij,ij->i', vectores, vectores)])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+
+    def reemplazar(self, vectores, ids):
+        """Reemplaza el contenido; los índices entrenables conservan el entrenamiento si sigue sirviendo"""
+        self.construir(vectores, ids)
+
+    def usar_vectores(self, vectores):
+        """
+        Cambia los float32 por una copia idéntica (por ejemplo, la mapeada del
+        snapshot) sin recalcular nada
+        """
+        self.vectores = vectores
+
+    def memoria_bytes(self):
+        """
+        Bytes del índice en RAM. Los float32 mapeados de un archivo no cuentan: son
+        páginas del archivo que el sistema puede liberar y releer.
+        """
+        vectores = 0 if _en_archivo(self.vectores) else self.vectores.nbytes
+        return vectores + self.normas.nbytes + self.ids.nbytes
+
+    def copiar(self):
+        """
+        Copia liviana para modificarla y publicarla sin tocar el índice en uso
+        (agregar/reemplazar asignan arreglos nuevos, no modifican los compartidos)
+        """
+        return copy.copy(self)
+
+    def buscar(self, consultas, k=1):
+        """
+        Busca los k vecinos más cercanos de cada consulta
+
+        Returns:
+            tuple: (ids (F, k), distancias (F, k)); id -1 y distancia inf si faltan vecinos
+        """
+        raise NotImplementedError
+
+    def _estado(self):
+        return {'vectores': self.vectores, 'ids': self.ids}
+
+    def _restaurar(self, datos):
+        self.construir(datos['vectores'], datos['ids'])
+
+    def guardar(self, ruta=INDICE_RUTA):
+        """Persiste el índice de forma atómica (archivo temporal + reemplazo)"""
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        temporal = f"{ruta}.tmp.npz"
+        np.savez(temporal, tipo=np.array(self.tipo), **self._estado())
+        os.replace(temporal, ruta)
+
+    def _completar(self, ids, distancias2, k):
+        """Ordena candidatos y rellena hasta k columnas"""
+        k_real = min(k, distancias2.shape[1])
+        if k_real == 0:
+            return (np.full((distancias2.shape[0], k), -1, dtype=np.int64),
+                    np.full((distancias2.shape[0], k), np.inf, dtype=np.float32))
+
+        if k_real < distancias2.shape[1]:
+            parcial = np.argpartition(distancias2, k_real - 1, axis=1)[:, :k_real]
+        else:
+            parcial = np.tile(np.arange(distancias2.shape[1]), (distancias2.shape[0], 1))
+        filas = np.arange(distancias2.shape[0])[:, None]
+        orden = np.argsort(distancias2[filas, parcial], axis=1)
+        mejores = parcial[filas, orden]
+
+        resultado_ids = np.full((distancias2.shape[0], k), -1, dtype=np.int64)
+        resultado_dist = np.full((distancias2.shape[0], k), np.inf, dtype=np.float32)
+        resultado_ids[:, :k_real] = ids[mejores]
+        resultado_dist[:, :k_real] = np.sqrt(distancias2[filas, mejores])
+        return resultado_ids, resultado_dist
+
+
+class IndicePlano(IndiceEmbeddings):
+    """Búsqueda exacta por fuerza bruta vectorizada"""
+    tipo = 'flat'
+
+    def buscar(self, consultas, k=1):
+        consultas = np.asarray(consultas, dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING)
+        distancias2 = _distancias_cuadradas(consultas, self.vectores, self.normas)
+        return self._completar(self.ids, distancias2, k)
+
+    def memoria_bytes(self):
+        # Cada consulta recorre todas las filas: aun mapeadas quedan residentes
+        return self.vectores.nbytes + self.normas.nbytes + self.ids.nbytes
+
+
+class IndiceCuantizado(IndiceEmbeddings):
+    """
+    Búsqueda exhaustiva sobre una copia compacta de la galería (float16 o int8) y
+    re-ranking exacto en float32 de los mejores candidatos. Los vectores float32
+    solo se leen para esos candidatos: si vienen del snapshot mapeado en memoria,
+    la galería completa en float32 no necesita estar residente en RAM. Sin
+    re-ranking no se conservan.
+    """
+
+    def __init__(self, reranking=INDICE_RERANKING):
+        super().__init__()
+        self.reranking = reranking  # Candidatos re-evaluados en float32 (0 = usar la distancia aproximada)
+        self.codigos = np.empty((0, DIMENSION_EMBEDDING), dtype=self.dtype_codigos)
+        self.normas_aproximadas = np.empty(0, dtype=np.float32)
+
+    def construir(self, vectores, ids):
+        super().construir(vectores, ids)
+        self._ajustar(self.vectores)
+        self.codigos = self._cuantizar(self.vectores)
+        self.normas_aproximadas = self._normas(self.codigos)
+        if not self.reranking:
+            self.vectores = np.empty((0, DIMENSION_EMBEDDING), dtype=np.float32)
+            self.normas = np.empty(0, dtype=np.float32)
+
+    def agregar(self, vectores, ids):
+        vectores = np.asarray(vectores, dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING)
+        if self.reranking:
+            super().agregar(vectores, ids)
+        else:
+            self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        nuevos = self._cuantizar(vectores)
+        self.codigos = np.vstack([self.codigos, nuevos])
+        self.normas_aproximadas = np.concatenate([self.normas_aproximadas, self._normas(nuevos)])
+
+    def usar_vectores(self, vectores):
+        if self.reranking:
+            super().usar_vectores(vectores)
+
+    def memoria_bytes(self):
+        """Representación compacta más los float32 de re-ranking si no están mapeados"""
+        return super().memoria_bytes() + self.codigos.nbytes + self.normas_aproximadas.nbytes
+
+    def _ajustar(self, vectores):
+        """Calcula los parámetros de cuantización a partir de la galería"""
+
+    def _cuantizar(self, vectores):
+        raise NotImplementedError
+
+    def _decodificar(self, codigos):
+        """Bloque de códigos -> float32 aproximado"""
+        raise NotImplementedError
+
+    def _preparar_consultas(self, consultas):
+        """
+        Devuelve (consultas transformadas, término constante) tales que el producto
+        escalar con las filas decodificadas es transformadas @ códigos.T + constante
+        """
+        return consultas, np.zeros((len(consultas), 1), dtype=np.float32)
+
+    def _normas(self, codigos):
+        normas = np.empty(len(codigos), dtype=np.float32)
+        for inicio in range(0, len(codigos), TAM_BLOQUE):
+            bloque = self._decodificar(codigos[inicio:inicio + TAM_BLOQUE])
+            normas[inicio:inicio + len(bloque)] = np.einsum('ij,ij->i', bloque, bloque)
+        return normas
+
+    def buscar(self, consultas, k=1):
+        consultas = np.asarray(consultas, dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING)
+        total = len(self.ids)
+        if total == 0:
+            return self._completar(self.ids, np.empty((len(consultas), 0), dtype=np.float32), k)
+
+        # Distancias aproximadas por bloques: los códigos se convierten a float32 en un
+        # buffer chico y reutilizado, nunca la galería entera
+        normas_consultas = np.einsum('ij,ij->i', consultas, consultas)
+        transformadas, constante = self._preparar_consultas(consultas)
+        distancias2 = np.empty((len(consultas), total), dtype=np.float32)
+        buffer = np.empty((min(TAM_BLOQUE, total), DIMENSION_EMBEDDING), dtype=np.float32)
+        for inicio in range(0, total, TAM_BLOQUE):
+            bloque = self.codigos[inicio:inicio + TAM_BLOQUE]
+            np.copyto(buffer[:len(bloque)], bloque, casting='unsafe')
+            distancias2[:, inicio:inicio + len(bloque)] = transformadas @ buffer[:len(bloque)].T
+        distancias2 += constante
+        distancias2 *= -2.0
+        distancias2 += normas_consultas[:, None]
+        distancias2 += self.normas_aproximadas[None, :]
+        np.maximum(distancias2, 0.0, out=distancias2)
+
+        if not self.reranking:
+            return self._completar(self.ids, distancias2, k)
+
+        # Re-ranking exacto en float32 solo de los mejores candidatos de cada consulta
+        candidatos = min(max(k, self.reranking), total)
+        if candidatos < total:
+            mejores = np.argpartition(distancias2, candidatos - 1, axis=1)[:, :candidatos]
+        else:
+            mejores = np.tile(np.arange(total), (len(consultas), 1))
+        resultado_ids = np.full((len(consultas), k), -1, dtype=np.int64)
+        resultado_dist = np.full((len(consultas), k), np.inf, dtype=np.float32)
+        for fila, posiciones in enumerate(mejores):
+            posiciones = np.sort(posiciones)  # Lectura ordenada de las filas (mmap)
+            exactas = _distancias_cuadradas(consultas[fila:fila + 1], self.vectores[posiciones],
+                                            self.normas[posiciones])
+            ids, dist = self._completar(self.ids[posiciones], exactas, k)
+            resultado_ids[fila], resultado_dist[fila] = ids[0], dist[0]
+        return resultado_ids, resultado_dist
+
+
+class IndiceFloat16(IndiceCuantizado):
+    """Galería en float16: la mitad de memoria, error de redondeo despreciable"""
+    tipo = 'flat_f16'
+    dtype_codigos = np.float16
+
+    def _cuantizar(self, vectores):
+        return np.ascontiguousarray(vectores, dtype=np.float16)
+
+    def _decodificar(self, codigos):
+        return codigos.astype(np.float32)
+
+
+class IndiceInt8(IndiceCuantizado):
+    """
+    Galería en int8 con cuantización escalar por dimensión (mínimo y escala propios
+    de cada una de las 128 dimensiones): un cuarto de la memoria de float32.
+    """
+    tipo = 'flat_int8'
+    dtype_codigos = np.int8
+
+    def __init__(self, reranking=INDICE_RERANKING):
+        super().__init__(reranking)
+        self.escala = np.ones(DIMENSION_EMBEDDING, dtype=np.float32)
+        self.desplazamiento = np.zeros(DIMENSION_EMBEDDING, dtype=np.float32)
+
+    def _ajustar(self, vectores):
+        if not len(vectores):
+            return
+        minimo = vectores.min(axis=0)
+        rango = vectores.max(axis=0) - minimo
+        self.escala = np.where(rango > 0, rango / 255.0, 1.0).astype(np.float32)
+        # Código c en [-128, 127] -> valor c * escala + desplazamiento
+        self.desplazamiento = (minimo + 128.0 * self.escala).astype(np.float32)
+
+    def _cuantizar(self, vectores):
+        codigos = np.rint((np.asarray(vectores, dtype=np.float32) - self.desplazamiento) / self.escala)
+        return np.clip(codigos, -128, 127).astype(np.int8)
+
+    def _decodificar(self, codigos):
+        return codigos.astype(np.float32) * self.escala + self.desplazamiento
+
+    def _preparar_consultas(self, consultas):
+        # q · (c * escala + desplazamiento) = (q * escala) · c + q · desplazamiento
+        return consultas * self.escala, (consultas @ self.desplazamiento)[:, None]
+
+
+class IndiceIVF(IndiceEmbeddings):
+    """
+    Índice aproximado de listas invertidas (IVF): k-means sobre los embeddings y
+    búsqueda exacta solo dentro de las nprobe listas más cercanas a cada consulta.
+    Con menos de IVF_MIN_VECTORES se comporta como búsqueda exacta.
+    """
+    tipo = 'ivf'
+    entrenable = True
+
+    def __init__(self, nlist=IVF_NLIST, nprobe=IVF_NPROBE, min_vectores=IVF_MIN_VECTORES):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_vectores = min_vectores
+        self.centroides = np.empty((0, DIMENSION_EMBEDDING), dtype=np.float32)
+        self.asignaciones = np.empty(0, dtype=np.int32)
+        self.listas = []
+        self.tamanio_entrenamiento = 0
+
+    def construir(self, vectores, ids):
+        super().construir(vectores, ids)
+        self._entrenar()
+
+    def agregar(self, vectores, ids):
+        inicio = len(self.ids)
+        super().agregar(vectores, ids)
+
+        # Reentrenar si la galería creció mucho desde el último k-means
+        if not len(self.centroides) or len(self.ids) > 2 * self.tamanio_entrenamiento:
+            self._entrenar()
+            return
+
+        nuevas = self._lista_mas_cercana(self.vectores[inicio:])
+        self.asignaciones = np.concatenate([self.asignaciones, nuevas])
+        for posicion, lista in zip(range(inicio, len(self.ids)), nuevas):
+            self.listas[lista] = np.append(self.listas[lista], posicion)
+
+    def reemplazar(self, vectores, ids):
+        """
+        Bajas o cambios: reasigna las filas a los centroides ya entrenados, sin
+        k-means, salvo que la galería haya cambiado mucho de tamaño
+        """
+        IndiceEmbeddings.construir(self, vectores, ids)
+        if (not len(self.centroides) or len(self.ids) < self.min_vectores
+                or len(self.ids) > 2 * self.tamanio_entrenamiento):
+            self._entrenar()
+            return
+        self.asignaciones = self._lista_mas_cercana(self.vectores)
+        self._armar_listas()
+
+    def copiar(self):
+        nuevo = super().copiar()
+        nuevo.listas = list(self.listas)  # agregar() modifica la lista en el lugar
+        return nuevo
+
+    def _entrenar(self, iteraciones=10, semilla=0):
+        """Entrena los centroides con k-means (Lloyd) sobre una muestra de la galería"""
+        self.tamanio_entrenamiento = len(self.ids)
+        if len(self.ids) < self.min_vectores:
+            self.centroides = np.empty((0, DIMENSION_EMBEDDING), dtype=np.float32)
+            self.asignaciones = np.empty(0, dtype=np.int32)
+            self.listas = []
+            return
+
+        rng = np.random.default_rng(semilla)
+        nlist = min(self.nlist, len(self.ids))
+        muestra = self.vectores[rng.choice(len(self.ids), size=min(len(self.ids), nlist * 256), replace=False)]
+        centroides = muestra[rng.choice(len(muestra), size=nlist, replace=False)].copy()
+
+        for _ in range(iteraciones):
+            normas_c = np.einsum('ij,ij->i', centroides, centroides)
+            etiquetas = np.argmin(_distancias_cuadradas(muestra, centroides, normas_c), axis=1)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, etiquetas, muestra)
+            conteos = np.bincount(etiquetas, minlength=nlist)
+            no_vacias = conteos > 0
+            centroides[no_vacias] = sumas[no_vacias] / conteos[no_vacias, None]
+
+        self.centroides = np.ascontiguousarray(centroides, dtype=np.float32)
+        self.asignaciones = self._lista_mas_cercana(self.vectores)
+        self._armar_listas()
+
+    def _lista_mas_cercana(self, vectores):
+        normas_c = np.einsum('ij,ij->i', self.centroides, self.centroides)
+        return np.argmin(_distancias_cuadradas(vectores, self.centroides, normas_c), axis=1).astype(np.int32)
+
+    def _armar_listas(self):
+        orden = np.argsort(self.asignaciones, kind='stable')
+        cortes = np.searchsorted(self.asignaciones[orden], np.arange(len(self.centroides) + 1))
+        self.listas = [orden[cortes[i]:cortes[i + 1]] for i in range(len(self.centroides))]
+
+    def buscar(self, consultas, k=1):
+        consultas = np.asarray(consultas, dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING)
+        if not len(self.centroides):
+            distancias2 = _distancias_cuadradas(consultas, self.vectores, self.normas)
+            return self._completar(self.ids, distancias2, k)
+
+        normas_c = np.einsum('ij,ij->i', self.centroides, self.centroides)
+        nprobe = min(self.nprobe, len(self.centroides))
+        sondeos = np.argpartition(_distancias_cuadradas(consultas, self.centroides, normas_c),
+                                  nprobe - 1, axis=1)[:, :nprobe]
+
+        resultado_ids = np.full((len(consultas), k), -1, dtype=np.int64)
+        resultado_dist = np.full((len(consultas), k), np.inf, dtype=np.float32)
+        for fila, listas in enumerate(sondeos):
+            candidatos = np.concatenate([self.listas[lista] for lista in listas])
+            distancias2 = _distancias_cuadradas(consultas[fila:fila + 1], self.vectores[candidatos],
+                                                self.normas[candidatos])
+            ids, dist = self._completar(self.ids[candidatos], distancias2, k)
+            resultado_ids[fila], resultado_dist[fila] = ids[0], dist[0]
+        return resultado_ids, resultado_dist
+
+    def _estado(self):
+        estado = super()._estado()
+        estado.update({
+            'centroides': self.centroides,
+            'asignaciones': self.asignaciones,
+            'tamanio_entrenamiento': np.array(self.tamanio_entrenamiento)
+        })
+        return estado
+
+    def _restaurar(self, datos):
+        IndiceEmbeddings.construir(self, datos['vectores'], datos['ids'])
+        self.centroides = np.ascontiguousarray(datos['centroides'], dtype=np.float32)
+        self.asignaciones = np.asarray(datos['asignaciones'], dtype=np.int32)
+        self.tamanio_entrenamiento = int(datos['tamanio_entrenamiento'])
+        self._armar_listas()
+
+
+TIPOS_INDICE = {
+    IndicePlano.tipo: IndicePlano,
+    IndiceIVF.tipo: IndiceIVF,
+    IndiceFloat16.tipo: IndiceFloat16,
+    IndiceInt8.tipo: IndiceInt8
+}
+
+
+def crear_indice(tipo=INDICE_TIPO):
+    """Crea un índice vacío del tipo configurado"""
+    if tipo not in TIPOS_INDICE:
+        raise ValueError(f"Tipo de índice inválido: {tipo}. Debe ser uno de: {', '.join(TIPOS_INDICE)}")
+    return TIPOS_INDICE[tipo]()
+
+
+def cargar_indice(ruta=INDICE_RUTA, tipo=INDICE_TIPO):
+    """Carga el índice persistido; devuelve None si no existe, es de otro tipo o está dañado"""
+    if not os.path.exists(ruta):
+        return None
+
+    try:
+        with np.load(ruta) as datos:
+            if str(datos['tipo']) != tipo:
+                return None
+            indice = crear_indice(tipo)
+            indice._restaurar(datos)
+            return indice
+    except Exception as e:
+        print(f"Error cargando índice de embeddings {ruta}: {e}")
+        return None
+
+
+def agregar_a_indice_persistido(vectores, ids, ruta=INDICE_RUTA, tipo=INDICE_TIPO):
+    """Actualiza incrementalmente el índice en disco (si existe) con nuevos embeddings"""
+    indice = cargar_indice(ruta, tipo)
+    if indice is None:
+        return False
+
+    indice.agregar(vectores, ids)
+    indice.guardar(ruta)
+    return True
@@ -0,0 +1,142 @@
+import heapq
+import multiprocessing as mp
+import queue
+from multiprocessing import shared_memory
+import numpy as np
+from .config import FRAME_SCALE, PIPELINE_SLOTS_POR_PROCESO
+
+
+def _trabajador(nombres_slots, tareas, resultados):
+    """
+    Proceso de reconocimiento: toma (slot, seq, forma) de la cola, lee el frame desde
+    la memoria compartida, detecta en la escala reducida y codifica recortando las
+    caras del frame completo. Devuelve (seq, slot, ubicaciones reducidas, encodings);
+    solo viaja por las colas el resultado, no el frame.
+    """
+    import cv2
+    from .detectores_caras import crear_detector
+    from .codificacion_caras import escalar_ubicaciones, escala_entre, codificar_regiones
+
+    detector = crear_detector()
+    memorias = [shared_memory.SharedMemory(name=nombre) for nombre in nombres_slots]
+    try:
+        while True:
+            tarea = tareas.get()
+            if tarea is None:
+                break
+            slot, seq, forma = tarea
+            try:
+                frame = np.ndarray(forma, dtype=np.uint8, buffer=memorias[slot].buf)
+                small_frame = cv2.resize(frame, (0, 0), fx=FRAME_SCALE, fy=FRAME_SCALE)
+                ubicaciones = detector.detectar(small_frame)
+                encodings = codificar_regiones(
+                    frame, escalar_ubicaciones(ubicaciones, escala_entre(frame, small_frame), frame.shape)
+                )
+                del frame
+                resultados.put((seq, slot, ubicaciones, [e.astype(np.float32) for e in encodings]))
+            except Exception as e:
+                print(f"Error en proceso de reconocimiento: {e}")
+                resultados.put((seq, slot, [], []))
+    finally:
+        for memoria in memorias:
+            memoria.close()
+
+
+class PipelineReconocimiento:
+    """
+    Etapa de detección y encoding repartida en un pool de procesos, para usar todos
+    los núcleos (HOG y ResNet de dlib son CPU-bound y el GIL limita a los hilos).
+
+    Los frames se copian una vez a un slot de memoria compartida preasignado; los
+    procesos reciben solo el índice del slot. Los resultados se devuelven en el
+    orden de los frames enviados, para que el seguimiento de caras los vea en secuencia.
+    """
+
+    def __init__(self, procesos, forma_frame, slots_por_proceso=PIPELINE_SLOTS_POR_PROCESO):
+        self.procesos = procesos
+        self.tamano_slot = int(np.prod(forma_frame))  # Frame más grande admitido (bytes)
+        cantidad = procesos * slots_por_proceso
+
+        self._memorias = [shared_memory.SharedMemory(create=True, size=self.tamano_slot) for _ in range(cantidad)]
+        self._libres = list(range(cantidad))
+        self._contexto = mp.get_context('spawn')  # dlib no es seguro tras fork con hilos activos
+        self._tareas = self._contexto.Queue()
+        self._resultados = self._contexto.Queue()
+        self._trabajadores = []
+        self._seq_enviado = 0
+        self._seq_entregado = 0
+        self._listos = []  # Heap de (seq, ubicaciones, encodings) recibidos fuera de orden
+
+    def iniciar(self):
+        nombres = [memoria.name for memoria in self._memorias]
+        for _ in range(self.procesos):
+            trabajador = self._contexto.Process(
+                target=_trabajador, args=(nombres, self._tareas, self._resultados), daemon=True
+            )
+            trabajador.start()
+            self._trabajadores.append(trabajador)
+        print(f"Pipeline de reconocimiento: {self.procesos} procesos, {len(self._memorias)} slots")
+
+    def enviar(self, frame):
+        """
+        Copia el frame a un slot libre y lo encola.
+
+        Returns:
+            int | None: seq asignado, o None si todos los slots están ocupados
+                        (el llamador descarta el frame en vez de acumular latencia)
+        """
+        self._recibir(bloquear=False)
+        if not self._libres or frame.nbytes > self.tamano_slot:
+            return None
+
+        slot = self._libres.pop()
+        destino = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._memorias[slot].buf)
+        np.copyto(destino, frame)
+        del destino
+        self._seq_enviado += 1
+        self._tareas.put((slot, self._seq_enviado, frame.shape))
+        return self._seq_enviado
+
+    def _recibir(self, bloquear, timeout=None):
+        try:
+            while True:
+                seq, slot, ubicaciones, encodings = self._resultados.get(block=bloquear, timeout=timeout)
+                self._libres.append(slot)
+                heapq.heappush(self._listos, (seq, ubicaciones, encodings))
+                bloquear = False
+        except queue.Empty:
+            pass
+
+    def resultados(self, timeout=0.0):
+        """
+        Devuelve [(seq, ubicaciones, encodings)] listos en orden de frame.
+        Espera hasta timeout segundos si todavía no hay ninguno en orden.
+        """
+        if not (self._listos and self._listos[0][0] == self._seq_entregado + 1):
+            self._recibir(bloquear=timeout > 0 and self.en_vuelo() > 0, timeout=timeout or None)
+        else:
+            self._recibir(bloquear=False)
+
+        entregados = []
+        while self._listos and self._listos[0][0] == self._seq_entregado + 1:
+            entregados.append(heapq.heappop(self._listos))
+            self._seq_entregado += 1
+        return entregados
+
+    def en_vuelo(self):
+        """Frames enviados cuyo resultado aún no fue entregado"""
+        return self._seq_enviado - self._seq_entregado
+
+    def detener(self):
+        for _ in self._trabajadores:
+            self._tareas.put(None)
+        for trabajador in self._trabajadores:
+            trabajador.join(timeout=2.0)
+            if trabajador.is_alive():
+                trabajador.terminate()
+        self._trabajadores = []
+
+        for memoria in self._memorias:
+            memoria.close()
+            memoria.unlink()
+        self._memorias = []
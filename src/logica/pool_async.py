@@ -0,0 +1,85 @@
+import uuid
+
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from .config import (
+    DB_CONFIG, POOL_ASYNC_MIN_CONEXIONES, POOL_ASYNC_MAX_CONEXIONES, POOL_VERIFICAR_CADA,
+    POOL_ESPERA_MAXIMA, EXPORTACION_FILAS_POR_LOTE
+)
+from .pool_conexiones import PARAMETROS_KEEPALIVE
+
+
+class PoolAsync:
+    """
+    Pool de conexiones PostgreSQL asíncrono (psycopg 3) para la API web.
+    Mientras una consulta espera a la base el event loop sigue atendiendo otras
+    peticiones, en lugar de quedar bloqueado como con psycopg2. Las consultas usan
+    los mismos parámetros %s que el resto del proyecto.
+    """
+
+    def __init__(self, db_config=DB_CONFIG, minimo=POOL_ASYNC_MIN_CONEXIONES, maximo=POOL_ASYNC_MAX_CONEXIONES,
+                 verificar_cada=POOL_VERIFICAR_CADA, espera_maxima=POOL_ESPERA_MAXIMA):
+        self._pool = AsyncConnectionPool(
+            kwargs={**PARAMETROS_KEEPALIVE, **db_config},
+            min_size=minimo,
+            max_size=maximo,
+            timeout=espera_maxima,              # Espera máxima por una conexión libre
+            max_idle=verificar_cada * 10,       # Cierra las conexiones ociosas sobrantes
+            check=AsyncConnectionPool.check_connection,  # Descarta las que cerró el servidor
+            open=False                          # Se abre en el arranque de la aplicación
+        )
+
+    async def abrir(self):
+        """Abre el pool sin esperar a las conexiones (permite iniciar sin base)"""
+        await self._pool.open(wait=False)
+
+    async def cerrar(self):
+        await self._pool.close()
+
+    def conexion(self):
+        """Context manager asíncrono: async with pool.conexion() as conn: ... (commit al salir)"""
+        return self._pool.connection()
+
+    async def consultar(self, query, args=(), one=False):
+        """
+        Ejecuta una consulta y devuelve sus filas como dicts (o la primera fila, o
+        None, si one=True)
+        """
+        async with self._pool.connection() as conexion:
+            async with conexion.cursor(row_factory=dict_row) as cursor:
+                await cursor.execute(query, args)
+                filas = await cursor.fetchall() if cursor.description else []
+        if one:
+            return filas[0] if filas else None
+        return filas
+
+    async def copiar(self, query, args=()):
+        """
+        Generador asíncrono con los bytes de un COPY (...) TO STDOUT tal como los
+        envía el servidor: la memoria usada no depende de la cantidad de filas.
+        Los parámetros de COPY se interpolan del lado del cliente.
+        """
+        async with self._pool.connection() as conexion:
+            async with conexion.cursor() as cursor:
+                async with cursor.copy(query, args) as copia:
+                    async for bloque in copia:
+                        yield bytes(bloque)
+
+    async def recorrer(self, query, args=(), por_lote=EXPORTACION_FILAS_POR_LOTE):
+        """
+        Generador asíncrono de lotes de filas leídos con un cursor del servidor
+        (con nombre): solo un lote vive a la vez en memoria.
+        """
+        async with self._pool.connection() as conexion:
+            async with conexion.cursor(name=f"recorrer_{uuid.uuid4().hex[:12]}") as cursor:
+                await cursor.execute(query, args)
+                while True:
+                    filas = await cursor.fetchmany(por_lote)
+                    if not filas:
+                        break
+                    yield filas
+
+    def estadisticas(self):
+        """Conexiones abiertas, libres y peticiones en espera (para diagnóstico)"""
+        return self._pool.get_stats()
@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+from .config import (
+    DB_CONFIG, POOL_MIN_CONEXIONES, POOL_MAX_CONEXIONES, POOL_VERIFICAR_CADA,
+    POOL_ESPERA_MAXIMA, POOL_REINTENTOS
+)
+
+# Keepalives TCP para detectar enlaces caídos sin esperar al timeout del sistema
+PARAMETROS_KEEPALIVE = {
+    'keepalives': 1,
+    'keepalives_idle': 30,
+    'keepalives_interval': 10,
+    'keepalives_count': 3
+}
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones PostgreSQL seguro entre hilos.
+    Reutiliza conexiones ya autenticadas (TLS incluido), verifica su estado antes
+    de entregarlas y reconecta automáticamente si el servidor las cerró.
+    """
+
+    def __init__(self, db_config=DB_CONFIG, minimo=POOL_MIN_CONEXIONES, maximo=POOL_MAX_CONEXIONES,
+                 verificar_cada=POOL_VERIFICAR_CADA, espera_maxima=POOL_ESPERA_MAXIMA,
+                 reintentos=POOL_REINTENTOS):
+        self.db_config = {**PARAMETROS_KEEPALIVE, **db_config}
+        self.minimo = minimo
+        self.maximo = maximo
+        self.verificar_cada = verificar_cada
+        self.espera_maxima = espera_maxima
+        self.reintentos = reintentos
+        self._pool = None
+        self._lock = threading.Lock()
+        self._cupos = threading.BoundedSemaphore(maximo)  # Bloquea en vez de fallar si se agota
+        self._ultimo_uso = {}  # id(conexion) -> timestamp de su última devolución
+
+    def _crear_pool(self):
+        """Crea el pool la primera vez que se necesita (permite iniciar sin base)"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = pool.ThreadedConnectionPool(self.minimo, self.maximo, **self.db_config)
+            return self._pool
+
+    def _esta_viva(self, conexion):
+        """Health check liviano sobre una conexión ociosa"""
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conexion.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _devolver(self, conexion, cerrar=False):
+        """
+        Devuelve la conexión al pool y olvida su timestamp si quedó cerrada (el pool
+        también cierra las que sobran del mínimo): otra conexión nueva podría
+        reutilizar el mismo id() y heredar un uso viejo.
+        """
+        try:
+            self._pool.putconn(conexion, close=cerrar)
+        finally:
+            if conexion.closed:
+                self._ultimo_uso.pop(id(conexion), None)
+
+    def obtener(self):
+        """Entrega una conexión sana del pool (bloquea hasta espera_maxima si no hay cupo)"""
+        if not self._cupos.acquire(timeout=self.espera_maxima):
+            raise pool.PoolError(f"No hay conexiones disponibles tras {self.espera_maxima}s")
+
+        ultimo_error = None
+        for intento in range(self.reintentos):
+            conexion = None
+            try:
+                conexion = self._crear_pool().getconn()
+                # Las conexiones recién abiertas no necesitan verificación
+                ociosa = time.time() - self._ultimo_uso.setdefault(id(conexion), time.time())
+
+                if conexion.closed or (ociosa > self.verificar_cada and not self._esta_viva(conexion)):
+                    # Conexión muerta: descartarla y pedir otra (el pool reconecta)
+                    self._devolver(conexion, cerrar=True)
+                    raise psycopg2.OperationalError("Conexión cerrada por el servidor")
+
+                return conexion
+
+            except psycopg2.OperationalError as e:
+                ultimo_error = e
+                print(f"Error conectando a PostgreSQL (intento {intento + 1}/{self.reintentos}): {e}")
+                time.sleep(min(0.2 * 2 ** intento, 2.0))
+            except Exception:
+                if conexion is not None:
+                    self._devolver(conexion, cerrar=True)
+                self._cupos.release()
+                raise
+
+        self._cupos.release()
+        raise ultimo_error
+
+    def liberar(self, conexion):
+        """Devuelve la conexión al pool, descartándola si quedó inutilizable"""
+        if conexion is None:
+            return
+
+        try:
+            descartar = bool(conexion.closed)
+            if not descartar and conexion.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                # Transacción abierta o fallida: limpiarla antes de reutilizar
+                try:
+                    conexion.rollback()
+                except Exception:
+                    descartar = True
+
+            self._ultimo_uso[id(conexion)] = time.time()
+            self._devolver(conexion, cerrar=descartar)
+        except Exception as e:
+            print(f"Error devolviendo conexión al pool: {e}")
+        finally:
+            self._cupos.release()
+
+    @contextmanager
+    def conexion(self):
+        """Context manager: with pool.conexion() as conn: ..."""
+        conn = self.obtener()
+        try:
+            yield conn
+        finally:
+            self.liberar(conn)
+
+    def cerrar(self):
+        """Cierra todas las conexiones del pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._ultimo_uso.clear()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool(db_config=DB_CONFIG):
+    """Devuelve el pool compartido del proceso para una configuración de conexión"""
+    clave = tuple(sorted(db_config.items()))
+    with _pools_lock:
+        if clave not in _pools:
+            _pools[clave] = PoolConexiones(db_config)
+        return _pools[clave]
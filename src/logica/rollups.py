@@ -0,0 +1,389 @@
+"""
+Resúmenes diarios (rollups) de asistencias, denegaciones y producción.
+
+Cada tabla rollup_* guarda una fila por (fecha, turno, departamento[, producto
+o motivo]) con conteos y sumas, así los reportes de un mes o un año leen unos
+cientos de filas en lugar de recorrer las tablas crudas.
+
+Se mantienen en forma incremental con triggers por sentencia: las filas
+insertadas, modificadas o borradas se agregan (con signo + o -) y se suman al
+resumen con INSERT ... ON CONFLICT DO UPDATE, que es seguro con varios tótems
+escribiendo a la vez. Los eventos que llegan tarde (tótems que estuvieron sin
+conexión) caen en el día que corresponde sin hacer nada especial.
+
+refrescar_rollups recalcula un rango de fechas desde las tablas crudas (carga
+inicial, datos cargados sin triggers, cambio de los límites de OEE).
+
+El departamento (y en denegaciones el turno) es el del empleado al momento de
+registrar el evento: un trigger por fila lo copia a la fila cruda al insertarla
+(ver COLUMNAS_EMPLEADO) y no cambia aunque después el empleado cambie de
+departamento. Así la resta de una modificación o baja cae en el mismo grupo en
+que se sumó el alta.
+
+Uso:
+    python -m src.logica.rollups [--desde 2025-01-01] [--hasta 2025-12-31]
+"""
+
+import argparse
+import sys
+from datetime import date
+
+from .config import OEE_EXCELENTE, OEE_BUENO, OEE_REGULAR
+
+# Datos del empleado copiados a cada fila cruda al registrarla: {columna: columna de empleados}
+COLUMNAS_EMPLEADO = {
+    'asistencias': {'departamento_empleado': 'Departamento'},
+    'denegaciones': {'departamento_empleado': 'Departamento', 'turno_empleado': 'Turno'},
+    'produccion': {'departamento_empleado': 'Departamento'},
+}
+
+# Cada rollup: tabla cruda de origen, columnas clave y columnas de medida con su
+# agregación (sobre el alias f de la fuente). Las medidas se multiplican por el
+# signo de la fuente; las de 'extremos' se combinan con GREATEST/LEAST y se
+# recalculan desde la tabla cruda ante bajas o cambios.
+ROLLUPS = {
+    'rollup_asistencias': {
+        'origen': 'asistencias',
+        'claves': {
+            'fecha': "f.Fecha",
+            'turno': "COALESCE(f.Turno, '')",
+            'departamento': "COALESCE(f.departamento_empleado, '')",
+        },
+        'medidas': {
+            'registros': ("INTEGER", "COUNT(*)"),
+            'presentes': ("INTEGER", "COUNT(*) FILTER (WHERE f.Estado_Asistencia)"),
+            'puntuales': ("INTEGER", "COUNT(*) FILTER (WHERE f.Estado_Asistencia AND COALESCE(f.Minutos_Tarde, 0) = 0)"),
+            'tardes': ("INTEGER", "COUNT(*) FILTER (WHERE f.Estado_Asistencia AND f.Minutos_Tarde > 0)"),
+            'minutos_tarde': ("BIGINT", "COALESCE(SUM(f.Minutos_Tarde) FILTER (WHERE f.Estado_Asistencia AND f.Minutos_Tarde > 0), 0)"),
+        },
+    },
+    # Histograma exacto de tardanzas de los presentes (minutos 0 = puntual):
+    # permite cualquier agrupación en tramos y percentiles sin leer asistencias
+    'rollup_tardanzas': {
+        'origen': 'asistencias',
+        'claves': {
+            'fecha': "f.Fecha",
+            'turno': "COALESCE(f.Turno, '')",
+            'departamento': "COALESCE(f.departamento_empleado, '')",
+            'minutos_tarde': "GREATEST(COALESCE(f.Minutos_Tarde, 0), 0)",
+        },
+        'tipos_claves': {'minutos_tarde': "INTEGER"},
+        'filtro': "f.Estado_Asistencia",
+        'medidas': {
+            'cantidad': ("INTEGER", "COUNT(*)"),
+        },
+    },
+    # El turno de una denegación es el del empleado (copiado en turno_empleado)
+    'rollup_denegaciones': {
+        'origen': 'denegaciones',
+        'claves': {
+            'fecha': "f.fecha",
+            'turno': "COALESCE(f.turno_empleado, '')",
+            'departamento': "COALESCE(f.departamento_empleado, '')",
+            'motivo': "f.motivo",
+        },
+        'medidas': {
+            'cantidad': ("INTEGER", "COUNT(*)"),
+        },
+    },
+    'rollup_produccion': {
+        'origen': 'produccion',
+        'claves': {
+            'fecha': "f.fecha",
+            'turno': "COALESCE(f.turno, '')",
+            'departamento': "COALESCE(f.departamento_empleado, '')",
+            'producto': "COALESCE(f.producto, '')",
+        },
+        'medidas': {
+            'registros': ("INTEGER", "COUNT(*)"),
+            'produccion_real': ("NUMERIC", "COALESCE(SUM(f.produccion_real), 0)"),
+            'produccion_buena': ("NUMERIC", "COALESCE(SUM(f.produccion_buena), 0)"),
+            'produccion_defectuosa': ("NUMERIC", "COALESCE(SUM(f.produccion_defectuosa), 0)"),
+            'suma_oee': ("NUMERIC", "COALESCE(SUM(f.oee), 0)"),
+            'suma_disponibilidad': ("NUMERIC", "COALESCE(SUM(f.disponibilidad), 0)"),
+            'suma_rendimiento': ("NUMERIC", "COALESCE(SUM(f.rendimiento), 0)"),
+            'suma_calidad': ("NUMERIC", "COALESCE(SUM(f.calidad), 0)"),
+            'excelentes': ("INTEGER", f"COUNT(*) FILTER (WHERE f.oee >= {OEE_EXCELENTE})"),
+            'buenos': ("INTEGER", f"COUNT(*) FILTER (WHERE f.oee >= {OEE_BUENO} AND f.oee < {OEE_EXCELENTE})"),
+            'regulares': ("INTEGER", f"COUNT(*) FILTER (WHERE f.oee >= {OEE_REGULAR} AND f.oee < {OEE_BUENO})"),
+            'deficientes': ("INTEGER", f"COUNT(*) FILTER (WHERE f.oee < {OEE_REGULAR})"),
+        },
+        'extremos': {
+            'mejor_oee': ("NUMERIC", "MAX(f.oee)", "GREATEST"),
+            'peor_oee': ("NUMERIC", "MIN(f.oee)", "LEAST"),
+        },
+    },
+}
+
+
+def _seleccion(definicion, fuente, signo=1, where=""):
+    """SELECT que agrega la fuente (tabla cruda o tabla de transición) por las claves del rollup"""
+    claves = definicion['claves']
+    columnas = list(claves.values())
+    columnas += [f"{signo} * {expresion}" for _, expresion in definicion['medidas'].values()]
+    for tipo, expresion, _ in definicion.get('extremos', {}).values():
+        # Las bajas no pueden actualizar máximos y mínimos: se recalculan aparte
+        columnas.append(expresion if signo > 0 else f"NULL::{tipo}")
+
+    condiciones = [c for c in (definicion.get('filtro'), where) if c]
+    # Ordenado por la clave: los upserts concurrentes bloquean las filas en el mismo orden
+    posiciones = ', '.join(str(i + 1) for i in range(len(claves)))
+    return f"""
+        SELECT {', '.join(columnas)}
+        FROM {fuente} f
+        {'WHERE ' + ' AND '.join(condiciones) if condiciones else ''}
+        GROUP BY {posiciones}
+        ORDER BY {posiciones}"""
+
+
+def _columnas(definicion):
+    return list(definicion['claves']) + list(definicion['medidas']) + list(definicion.get('extremos', {}))
+
+
+def _acumular(tabla, definicion, fuente, signo):
+    """INSERT ... ON CONFLICT que suma al rollup el agregado (con signo) de la fuente"""
+    asignaciones = [f"{columna} = r.{columna} + EXCLUDED.{columna}" for columna in definicion['medidas']]
+    asignaciones += [f"{columna} = {combinar}(r.{columna}, EXCLUDED.{columna})"
+                     for columna, (_, _, combinar) in definicion.get('extremos', {}).items()]
+    return f"""
+        INSERT INTO {tabla} AS r ({', '.join(_columnas(definicion))})
+        {_seleccion(definicion, fuente, signo)}
+        ON CONFLICT ({', '.join(definicion['claves'])}) DO UPDATE SET
+            {', '.join(asignaciones)};"""
+
+
+def _recalcular_extremos(tabla, definicion, fuente):
+    """Recalcula desde la tabla cruda los máximos y mínimos de los grupos tocados por la fuente"""
+    claves = definicion['claves']
+    afectados = ', '.join(f"{expresion} AS {columna}" for columna, expresion in claves.items())
+    iguales_crudo = ' AND '.join(f"{expresion} = g.{columna}" for columna, expresion in claves.items())
+    iguales_rollup = ' AND '.join(f"r.{columna} = g.{columna}" for columna in claves)
+    extremos = definicion['extremos']
+    calculados = ', '.join(f"{expresion} AS {columna}" for columna, (_, expresion, _) in extremos.items())
+    asignaciones = ', '.join(f"{columna} = s.{columna}" for columna in extremos)
+    return f"""
+        UPDATE {tabla} r SET {asignaciones}
+        FROM (SELECT DISTINCT {afectados} FROM {fuente} f) g
+        CROSS JOIN LATERAL (
+            SELECT {calculados}
+            FROM {definicion['origen']} f
+            WHERE {iguales_crudo}
+        ) s
+        WHERE {iguales_rollup};"""
+
+
+def _funcion_trigger(origen):
+    """Función de trigger por sentencia que actualiza todos los rollups de una tabla cruda"""
+    bajas, altas = [], []
+    for tabla, definicion in ROLLUPS.items():
+        if definicion['origen'] != origen:
+            continue
+        bajas.append(_acumular(tabla, definicion, 'viejos', -1))
+        if definicion.get('extremos'):
+            bajas.append(_recalcular_extremos(tabla, definicion, 'viejos'))
+        altas.append(_acumular(tabla, definicion, 'nuevos', 1))
+
+    return f"""
+    CREATE OR REPLACE FUNCTION actualizar_rollups_{origen}() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {''.join(bajas)}
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {''.join(altas)}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """
+
+
+def _funcion_columnas_empleado(origen):
+    """
+    Trigger por fila que copia los datos del empleado a la fila cruda al insertarla
+    (o si cambia su id_empleado); en cualquier otra modificación los conserva
+    """
+    columnas = COLUMNAS_EMPLEADO[origen]
+    copiar = ', '.join(f"NEW.{columna}" for columna in columnas)
+    conservar = ' '.join(f"NEW.{columna} := OLD.{columna};" for columna in columnas)
+    return f"""
+    CREATE OR REPLACE FUNCTION fijar_empleado_{origen}() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' OR NEW.id_empleado IS DISTINCT FROM OLD.id_empleado THEN
+            SELECT {', '.join(columnas.values())} INTO {copiar}
+            FROM empleados WHERE ID_Empleado = NEW.id_empleado;
+        ELSE
+            {conservar}
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """
+
+
+def _faltan_columnas_empleado(cursor, origen):
+    """True si a la tabla cruda le falta alguna de las columnas de COLUMNAS_EMPLEADO"""
+    columnas = COLUMNAS_EMPLEADO[origen]
+    cursor.execute("""
+        SELECT count(*) FROM information_schema.columns
+        WHERE table_name = %s AND column_name = ANY(%s)
+    """, (origen, list(columnas)))
+    return cursor.fetchone()[0] < len(columnas)
+
+
+def _completar_columnas_empleado(cursor, origen):
+    """
+    Agrega las columnas de COLUMNAS_EMPLEADO. Las filas existentes se completan
+    con los datos actuales del empleado (los únicos disponibles).
+    """
+    columnas = COLUMNAS_EMPLEADO[origen]
+    for columna in columnas:
+        cursor.execute(f"ALTER TABLE {origen} ADD COLUMN IF NOT EXISTS {columna} TEXT")
+    asignaciones = ', '.join(f"{columna} = e.{origen_columna}" for columna, origen_columna in columnas.items())
+    cursor.execute(f"""
+        UPDATE {origen} f SET {asignaciones}
+        FROM empleados e WHERE e.ID_Empleado = f.id_empleado
+    """)
+
+
+def _crear_tabla(tabla, definicion):
+    tipos_claves = definicion.get('tipos_claves', {})
+    columnas = []
+    for columna in definicion['claves']:
+        if columna == 'fecha':
+            columnas.append("fecha DATE NOT NULL")
+        elif columna in tipos_claves:
+            columnas.append(f"{columna} {tipos_claves[columna]} NOT NULL")
+        else:
+            columnas.append(f"{columna} TEXT NOT NULL DEFAULT ''")
+    columnas += [f"{columna} {tipo} NOT NULL DEFAULT 0" for columna, (tipo, _) in definicion['medidas'].items()]
+    columnas += [f"{columna} {tipo}" for columna, (tipo, _, _) in definicion.get('extremos', {}).items()]
+    return f"""
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        {', '.join(columnas)},
+        PRIMARY KEY ({', '.join(definicion['claves'])})
+    )
+    """
+
+
+def _tabla_existe(cursor, tabla):
+    cursor.execute("SELECT to_regclass(%s)", (tabla,))
+    return cursor.fetchone()[0] is not None
+
+
+def trigger_existe(cursor, nombre, tabla):
+    """
+    True si la tabla ya tiene el trigger. Las migraciones lo consultan antes de
+    crearlo: DROP/CREATE TRIGGER toman un lock exclusivo sobre la tabla en cada
+    arranque de cada tótem, aunque el trigger no haya cambiado.
+    """
+    cursor.execute("""
+        SELECT EXISTS (SELECT FROM pg_trigger WHERE tgname = %s AND tgrelid = %s::regclass)
+    """, (nombre, tabla))
+    return cursor.fetchone()[0]
+
+
+def migrar_rollups(cursor):
+    """
+    Crea las tablas de rollups y los triggers de las tablas crudas existentes.
+    Las funciones se reemplazan siempre (no bloquean las tablas); los triggers
+    solo se crean si faltan. Las tablas crudas que reciben el trigger por primera
+    vez se resumen completas en la misma transacción (el trigger ya bloquea las
+    escrituras concurrentes).
+    """
+    for tabla, definicion in ROLLUPS.items():
+        cursor.execute(_crear_tabla(tabla, definicion))
+
+    for origen in sorted({definicion['origen'] for definicion in ROLLUPS.values()}):
+        if not _tabla_existe(cursor, origen):
+            continue
+        nuevo = not trigger_existe(cursor, f"trg_rollups_{origen}_insert", origen)
+
+        # Las tablas de transición exigen un trigger por evento
+        eventos = (('insert', 'NEW TABLE AS nuevos'),
+                   ('update', 'OLD TABLE AS viejos NEW TABLE AS nuevos'),
+                   ('delete', 'OLD TABLE AS viejos'))
+        # Completar las columnas nuevas sin disparar los rollups; después se resumen completos
+        if _faltan_columnas_empleado(cursor, origen):
+            for evento, _ in eventos:
+                cursor.execute(f"DROP TRIGGER IF EXISTS trg_rollups_{origen}_{evento} ON {origen}")
+            _completar_columnas_empleado(cursor, origen)
+            nuevo = True
+
+        cursor.execute(_funcion_columnas_empleado(origen))
+        if not trigger_existe(cursor, f"trg_empleado_{origen}", origen):
+            cursor.execute(f"""
+                CREATE TRIGGER trg_empleado_{origen}
+                BEFORE INSERT OR UPDATE ON {origen}
+                FOR EACH ROW EXECUTE FUNCTION fijar_empleado_{origen}()
+            """)
+
+        cursor.execute(_funcion_trigger(origen))
+        for evento, transicion in eventos:
+            if trigger_existe(cursor, f"trg_rollups_{origen}_{evento}", origen):
+                continue
+            cursor.execute(f"""
+                CREATE TRIGGER trg_rollups_{origen}_{evento}
+                AFTER {evento.upper()} ON {origen}
+                REFERENCING {transicion}
+                FOR EACH STATEMENT EXECUTE FUNCTION actualizar_rollups_{origen}()
+            """)
+
+        if nuevo:
+            refrescar_rollups(cursor, origenes=[origen])
+
+
+def refrescar_rollups(cursor, fecha_desde=None, fecha_hasta=None, origenes=None):
+    """
+    Recalcula los rollups del rango de fechas desde las tablas crudas. Bloquea
+    las escrituras en esas tablas hasta el commit para no perder eventos que
+    lleguen mientras tanto.
+
+    Returns:
+        dict: {tabla_rollup: filas escritas}
+    """
+    origenes = [o for o in (origenes or {d['origen'] for d in ROLLUPS.values()}) if _tabla_existe(cursor, o)]
+    if not origenes:
+        return {}
+    cursor.execute(f"LOCK TABLE {', '.join(sorted(origenes))} IN SHARE MODE")
+
+    condiciones, params = [], []
+    if fecha_desde:
+        condiciones.append("{alias}fecha >= %s")
+        params.append(fecha_desde)
+    if fecha_hasta:
+        condiciones.append("{alias}fecha <= %s")
+        params.append(fecha_hasta)
+    where = ' AND '.join(condiciones)
+
+    escritas = {}
+    for tabla, definicion in ROLLUPS.items():
+        if definicion['origen'] not in origenes:
+            continue
+        cursor.execute(f"DELETE FROM {tabla} {'WHERE ' + where.format(alias='') if where else ''}", params)
+        cursor.execute(f"""
+            INSERT INTO {tabla} ({', '.join(_columnas(definicion))})
+            {_seleccion(definicion, definicion['origen'], where=where.format(alias='f.'))}
+        """, params)
+        escritas[tabla] = cursor.rowcount
+    return escritas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula los resúmenes diarios desde las tablas crudas")
+    parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial (AAAA-MM-DD)')
+    parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final (AAAA-MM-DD)')
+    args = parser.parse_args()
+
+    from .administrador_database import DatabaseManager
+    db_manager = DatabaseManager()
+    escritas = db_manager.refrescar_rollups(args.desde, args.hasta)
+    if escritas is None:
+        return 1
+    for tabla, filas in escritas.items():
+        print(f"{tabla}: {filas} filas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
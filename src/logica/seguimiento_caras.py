@@ -0,0 +1,163 @@
+import time
+import numpy as np
+from .config import (
+    SEGUIMIENTO_IOU_MINIMO, SEGUIMIENTO_DISTANCIA_CENTRO, SEGUIMIENTO_MAX_PERDIDOS,
+    SEGUIMIENTO_REVERIFICAR_CADA, SEGUIMIENTO_REINTENTO_DESCONOCIDO
+)
+
+# Modelo de velocidad constante: estado [cx, cy, ancho, alto, vx, vy]
+_F = np.eye(6)
+_F[0, 4] = _F[1, 5] = 1.0
+_H = np.eye(4, 6)
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.5, 0.5])   # Ruido del proceso (movimiento de la persona)
+_R = np.diag([4.0, 4.0, 9.0, 9.0])             # Ruido de la medición (jitter del detector)
+
+
+def _a_estado(ubicacion):
+    top, right, bottom, left = ubicacion
+    return np.array([(left + right) / 2, (top + bottom) / 2, right - left, bottom - top], dtype=float)
+
+
+def _a_ubicacion(caja):
+    cx, cy, ancho, alto = caja[:4]
+    return (int(round(cy - alto / 2)), int(round(cx + ancho / 2)),
+            int(round(cy + alto / 2)), int(round(cx - ancho / 2)))
+
+
+def _iou(a, b):
+    """IoU entre dos ubicaciones (top, right, bottom, left)"""
+    alto = min(a[2], b[2]) - max(a[0], b[0])
+    ancho = min(a[1], b[1]) - max(a[3], b[3])
+    if alto <= 0 or ancho <= 0:
+        return 0.0
+    interseccion = alto * ancho
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return interseccion / float(area_a + area_b - interseccion)
+
+
+class Pista:
+    """Una cara seguida entre frames, con filtro de Kalman de velocidad constante"""
+
+    def __init__(self, pista_id, ubicacion):
+        self.id = pista_id
+        self.x = np.zeros(6)
+        self.x[:4] = _a_estado(ubicacion)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 100.0, 100.0])
+        self.ubicacion = ubicacion
+        self.empleado_id = None
+        self.nombre = None
+        self.distancia = None
+        self.verificado_en = 0     # Última vez que se calculó el encoding (0 = nunca)
+        self.fallos = 0            # Re-verificaciones seguidas sin coincidencia
+        self.perdidos = 0          # Frames seguidos sin detección asociada
+
+    def predecir(self):
+        self.x = _F @ self.x
+        self.P = _F @ self.P @ _F.T + _Q
+        return _a_ubicacion(self.x)
+
+    def corregir(self, ubicacion):
+        innovacion = _a_estado(ubicacion) - _H @ self.x
+        S = _H @ self.P @ _H.T + _R
+        K = self.P @ _H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ innovacion
+        self.P = (np.eye(6) - K @ _H) @ self.P
+        self.ubicacion = ubicacion
+        self.perdidos = 0
+
+    def requiere_encoding(self, ahora):
+        """Nueva, desconocida (con reintento acotado) o vencida para re-verificar"""
+        if not self.verificado_en:
+            return True
+        espera = SEGUIMIENTO_REVERIFICAR_CADA if self.empleado_id else SEGUIMIENTO_REINTENTO_DESCONOCIDO
+        return ahora - self.verificado_en >= espera
+
+    def asignar(self, empleado_id, nombre, distancia, ahora):
+        """Aplica el resultado de comparar el encoding de la pista"""
+        self.verificado_en = ahora
+        self.distancia = distancia
+        if empleado_id is not None:
+            self.empleado_id, self.nombre, self.fallos = empleado_id, nombre, 0
+        elif self.empleado_id is not None:
+            # Un encoding malo (perfil, desenfoque) no borra la identidad; dos seguidos sí
+            self.fallos += 1
+            if self.fallos >= 2:
+                self.empleado_id, self.nombre = None, None
+
+
+class SeguidorCaras:
+    """
+    Seguimiento multi-cara por IoU (con respaldo por distancia de centros) sobre la
+    predicción de Kalman de cada pista. Asigna IDs de pista estables para que el
+    encoding de 128-d solo se calcule en pistas nuevas o a re-verificar.
+    """
+
+    def __init__(self, iou_minimo=SEGUIMIENTO_IOU_MINIMO, max_perdidos=SEGUIMIENTO_MAX_PERDIDOS):
+        self.iou_minimo = iou_minimo
+        self.max_perdidos = max_perdidos
+        self.pistas = []
+        self._siguiente_id = 1
+
+    def _asociar(self, predichas, ubicaciones):
+        """Asociación voraz por mayor IoU; devuelve {indice_pista: indice_deteccion}"""
+        candidatos = []
+        for i, prediccion in enumerate(predichas):
+            cx, cy = (prediccion[1] + prediccion[3]) / 2, (prediccion[0] + prediccion[2]) / 2
+            escala = max(prediccion[1] - prediccion[3], prediccion[2] - prediccion[0], 1)
+            for j, ubicacion in enumerate(ubicaciones):
+                iou = _iou(prediccion, ubicacion)
+                if iou >= self.iou_minimo:
+                    candidatos.append((iou, i, j))
+                    continue
+                # Movimiento brusco: aceptar si el centro quedó cerca (puntaje menor que cualquier IoU)
+                dx = (ubicacion[1] + ubicacion[3]) / 2 - cx
+                dy = (ubicacion[0] + ubicacion[2]) / 2 - cy
+                distancia = np.hypot(dx, dy) / escala
+                if distancia <= SEGUIMIENTO_DISTANCIA_CENTRO:
+                    candidatos.append((-distancia, i, j))
+
+        asignaciones = {}
+        usadas = set()
+        for _puntaje, i, j in sorted(candidatos, reverse=True):
+            if i not in asignaciones and j not in usadas:
+                asignaciones[i] = j
+                usadas.add(j)
+        return asignaciones
+
+    def actualizar(self, ubicaciones):
+        """
+        Avanza un frame con las detecciones actuales.
+
+        Returns:
+            list: pistas vigentes, en el mismo orden que ubicaciones
+        """
+        predichas = [pista.predecir() for pista in self.pistas]
+        asignaciones = self._asociar(predichas, ubicaciones)
+
+        por_deteccion = [None] * len(ubicaciones)
+        for i, pista in enumerate(self.pistas):
+            if i in asignaciones:
+                pista.corregir(ubicaciones[asignaciones[i]])
+                por_deteccion[asignaciones[i]] = pista
+            else:
+                pista.perdidos += 1
+
+        for j, ubicacion in enumerate(ubicaciones):
+            if por_deteccion[j] is None:
+                pista = Pista(self._siguiente_id, ubicacion)
+                self._siguiente_id += 1
+                self.pistas.append(pista)
+                por_deteccion[j] = pista
+
+        self.pistas = [pista for pista in self.pistas if pista.perdidos <= self.max_perdidos]
+        return por_deteccion
+
+    def pendientes_de_encoding(self, pistas, ahora=None):
+        """Posiciones de las pistas del frame que necesitan calcular su encoding"""
+        ahora = ahora or time.time()
+        return [posicion for posicion, pista in enumerate(pistas) if pista.requiere_encoding(ahora)]
+
+    def reiniciar(self):
+        """Olvida todas las pistas (por ejemplo, tras recargar los empleados)"""
+        self.pistas = []
@@ -0,0 +1,144 @@
+import glob
+import json
+import os
+import uuid
+from datetime import datetime
+import numpy as np
+from .indice_embeddings import DIMENSION_EMBEDDING
+
+FORMATO_SNAPSHOT = 1
+MANIFIESTO = 'snapshot.json'
+
+
+def guardar_snapshot(ruta, empleados, embeddings, muestras, galeria, version, marca):
+    """
+    Guarda el directorio como una matriz float32 (.npy, mapeable en memoria) con
+    las filas de embeddings, muestras y galería una detrás de otra, un vector de
+    IDs paralelo y un manifiesto JSON con la tabla de empleados y la versión.
+    Los .npy llevan un sufijo único y el manifiesto se reemplaza al final, así un
+    tótem que arranca nunca ve un snapshot a medio escribir.
+
+    Args:
+        galeria: (modo, vectores, ids) ya armada, o None
+    """
+    os.makedirs(ruta, exist_ok=True)
+    ids_embeddings = sorted(embeddings)
+    ids_muestras = sorted(muestras)
+
+    bloques = [np.asarray([embeddings[i] for i in ids_embeddings], dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING)]
+    ids = [np.asarray(ids_embeddings, dtype=np.int64)]
+    for empleado_id in ids_muestras:
+        bloques.append(np.asarray(muestras[empleado_id], dtype=np.float32).reshape(-1, DIMENSION_EMBEDDING))
+        ids.append(np.full(len(bloques[-1]), empleado_id, dtype=np.int64))
+    if galeria is not None:
+        bloques.append(galeria[1])
+        ids.append(galeria[2])
+
+    tamanios = [len(bloque) for bloque in bloques]
+    fin_embeddings = tamanios[0]
+    fin_muestras = fin_embeddings + sum(tamanios[1:1 + len(ids_muestras)])
+
+    sufijo = uuid.uuid4().hex[:12]
+    archivo_matriz = f"vectores_{sufijo}.npy"
+    archivo_ids = f"ids_{sufijo}.npy"
+    np.save(os.path.join(ruta, archivo_matriz), np.vstack(bloques))
+    np.save(os.path.join(ruta, archivo_ids), np.concatenate(ids))
+
+    manifiesto = {
+        'formato': FORMATO_SNAPSHOT,
+        'creado_en': datetime.now().isoformat(),
+        'version': repr(version),
+        'marca': marca.isoformat() if isinstance(marca, datetime) else marca,
+        'marca_es_fecha': isinstance(marca, datetime),
+        'matriz': archivo_matriz,
+        'ids': archivo_ids,
+        'secciones': {
+            'embeddings': [0, fin_embeddings],
+            'muestras': [fin_embeddings, fin_muestras],
+            'galeria': [fin_muestras, sum(tamanios)]
+        },
+        'galeria_modo': galeria[0] if galeria is not None else None,
+        'columnas': ['id', 'nombre', 'apellido', 'departamento', 'turno', 'foto_path'],
+        'empleados': [[e['id'], e['nombre'], e['apellido'], e.get('departamento'), e.get('turno'), e.get('foto_path')]
+                      for e in empleados.values()]
+    }
+    temporal = os.path.join(ruta, f"{MANIFIESTO}.{sufijo}.tmp")
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporal, os.path.join(ruta, MANIFIESTO))
+
+    # Borrar los archivos de snapshots anteriores (en Windows pueden seguir mapeados)
+    for viejo in glob.glob(os.path.join(ruta, '*.npy')):
+        if os.path.basename(viejo) not in (archivo_matriz, archivo_ids):
+            try:
+                os.remove(viejo)
+            except OSError:
+                pass
+
+
+def cargar_snapshot(ruta):
+    """
+    Mapea el snapshot en memoria (sin leer la matriz completa del disco).
+
+    Returns:
+        dict | None: empleados, embeddings ({id: vista (128,)}), muestras
+                     ({id: vista (K, 128)}), galeria ((modo, vectores, ids) o None),
+                     version (repr), marca; None si no existe o está dañado
+    """
+    manifiesto_ruta = os.path.join(ruta, MANIFIESTO)
+    if not os.path.exists(manifiesto_ruta):
+        return None
+
+    try:
+        with open(manifiesto_ruta, encoding='utf-8') as archivo:
+            manifiesto = json.load(archivo)
+        if manifiesto.get('formato') != FORMATO_SNAPSHOT:
+            return None
+
+        # Vistas ndarray sobre el mapeo: indexar un np.memmap fila a fila es mucho más lento
+        matriz = np.asarray(np.load(os.path.join(ruta, manifiesto['matriz']), mmap_mode='r'))
+        ids = np.asarray(np.load(os.path.join(ruta, manifiesto['ids']), mmap_mode='r'))
+        secciones = manifiesto['secciones']
+
+        inicio, fin = secciones['embeddings']
+        embeddings = dict(zip(ids[inicio:fin].tolist(), list(matriz[inicio:fin])))
+
+        inicio, fin = secciones['muestras']
+        # Las muestras se guardan ordenadas por empleado: cada uno es un tramo contiguo
+        unicos, primeros = np.unique(ids[inicio:fin], return_index=True)
+        cortes = np.append(primeros, fin - inicio) + inicio
+        muestras = {int(empleado_id): matriz[desde:hasta]
+                    for empleado_id, desde, hasta in zip(unicos, cortes[:-1], cortes[1:])}
+
+        galeria = None
+        inicio, fin = secciones['galeria']
+        if manifiesto.get('galeria_modo'):
+            galeria = (manifiesto['galeria_modo'], matriz[inicio:fin], ids[inicio:fin])
+
+        empleados = {}
+        for empleado_id, nombre, apellido, departamento, turno, foto_path in manifiesto['empleados']:
+            empleados[empleado_id] = {
+                'id': empleado_id,
+                'nombre': nombre,
+                'apellido': apellido,
+                'nombre_completo': f"{nombre} {apellido}",
+                'departamento': departamento,
+                'turno': turno,
+                'foto_path': foto_path
+            }
+
+        marca = manifiesto.get('marca')
+        if marca and manifiesto.get('marca_es_fecha'):
+            marca = datetime.fromisoformat(marca)
+
+        return {
+            'empleados': empleados,
+            'embeddings': embeddings,
+            'muestras': muestras,
+            'galeria': galeria,
+            'version': manifiesto.get('version'),
+            'marca': marca
+        }
+    except Exception as e:
+        print(f"Error cargando snapshot del directorio {ruta}: {e}")
+        return None
@@ -208,6 +208,9 @@ def formatear_tiempo_minutos(minutos):
     mins = minutos % 60
     return f"{horas:02d}:{mins:02d}"
 
+PERIODOS = ('hoy', 'semana_actual', 'mes_actual', 'ultimos_30_dias')
+
+
 def calcular_fechas_periodo(periodo='mes_actual'):
     """
     Calcula fechas de inicio y fin para diferentes períodos
@@ -33,6 +33,19 @@ def calcular_minutos_tarde(hora_ingreso, turno):
     minutos_tarde = max(0, int(diferencia.total_seconds() / 60))
     return minutos_tarde
 
+def fecha_jornada(turno, momento=None):
+    """
+    Fecha de la jornada a la que pertenece un registro.
+    El turno noche (23:30-07:30) cruza la medianoche: ingresos y egresos de la
+    madrugada pertenecen a la jornada iniciada el día anterior.
+    """
+    if momento is None:
+        momento = datetime.now()
+    
+    if turno == 'Noche' and momento.hour < 12:
+        return momento.date() - timedelta(days=1)
+    return momento.date()
+
 def determinar_observacion(minutos_tarde):
     """Determina la observación basada en los minutos de tardanza"""
     if minutos_tarde <= LIMITE_PUNTUAL:
@@ -1,9 +1,8 @@
-import face_recognition
-from fastapi import FastAPI, UploadFile, Form, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, Form, Request, Query
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import psycopg2
 import cv2
 import numpy as np
 import os
@@ -12,10 +11,22 @@ from PIL import Image
 import subprocess
 import threading
 import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from src.logica.administrador_database import DatabaseManager
+from src.logica.pool_async import PoolAsync
+from src.logica.detectores_caras import crear_detector
+from src.logica.enrolamiento_lote import leer_entradas, enrolar_lote, ruta_dentro_de
+from src.logica.config import (
+    API_LIMITE_DEFAULT, MAX_REGISTROS_CONSULTA, WEB_HILOS_IMAGEN, ENROLAMIENTO_DIRECTORIO_BASE
+)
+from src.utils.production_utils import calcular_fechas_periodo, PERIODOS
 
+import base64
 import json
 from datetime import date, datetime
+from typing import Optional
 
 # Configuración de conexión a Neon
 #DB_CONFIG = {
@@ -36,9 +47,40 @@ DB_CONFIG = {
     'sslmode': os.environ.get("DB_SSLMODE", "require")
 }
 
-app = FastAPI(title="Asistencia API")
+# psycopg 3 en modo async no funciona con el ProactorEventLoop que Windows usa por defecto:
+# la política se fija al importar, antes de que el servidor cree el loop (ver __main__ y README)
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-db_manager = DatabaseManager()
+db_manager = DatabaseManager(DB_CONFIG)  # psycopg2: sus métodos se llaman desde hilos
+pool_async = PoolAsync(DB_CONFIG)  # Consultas de las rutas, sin bloquear el event loop
+
+# Detección y codificación de caras: acotadas a pocos hilos para que un pico de
+# fotos no se lleve la CPU que atiende al resto de las peticiones
+executor_imagenes = ThreadPoolExecutor(max_workers=WEB_HILOS_IMAGEN, thread_name_prefix='imagenes')
+_detectores = threading.local()  # Un detector por hilo: los backends no son seguros entre hilos
+
+
+def detector_del_hilo():
+    if not hasattr(_detectores, 'detector'):
+        _detectores.detector = crear_detector()  # Backend configurado en DETECTOR_TIPO
+    return _detectores.detector
+
+
+async def en_executor_imagenes(funcion, *args):
+    """Corre funcion en el executor de imágenes y espera el resultado sin bloquear el event loop"""
+    return await asyncio.get_running_loop().run_in_executor(executor_imagenes, funcion, *args)
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    await pool_async.abrir()
+    yield
+    await pool_async.cerrar()
+    executor_imagenes.shutdown(wait=False)
+
+
+app = FastAPI(title="Asistencia API", lifespan=ciclo_de_vida)
 
 # Templates y static - Solo si existen los directorios
 templates = None
@@ -51,33 +93,90 @@ if os.path.exists("web/static"):
 # -----------------------
 #   Funciones DB
 # -----------------------
-def query_db(query, args=(), one=False):
-    conn = None
+async def query_db(query, args=(), one=False):
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute(query, args)
-        rows = cur.fetchall()
-        colnames = [desc[0] for desc in cur.description]
+        rows = await pool_async.consultar(query, args)
         result = []
         for row in rows:
             row_dict = {}
-            for i, value in enumerate(row):
+            for column, value in row.items():
                 # Convertir Decimal a float para serialización JSON
                 if hasattr(value, 'isoformat'):  # datetime, date, time objects
-                    row_dict[colnames[i]] = value.isoformat()
+                    row_dict[column] = value.isoformat()
                 elif hasattr(value, 'to_eng_string'):  # Decimal objects
-                    row_dict[colnames[i]] = float(value)
+                    row_dict[column] = float(value)
                 else:
-                    row_dict[colnames[i]] = value
+                    row_dict[column] = value
             result.append(row_dict)
         return (result[0] if result else None) if one else result
     except Exception as e:
+        # Se propaga: las rutas responden 500 en lugar de datos vacíos con 200
         print(f"Error en query_db: {e}")
-        return [] if not one else None
-    finally:
-        if conn:
-            conn.close()
+        raise
+
+
+# -----------------------
+#   Paginación
+# -----------------------
+def codificar_cursor(fecha, ultimo_id):
+    """Cursor opaco con la clave (fecha, id) de la última fila de una página"""
+    crudo = json.dumps([fecha, ultimo_id]).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """(fecha, id) de un cursor; ValueError si no es uno emitido por la API"""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        fecha, ultimo_id = json.loads(crudo)
+        return date.fromisoformat(fecha), int(ultimo_id)
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor}")
+
+
+def filtro_empleados(alias, departamento=None, turno=None):
+    """Condición sobre los empleados de la fila según su departamento y/o turno"""
+    condiciones, args = [], []
+    if departamento:
+        condiciones.append("departamento = %s")
+        args.append(departamento)
+    if turno:
+        condiciones.append("turno = %s")
+        args.append(turno)
+    filtro = f"{alias}.id_empleado IN (SELECT id_empleado FROM empleados WHERE {' AND '.join(condiciones)})"
+    return filtro, args
+
+
+async def consultar_pagina(select, alias, columna_id, filtros, args, cursor=None, limite=API_LIMITE_DEFAULT):
+    """
+    Ejecuta select con los filtros dados y paginación por clave (fecha, id)
+    descendente: cada página arranca después de la última fila de la anterior
+    (sin OFFSET), así el costo no crece al avanzar y el índice (fecha, id)
+    entrega las filas ya ordenadas.
+
+    Returns:
+        dict: {'datos': [...], 'siguiente_cursor': str o None si no hay más}
+    """
+    filtros, args = list(filtros), list(args)
+    if cursor:
+        fecha, ultimo_id = decodificar_cursor(cursor)
+        filtros.append(f"({alias}.fecha, {alias}.{columna_id}) < (%s, %s)")
+        args.extend([fecha, ultimo_id])
+
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    # Una fila de más indica si existe una página siguiente
+    filas = await query_db(f"""
+        {select}
+        {where}
+        ORDER BY {alias}.fecha DESC, {alias}.{columna_id} DESC
+        LIMIT %s
+    """, tuple(args) + (limite + 1,))
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = codificar_cursor(filas[-1]['fecha'], filas[-1][columna_id])
+    return {'datos': filas, 'siguiente_cursor': siguiente}
 
 
 # -----------------------
@@ -93,7 +192,7 @@ async def index(request: Request):
 @app.get("/api/empleados")
 async def empleados():
     try:
-        rows = query_db("""
+        rows = await query_db("""
             SELECT id_empleado, nombre, apellido, departamento, turno
             FROM empleados
             ORDER BY id_empleado
@@ -102,73 +201,326 @@ async def empleados():
     except Exception as e:
         return JSONResponse(status_code=500, content={'error': str(e)})
 
+@app.get("/api/opciones_filtros")
+async def opciones_filtros():
+    """
+    Valores posibles de los filtros de las tablas y las métricas, tomados de toda
+    la base: los listados llegan paginados y una página no los trae todos
+    """
+    try:
+        fila = await query_db("""
+            SELECT
+                ARRAY(SELECT DISTINCT turno FROM asistencias WHERE turno IS NOT NULL
+                      UNION SELECT DISTINCT turno FROM produccion WHERE turno IS NOT NULL ORDER BY 1) AS turnos,
+                ARRAY(SELECT DISTINCT motivo FROM denegaciones ORDER BY 1) AS motivos,
+                ARRAY(SELECT DISTINCT producto FROM produccion WHERE producto IS NOT NULL ORDER BY 1) AS productos
+        """, one=True)
+        return JSONResponse(content=fila)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={'error': str(e)})
+
 @app.get("/api/asistencias")
-async def asistencias():
+async def asistencias(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    turno: Optional[str] = None,
+    departamento: Optional[str] = None,
+    id_empleado: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(API_LIMITE_DEFAULT, ge=1, le=MAX_REGISTROS_CONSULTA)
+):
     try:
-        rows = query_db("""
+        filtros, args = [], []
+        if desde:
+            filtros.append("a.fecha >= %s")
+            args.append(desde)
+        if hasta:
+            filtros.append("a.fecha <= %s")
+            args.append(hasta)
+        if turno:
+            filtros.append("a.turno = %s")
+            args.append(turno)
+        if id_empleado is not None:
+            filtros.append("a.id_empleado = %s")
+            args.append(id_empleado)
+        if departamento:
+            filtro, extra = filtro_empleados('a', departamento=departamento)
+            filtros.append(filtro)
+            args.extend(extra)
+
+        pagina = await consultar_pagina("""
             SELECT 
-                id_asistencia,
-                fecha,
-                id_empleado,
-                turno,
-                hora_ingreso,
-                hora_egreso,
-                estado_asistencia,
-                minutos_tarde,
-                observacion
-            FROM asistencias
-            ORDER BY fecha DESC, id_asistencia DESC
-        """)
-        return JSONResponse(content=rows)
+                a.id_asistencia,
+                a.fecha,
+                a.id_empleado,
+                a.turno,
+                a.hora_ingreso,
+                a.hora_egreso,
+                a.estado_asistencia,
+                a.minutos_tarde,
+                a.observacion
+            FROM asistencias a
+        """, 'a', 'id_asistencia', filtros, args, cursor, limite)
+        return JSONResponse(content=pagina)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={'error': str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={'error': str(e)})
 
 @app.get("/api/denegaciones")
-async def denegaciones():
+async def denegaciones(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    turno: Optional[str] = None,
+    departamento: Optional[str] = None,
+    id_empleado: Optional[int] = None,
+    motivo: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(API_LIMITE_DEFAULT, ge=1, le=MAX_REGISTROS_CONSULTA)
+):
     try:
-        rows = query_db("""
+        filtros, args = [], []
+        if desde:
+            filtros.append("d.fecha >= %s")
+            args.append(desde)
+        if hasta:
+            filtros.append("d.fecha <= %s")
+            args.append(hasta)
+        if motivo:
+            filtros.append("d.motivo = %s")
+            args.append(motivo)
+        if id_empleado is not None:
+            filtros.append("d.id_empleado = %s")
+            args.append(id_empleado)
+        if turno or departamento:
+            # Las denegaciones no guardan turno ni departamento: se toman del empleado
+            filtro, extra = filtro_empleados('d', departamento=departamento, turno=turno)
+            filtros.append(filtro)
+            args.extend(extra)
+
+        pagina = await consultar_pagina("""
             SELECT 
-                id_denegacion,
-                fecha,
-                hora,
-                id_empleado,
-                motivo,
-                modo_operacion
-            FROM denegaciones
-            ORDER BY fecha DESC, hora DESC
-        """)
-        return JSONResponse(content=rows)
+                d.id_denegacion,
+                d.fecha,
+                d.hora,
+                d.id_empleado,
+                d.motivo,
+                d.modo_operacion
+            FROM denegaciones d
+        """, 'd', 'id_denegacion', filtros, args, cursor, limite)
+        return JSONResponse(content=pagina)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={'error': str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={'error': str(e)})
 
 @app.get("/api/produccion")
-async def produccion():
+async def produccion(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    turno: Optional[str] = None,
+    departamento: Optional[str] = None,
+    id_empleado: Optional[int] = None,
+    producto: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(API_LIMITE_DEFAULT, ge=1, le=MAX_REGISTROS_CONSULTA)
+):
     try:
-        rows = query_db("""
+        filtros, args = [], []
+        if desde:
+            filtros.append("p.fecha >= %s")
+            args.append(desde)
+        if hasta:
+            filtros.append("p.fecha <= %s")
+            args.append(hasta)
+        if turno:
+            filtros.append("p.turno = %s")
+            args.append(turno)
+        if producto:
+            filtros.append("p.producto = %s")
+            args.append(producto)
+        if id_empleado is not None:
+            filtros.append("p.id_empleado = %s")
+            args.append(id_empleado)
+        if departamento:
+            filtro, extra = filtro_empleados('p', departamento=departamento)
+            filtros.append(filtro)
+            args.extend(extra)
+
+        pagina = await consultar_pagina("""
             SELECT 
-                id_produccion,
-                fecha,
-                turno,
-                id_empleado,
-                producto,
-                produccion_real as production_real,
-                produccion_buena as production_buena,
-                produccion_defectuosa as production_defectuosa,
-                tiempo_planificado,
-                tiempo_paradas,
-                tiempo_operativo,
-                oee,
-                disponibilidad,
-                rendimiento,
-                calidad,
-                observaciones
-            FROM produccion
-            ORDER BY fecha DESC, id_produccion DESC
-        """)
-        return JSONResponse(content=rows)
+                p.id_produccion,
+                p.fecha,
+                p.turno,
+                p.id_empleado,
+                p.producto,
+                p.produccion_real as production_real,
+                p.produccion_buena as production_buena,
+                p.produccion_defectuosa as production_defectuosa,
+                p.tiempo_planificado,
+                p.tiempo_paradas,
+                p.tiempo_operativo,
+                p.oee,
+                p.disponibilidad,
+                p.rendimiento,
+                p.calidad,
+                p.observaciones
+            FROM produccion p
+        """, 'p', 'id_produccion', filtros, args, cursor, limite)
+        return JSONResponse(content=pagina)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={'error': str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={'error': str(e)})
 
+@app.get("/api/metricas")
+async def metricas(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    periodo: Optional[str] = None,
+    turno: Optional[str] = None,
+    departamento: Optional[str] = None,
+    producto: Optional[str] = None
+):
+    """
+    Indicadores del tablero agregados en la base. periodo ('hoy', 'semana_actual',
+    'mes_actual', 'ultimos_30_dias') se usa si no se indican desde/hasta.
+    """
+    if periodo and periodo not in PERIODOS:
+        return JSONResponse(status_code=400, content={'error': f"Período inválido: {periodo}. Opciones: {', '.join(PERIODOS)}"})
+    try:
+        if periodo and not (desde or hasta):
+            desde, hasta = calcular_fechas_periodo(periodo)
+        resultado = await run_in_threadpool(db_manager.obtener_metricas, desde, hasta,
+                                            turno, departamento, producto)
+        if resultado is None:
+            return JSONResponse(status_code=500, content={'error': 'No se pudieron calcular las métricas'})
+        return JSONResponse(content=resultado)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={'error': str(e)})
+
+# Tablas exportables: SELECT (alias t, sin datos binarios), columna id y
+# columnas propias por las que se puede filtrar
+EXPORTABLES = {
+    'asistencias': ("""
+        SELECT t.id_asistencia, t.fecha, t.id_empleado, t.turno, t.hora_ingreso, t.hora_egreso,
+               t.estado_asistencia, t.minutos_tarde, t.observacion
+        FROM asistencias t
+    """, 'id_asistencia', ('turno',)),
+    'denegaciones': ("""
+        SELECT t.id_denegacion, t.fecha, t.hora, t.id_empleado, t.motivo, t.modo_operacion,
+               t.minutos_tarde, t.turno_esperado, t.turno_detectado, t.nombre_detectado, t.observaciones
+        FROM denegaciones t
+    """, 'id_denegacion', ('motivo',)),
+    'produccion': ("""
+        SELECT t.id_produccion, t.fecha, t.turno, t.id_empleado, t.producto,
+               t.produccion_real, t.produccion_buena, t.produccion_defectuosa,
+               t.tiempo_planificado, t.tiempo_paradas, t.tiempo_operativo,
+               t.oee, t.disponibilidad, t.rendimiento, t.calidad, t.observaciones
+        FROM produccion t
+    """, 'id_produccion', ('turno', 'producto')),
+}
+FORMATOS_EXPORTACION = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+async def lineas_ndjson(consulta, args):
+    """Una línea JSON por fila, armada por row_to_json en la base (sin convertir valores en Python)"""
+    async for filas in pool_async.recorrer(f"SELECT row_to_json(fila)::text FROM ({consulta}) fila", args):
+        yield ('\n'.join(texto for (texto,) in filas) + '\n').encode()
+
+
+async def continuar_con(primero, resto):
+    yield primero
+    async for bloque in resto:
+        yield bloque
+
+
+@app.get("/api/export/{tabla}")
+async def exportar(
+    tabla: str,
+    formato: str = 'csv',
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    turno: Optional[str] = None,
+    departamento: Optional[str] = None,
+    id_empleado: Optional[int] = None,
+    motivo: Optional[str] = None,
+    producto: Optional[str] = None
+):
+    """
+    Historial de una tabla en CSV (COPY ... TO STDOUT) o NDJSON (cursor del
+    servidor), enviado a medida que se lee de la base: la memoria del proceso no
+    crece con la cantidad de filas, así se puede bajar un año completo.
+    """
+    if tabla not in EXPORTABLES:
+        return JSONResponse(status_code=404, content={'error': f"Tabla no exportable: {tabla}. Opciones: {', '.join(EXPORTABLES)}"})
+    if formato not in FORMATOS_EXPORTACION:
+        return JSONResponse(status_code=400, content={'error': f"Formato inválido: {formato}. Opciones: {', '.join(FORMATOS_EXPORTACION)}"})
+
+    select, columna_id, columnas = EXPORTABLES[tabla]
+    filtros, args = [], []
+    if desde:
+        filtros.append("t.fecha >= %s")
+        args.append(desde)
+    if hasta:
+        filtros.append("t.fecha <= %s")
+        args.append(hasta)
+    if id_empleado is not None:
+        filtros.append("t.id_empleado = %s")
+        args.append(id_empleado)
+    for columna, valor in (('turno', turno), ('motivo', motivo), ('producto', producto)):
+        if valor and columna in columnas:
+            filtros.append(f"t.{columna} = %s")
+            args.append(valor)
+        elif valor and columna != 'turno':
+            return JSONResponse(status_code=400, content={'error': f"{tabla} no se puede filtrar por {columna}"})
+    turno_empleado = turno if 'turno' not in columnas else None
+    if departamento or turno_empleado:
+        # Sin columna propia: se toman del empleado de cada fila
+        filtro, extra = filtro_empleados('t', departamento=departamento, turno=turno_empleado)
+        filtros.append(filtro)
+        args.extend(extra)
+
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    consulta = f"{select} {where} ORDER BY t.fecha, t.{columna_id}"
+    if formato == 'csv':
+        contenido = pool_async.copiar(f"COPY ({consulta}) TO STDOUT WITH (FORMAT csv, HEADER)", args)
+    else:
+        contenido = lineas_ndjson(consulta, args)
+
+    # Leer el primer bloque antes de responder: si la base falla se devuelve un
+    # error en lugar de un archivo vacío con estado 200
+    try:
+        primero = await contenido.__anext__()
+    except StopAsyncIteration:
+        primero = b''
+    except Exception as e:
+        print(f"Error exportando {tabla}: {e}")
+        return JSONResponse(status_code=500, content={'error': str(e)})
+
+    nombre = f"{tabla}_{desde or 'inicio'}_{hasta or date.today()}.{formato}"
+    return StreamingResponse(continuar_con(primero, contenido), media_type=FORMATOS_EXPORTACION[formato],
+                             headers={'Content-Disposition': f'attachment; filename="{nombre}"'})
+
+
+def detectar_en_imagen(img_bytes):
+    """Decodifica la foto y detecta las caras (corre en el executor de imágenes)"""
+    img = Image.open(BytesIO(img_bytes))
+    img = np.array(img)
+    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+    # Usar el mismo detector que el sistema principal
+    detector = detector_del_hilo()
+    print(f"🔍 Detectando rostros con detector '{detector.tipo}'...")
+    
+    # Redimensionar para acelerar (igual que en tu sistema)
+    FRAME_SCALE = 0.25
+    small_frame = cv2.resize(img, (0, 0), fx=FRAME_SCALE, fy=FRAME_SCALE)
+    
+    # Detectar ubicaciones de rostros (mismo backend que los tótems)
+    return img, detector.detectar(small_frame)
+
+
 @app.post("/api/detectar_rostro")
 async def detectar_rostro(nombre: str = Form(...), apellido: str = Form(...), frame: UploadFile = None):
     try:
@@ -177,21 +529,9 @@ async def detectar_rostro(nombre: str = Form(...), apellido: str = Form(...), fr
 
         print("🔄 Procesando imagen para detección facial...")
         
-        # Leer y procesar la imagen
+        # Leer y procesar la imagen fuera del event loop
         img_bytes = await frame.read()
-        img = Image.open(BytesIO(img_bytes))
-        img = np.array(img)
-        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-
-        # Usar face_recognition (el mismo método que tu sistema principal)
-        print("🔍 Detectando rostros con face_recognition...")
-        
-        # Redimensionar para acelerar (igual que en tu sistema)
-        FRAME_SCALE = 0.25
-        small_frame = cv2.resize(img, (0, 0), fx=FRAME_SCALE, fy=FRAME_SCALE)
-        
-        # Detectar ubicaciones de rostros
-        face_locations = face_recognition.face_locations(small_frame, model='hog')
+        img, face_locations = await en_executor_imagenes(detectar_en_imagen, img_bytes)
         
         print(f"📊 Rostros detectados: {len(face_locations)}")
 
@@ -211,18 +551,13 @@ async def detectar_rostro(nombre: str = Form(...), apellido: str = Form(...), fr
 
         # Obtener el siguiente ID disponible consultando la base de datos
         print("🔢 Obteniendo próximo ID de empleado...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute("SELECT COALESCE(MAX(id_empleado), 0) FROM empleados")
-        max_id = cur.fetchone()[0]
-        new_id = max_id + 1
-        cur.close()
-        conn.close()
-
-        # Guardar la imagen
+        fila = await pool_async.consultar("SELECT COALESCE(MAX(id_empleado), 0) AS max_id FROM empleados", one=True)
+        new_id = fila['max_id'] + 1
+
+        # Guardar la imagen (la codificación PNG también es trabajo de CPU)
         os.makedirs('imagenes_empleados', exist_ok=True)
         foto_path = os.path.join('imagenes_empleados', f'{nombre}_{apellido}_{new_id}.png')
-        cv2.imwrite(foto_path, img)
+        await en_executor_imagenes(cv2.imwrite, foto_path, img)
 
         print(f"✅ Rostro detectado correctamente. Imagen guardada en: {foto_path}")
 
@@ -292,21 +627,18 @@ async def agregar_empleado(
             )
         print("✅ Archivo de foto existe")
 
-        # Usar el método del DatabaseManager
+        # Usar el método del DatabaseManager (codifica la cara: va al executor de imágenes)
         print("🔄 Llamando a db_manager.agregar_empleado()...")
-        resultado = db_manager.agregar_empleado(nombre, apellido, departamento, turno, foto_path)
+        resultado = await en_executor_imagenes(db_manager.agregar_empleado,
+                                               nombre, apellido, departamento, turno, foto_path)
         
         if resultado:
             print("✅ Empleado agregado exitosamente mediante DatabaseManager")
             
             # Verificar que realmente se guardó en la BD
-            conn = psycopg2.connect(**DB_CONFIG)
-            cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM empleados WHERE nombre = %s AND apellido = %s", 
-                       (nombre, apellido))
-            count = cur.fetchone()[0]
-            cur.close()
-            conn.close()
+            fila = await pool_async.consultar("SELECT COUNT(*) AS cantidad FROM empleados WHERE nombre = %s AND apellido = %s",
+                                              (nombre, apellido), one=True)
+            count = fila['cantidad']
             
             print(f"✅ Verificación BD: {count} empleados con nombre '{nombre} {apellido}'")
             
@@ -338,6 +670,52 @@ async def agregar_empleado(
             }
         )
 
+@app.post("/api/enrolar_lote")
+async def enrolar_lote_api(
+    ruta: str = Form(...),
+    departamento: str = Form(default=None),
+    turno: str = Form(default=None),
+    simular: bool = Form(default=False)
+):
+    """
+    Enrolamiento masivo desde una carpeta de fotos o un manifiesto CSV del servidor,
+    indicados por su ruta relativa a ENROLAMIENTO_DIRECTORIO_BASE (no se aceptan
+    rutas fuera de ese directorio). Devuelve los IDs creados y el motivo de cada
+    foto rechazada.
+    """
+    resuelta = ruta_dentro_de(ruta, ENROLAMIENTO_DIRECTORIO_BASE)
+    if resuelta is None or not os.path.exists(resuelta):
+        # Mismo mensaje exista o no la ruta: no revelar el contenido del servidor
+        return JSONResponse(status_code=400, content={
+            "success": False,
+            "message": f"Ruta inválida: debe ser una carpeta o un CSV dentro de {ENROLAMIENTO_DIRECTORIO_BASE}/"
+        })
+
+    try:
+        entradas = leer_entradas(resuelta, departamento, turno)
+        if any(ruta_dentro_de(entrada['foto_path'], ENROLAMIENTO_DIRECTORIO_BASE) is None
+               for entrada in entradas if entrada['foto_path']):
+            return JSONResponse(status_code=400, content={
+                "success": False,
+                "message": f"El manifiesto referencia fotos fuera de {ENROLAMIENTO_DIRECTORIO_BASE}/"
+            })
+        # La codificación tarda: se corre fuera del event loop para no bloquear otras peticiones
+        reporte = await run_in_threadpool(enrolar_lote, entradas, db_manager, simular=simular)
+    except Exception as e:
+        print(f"❌ Error en enrolamiento masivo: {e}")
+        return JSONResponse(status_code=500, content={"success": False, "message": f"Error inesperado: {str(e)}"})
+
+    return JSONResponse(
+        status_code=200 if reporte['ok'] else 500,
+        content={
+            "success": reporte['ok'],
+            "enrolados": len(reporte['ids']),
+            "ids": reporte['ids'],
+            "muestras": reporte['muestras'],
+            "rechazados": [{"foto_path": foto, "motivo": motivo} for foto, motivo in reporte['rechazados']]
+        }
+    )
+
 @app.post("/api/ejecutar_totem")
 async def ejecutar_totem(modo: str = Form(default="entry")):
     try:
@@ -362,9 +740,10 @@ async def ejecutar_totem(modo: str = Form(default="entry")):
 ##    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
 
 if __name__ == "__main__":
+    # python -m web.app: la app se importa antes de crear el loop, así que en Windows usa el selector
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(app, host="0.0.0.0", port=port, loop="asyncio")
 
 
-# uvicorn web.app:app --reload --host 127.0.0.1 --port 8000
\ No newline at end of file
+# uvicorn web.app:app --reload --host 127.0.0.1 --port 8000